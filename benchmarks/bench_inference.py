@@ -0,0 +1,94 @@
+"""
+Benchmark: eager HGTDetector vs. the InferenceHGT path (frozen inputs, torch.compile, bfloat16)
+Builds a synthetic lineage/airport graph (or loads a graph artifact), times a forward pass
+with each configuration and checks the embeddings against eager float32 within
+INFERENCE_TOLERANCE.
+
+Usage:
+    python benchmarks/bench_inference.py --airports 5000 --lineages 20000
+    python benchmarks/bench_inference.py --artifact data1/processed/cache/graph-v3-<key>.pt
+
+The artifact path of a given build is GraphConfig(...).artifact_path() (see graph_construction).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import torch
+from torch_geometric.data import HeteroData
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from hgt_model import INFERENCE_TOLERANCE, HGTDetector, InferenceHGT
+
+
+def synthetic_graph(num_airports, num_lineages, num_flights, num_samples, num_mutations=500, seed=0):
+    """Random graph with the node features and edge types of the real one."""
+    g = torch.Generator().manual_seed(seed)
+    hg = HeteroData()
+    hg['airport'].x = torch.rand(num_airports, 2, generator=g) * 2 - 1
+    hg['lineage'].x = (torch.rand(num_lineages, num_mutations, generator=g) < 0.02).float()
+    hg['airport', 'flight', 'airport'].edge_index = torch.randint(num_airports, (2, num_flights), generator=g)
+    hg['lineage', 'sampled_at', 'airport'].edge_index = torch.stack([
+        torch.randint(num_lineages, (num_samples,), generator=g),
+        torch.randint(num_airports, (num_samples,), generator=g),
+    ])
+    hg['lineage', 'evolves_from', 'lineage'].edge_index = torch.stack([
+        torch.arange(1, num_lineages), torch.randint(num_lineages, (num_lineages - 1,), generator=g)])
+    hg['lineage', 'temporal', 'lineage'].edge_index = torch.randint(num_lineages, (2, num_lineages), generator=g)
+    return hg
+
+
+def time_call(fn, repeats):
+    for _ in range(2):
+        fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--artifact', help='graph artifact saved by build_graph() (default: synthetic graph)')
+    parser.add_argument('--airports', type=int, default=2000)
+    parser.add_argument('--lineages', type=int, default=5000)
+    parser.add_argument('--flights', type=int, default=200_000)
+    parser.add_argument('--samples', type=int, default=50_000)
+    parser.add_argument('--threads', type=int, default=None, help='torch.set_num_threads')
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.artifact:
+        hg = torch.load(args.artifact, mmap=True, weights_only=False)['hg']
+    else:
+        hg = synthetic_graph(args.airports, args.lineages, args.flights, args.samples)
+    print(hg)
+
+    torch.manual_seed(0)
+    model = HGTDetector.from_graph(hg).eval()
+    with torch.no_grad():
+        reference = model(hg.x_dict, hg.edge_index_dict)
+        eager_ms = time_call(lambda: model(hg.x_dict, hg.edge_index_dict), args.repeats)
+    print(f"\n{'configuration':<28}{'ms / pass':>12}{'speedup':>10}{'max |diff|':>14}{'tolerance':>12}")
+    print(f"{'eager float32':<28}{eager_ms:>12.2f}{1.0:>10.2f}{0.0:>14.2e}{'-':>12}")
+
+    for dtype in (torch.float32, torch.bfloat16):
+        for backend in ('eager', 'compile'):
+            started = time.perf_counter()
+            inference = InferenceHGT(model, hg, dtype=dtype, backend=backend)
+            build_s = time.perf_counter() - started
+            ms = time_call(lambda: inference(hg.edge_index_dict), args.repeats)
+            out = inference(hg.edge_index_dict)
+            diff = max(float((out[nt] - reference[nt]).abs().max()) for nt in reference)
+            name = f"frozen {str(inference.dtype).split('.')[-1]} {inference.backend}"
+            print(f"{name:<28}{ms:>12.2f}{eager_ms / ms:>10.2f}{diff:>14.2e}"
+                  f"{INFERENCE_TOLERANCE[inference.dtype]:>12.0e}"
+                  f"   (build {build_s:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+Approximate nearest-neighbor index over airport embeddings
+HGTDetector outputs are L2-normalized, so "which airports is lineage X most likely to reach"
+is a maximum cosine similarity search. IVFIndex clusters the airport embeddings once per
+trained model (spherical k-means) and, at query time, only scans the clusters closest to
+the query; `n_probe` trades recall for latency.
+"""
+
+import numpy as np
+import torch
+
+
+def _as_numpy(embeddings):
+    if isinstance(embeddings, torch.Tensor):
+        embeddings = embeddings.detach().cpu().numpy()
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def _normalize(x):
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def _assign(x, centroids, chunk_size=65536):
+    """Index of the most similar centroid for every row of x, computed in chunks."""
+    labels = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), chunk_size):
+        labels[start:start + chunk_size] = np.argmax(x[start:start + chunk_size] @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(x, n_clusters, n_iter=10, seed=0):
+    """
+    k-means on the unit sphere (cosine similarity)
+
+    Returns:
+    --------
+    centroids : ndarray [n_clusters, dim], L2-normalized
+    """
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = _assign(x, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        # Reseed empty clusters with random points
+        empty = counts == 0
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index for maximum inner product search over L2-normalized embeddings
+
+    Parameters:
+    -----------
+    embeddings : Tensor or ndarray [num_items, dim]
+        e.g. out['airport']; rows are re-normalized
+    n_lists : int (optional)
+        Number of clusters (default: about sqrt(num_items))
+    n_probe : int
+        Default number of clusters scanned per query. Higher = better recall, slower queries;
+        n_probe = n_lists is an exact search.
+    max_train_points : int
+        k-means is fit on a random sample of at most this many rows
+    """
+
+    def __init__(self, embeddings, n_lists=None, n_probe=8, n_iter=10, max_train_points=100_000, seed=0):
+        self.embeddings = _normalize(_as_numpy(embeddings))
+        num_items = len(self.embeddings)
+        self.n_lists = min(n_lists or max(1, int(np.sqrt(num_items))), num_items)
+        self.n_probe = n_probe
+
+        rng = np.random.default_rng(seed)
+        train = self.embeddings
+        if num_items > max_train_points:
+            train = train[rng.choice(num_items, max_train_points, replace=False)]
+        self.centroids = spherical_kmeans(train, self.n_lists, n_iter=n_iter, seed=seed)
+
+        # Inverted lists stored CSR-style: item ids grouped by cluster, with offsets
+        labels = _assign(self.embeddings, self.centroids)
+        self.item_ids = np.argsort(labels, kind='stable')
+        self.list_ptr = np.searchsorted(labels[self.item_ids], np.arange(self.n_lists + 1))
+        # Cluster-ordered copy of the vectors, so each probed list is a contiguous slice
+        self.list_vectors = self.embeddings[self.item_ids]
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def _search_one(self, query, k, n_probe):
+        probe = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        slices = [slice(self.list_ptr[c], self.list_ptr[c + 1]) for c in probe]
+        candidates = np.concatenate([self.item_ids[s] for s in slices])
+        scores = np.concatenate([self.list_vectors[s] @ query for s in slices])
+
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return scores[top], candidates[top]
+
+    def search(self, queries, k=20, n_probe=None):
+        """
+        Approximate top-k items by cosine similarity
+
+        Parameters:
+        -----------
+        queries : Tensor or ndarray [dim] or [num_queries, dim]
+        k : int
+            Number of neighbors (clipped to the number of items)
+        n_probe : int (optional)
+            Overrides the index default for this call
+
+        Returns:
+        --------
+        (scores, indices), each [num_queries, k] (or [k] for a single query), sorted by descending
+        cosine similarity. Rows with fewer than k candidates are padded with -inf / -1.
+        Apply a sigmoid to the scores to get the model's link probabilities.
+        """
+        queries = _normalize(_as_numpy(queries))
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        k = min(k, len(self))
+
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, query in enumerate(queries):
+            row_scores, row_indices = self._search_one(query, k, n_probe)
+            scores[i, :len(row_scores)] = row_scores
+            indices[i, :len(row_indices)] = row_indices
+
+        if single:
+            return scores[0], indices[0]
+        return scores, indices
+
+    def recall(self, queries, k=20, n_probe=None):
+        """Fraction of the exact top-k recovered by search(), to tune n_probe."""
+        queries = np.atleast_2d(_normalize(_as_numpy(queries)))
+        _, approx = self.search(queries, k, n_probe)
+        k = approx.shape[1]
+        exact = np.argpartition(-(queries @ self.embeddings.T), k - 1, axis=1)[:, :k]
+        hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approx, exact))
+        return hits / exact.size
@@ -0,0 +1,129 @@
+"""
+Cache of HGTDetector node embeddings
+Embeddings are computed with one forward pass per (model checkpoint, graph snapshot) pair,
+saved to disk and memory-mapped back, so evaluation, scoring and explanation code share a
+single forward pass instead of each running the model.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import torch
+
+from scoring import lineage_hotspots
+
+# Bump when the stored layout changes to invalidate existing embedding files
+EMBEDDING_STORE_VERSION = 1
+
+
+def _hash_tensor(digest, name, tensor):
+    tensor = tensor.detach().cpu().contiguous()
+    digest.update(f'{name}:{tensor.dtype}:{tuple(tensor.shape)}'.encode())
+    digest.update(tensor.reshape(-1).view(torch.uint8).numpy().data)
+
+
+def model_hash(model):
+    """Hash of a model's parameters and buffers (its checkpoint)."""
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        _hash_tensor(digest, name, tensor)
+    return digest.hexdigest()[:16]
+
+
+def graph_hash(data):
+    """Hash of the node features and edge indices of a (snapshot) HeteroData graph."""
+    digest = hashlib.sha256()
+    for node_type, x in sorted(data.x_dict.items()):
+        _hash_tensor(digest, node_type, x)
+    for edge_type, edge_index in sorted(data.edge_index_dict.items()):
+        _hash_tensor(digest, '__'.join(edge_type), edge_index)
+    return digest.hexdigest()[:16]
+
+
+class NodeEmbeddings:
+    """
+    Lineage and airport embeddings of one trained model on one graph
+
+    Scores follow HGTDetector: cosine similarity of the L2-normalized embeddings, scaled by
+    the learned temperature before the sigmoid.
+    """
+
+    def __init__(self, lineage, airport, temperature, key=None):
+        self.lineage = lineage
+        self.airport = airport
+        self.temperature = float(temperature)
+        self.key = key
+
+    def to(self, device):
+        return NodeEmbeddings(self.lineage.to(device), self.airport.to(device), self.temperature, self.key)
+
+    def cosine(self, edge_index):
+        """Cosine similarity of (lineage, airport) pairs [2, num_edges]."""
+        return (self.lineage[edge_index[0]] * self.airport[edge_index[1]]).sum(dim=-1)
+
+    def probability(self, edge_index, scaled=True):
+        """Link probability of (lineage, airport) pairs; scaled=False skips the temperature."""
+        scores = self.cosine(edge_index)
+        return (scores * self.temperature if scaled else scores).sigmoid()
+
+    def hotspots(self, lineage_idx, k=20, scaled=False):
+        """Top-k airports for one lineage, as (probabilities, airport indices)."""
+        return lineage_hotspots(self.lineage[lineage_idx], self.airport, k=k,
+                                temperature=self.temperature if scaled else 1.0)
+
+
+class EmbeddingStore:
+    """
+    Embedding files keyed by (model checkpoint hash, graph snapshot hash)
+
+    Parameters:
+    -----------
+    cache_dir : str or Path
+        Directory of the embedding files
+    mmap : bool
+        Memory-map cached embeddings instead of reading them into memory
+    """
+
+    def __init__(self, cache_dir='./data1/processed/cache/embeddings', mmap=True):
+        self.cache_dir = Path(cache_dir)
+        self.mmap = mmap
+        self._loaded = {}
+
+    def path(self, key):
+        return self.cache_dir / f'emb-v{EMBEDDING_STORE_VERSION}-{key[0]}-{key[1]}.pt'
+
+    @torch.no_grad()
+    def get(self, model, data, refresh=False):
+        """
+        Embeddings of `model` on `data`, computed on first use and served from the store afterwards
+
+        Returns:
+        --------
+        NodeEmbeddings (on CPU)
+        """
+        key = (model_hash(model), graph_hash(data))
+        if not refresh and key in self._loaded:
+            return self._loaded[key]
+
+        path = self.path(key)
+        if refresh or not path.exists():
+            was_training = model.training
+            model.eval()
+            out = model(data.x_dict, data.edge_index_dict)
+            model.train(was_training)
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            torch.save({
+                'version': EMBEDDING_STORE_VERSION,
+                'lineage': out['lineage'].cpu(),
+                'airport': out['airport'].cpu(),
+                'temperature': float(model.temperature),
+            }, tmp_path)
+            os.replace(tmp_path, path)
+
+        stored = torch.load(path, mmap=self.mmap, weights_only=True)
+        embeddings = NodeEmbeddings(stored['lineage'], stored['airport'], stored['temperature'], key)
+        self._loaded[key] = embeddings
+        return embeddings
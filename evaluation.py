@@ -0,0 +1,265 @@
+"""
+Evaluation helpers for (lineage, airport) link prediction
+Edge sets are compared as int64 keys `lineage * num_airports + airport`, so membership
+tests over millions of edges are single tensor operations instead of Python loops.
+
+Negatives for evaluation come from a fixed, seeded pool per test split, so AUC, ROC curves and
+threshold analysis all score the same pairs and numbers are comparable across runs.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+import torch
+
+
+def edge_keys(edge_index, num_airports):
+    """Encode (lineage, airport) pairs [2, num_edges] as int64 keys lineage * num_airports + airport."""
+    return edge_index[0].long() * num_airports + edge_index[1].long()
+
+
+def reachable_airports(hg, edge_types=(('airport', 'flight', 'airport'), ('airport', 'near', 'airport'))):
+    """Boolean mask of airports with at least one flight (or proximity) connection."""
+    mask = torch.zeros(hg['airport'].num_nodes, dtype=torch.bool)
+    for edge_type in edge_types:
+        if edge_type in hg.edge_types:
+            mask[hg[edge_type].edge_index.flatten().cpu()] = True
+    return mask
+
+
+def partition_test_edges(train_edge_index, test_edge_index, num_airports, reachable=None):
+    """
+    Split test (lineage, airport) edges into recurring and novel ones in one pass
+
+    Parameters:
+    -----------
+    train_edge_index : Tensor [2, num_train_edges]
+        Edges known at the start of the test period
+    test_edge_index : Tensor [2, num_test_edges]
+    num_airports : int
+    reachable : Tensor (optional)
+        Boolean mask over airports (see reachable_airports)
+
+    Returns:
+    --------
+    dict of boolean masks over the test edges:
+        'recurring' -- the pair already occurs in the training edges
+        'novel'     -- the pair is new (a new outbreak)
+        'reachable' -- the airport is reachable (all True if no mask is given)
+    """
+    train_edge_index, test_edge_index = train_edge_index.cpu(), test_edge_index.cpu()
+    train_keys = edge_keys(train_edge_index, num_airports).unique()
+    recurring = torch.isin(edge_keys(test_edge_index, num_airports), train_keys)
+
+    if reachable is None:
+        reachable_mask = torch.ones_like(recurring)
+    else:
+        reachable_mask = reachable.cpu()[test_edge_index[1]]
+
+    return {'recurring': recurring, 'novel': ~recurring, 'reachable': reachable_mask}
+
+
+def _sample_pairs(num_lineages, airports, count, generator):
+    lineages = torch.randint(num_lineages, (count,), generator=generator)
+    if isinstance(airports, int):
+        dst = torch.randint(airports, (count,), generator=generator)
+    else:
+        dst = airports[torch.randint(len(airports), (count,), generator=generator)]
+    return torch.stack([lineages, dst])
+
+
+def _pool_key(test_edge_index, num_lineages, num_airports, num_negatives, exclude_edge_index, hard_airports,
+              hard_ratio, seed):
+    """Digest of every input that defines a negative pool."""
+    digest = hashlib.sha256()
+    for tensor in (test_edge_index, exclude_edge_index, hard_airports):
+        if tensor is None:
+            digest.update(b'none')
+            continue
+        tensor = tensor.cpu().contiguous()
+        digest.update(f'{tensor.dtype}:{tuple(tensor.shape)}'.encode())
+        digest.update(tensor.numpy().tobytes())
+    digest.update(repr((num_lineages, num_airports, num_negatives, float(hard_ratio), seed)).encode())
+    return digest.hexdigest()
+
+
+def negative_pool(test_edge_index, num_lineages, num_airports, num_negatives=None, exclude_edge_index=None,
+                  hard_airports=None, hard_ratio=0.0, seed=0, path=None):
+    """
+    Fixed, seeded pool of (lineage, airport) negatives for a test split
+
+    Parameters:
+    -----------
+    test_edge_index : Tensor [2, num_test_edges]
+        Positive test edges; never drawn as negatives
+    num_lineages, num_airports : int
+    num_negatives : int (optional)
+        Pool size (default: one negative per test edge)
+    exclude_edge_index : Tensor (optional)
+        Further pairs never drawn as negatives, e.g. the training edges
+    hard_airports : Tensor (optional)
+        Boolean airport mask (e.g. reachable_airports(hg)); a `hard_ratio` share of the
+        negatives is drawn with airports from this set only
+    seed : int
+        The same inputs and seed always give the same pool
+    path : str or Path (optional)
+        Load the pool from this file if it was built from the same inputs, otherwise build it
+        and save it there (the file stores a digest of all the arguments above)
+
+    Returns:
+    --------
+    Tensor [2, num_negatives] of distinct negative pairs
+    """
+    test_edge_index = test_edge_index.cpu()
+    num_negatives = num_negatives if num_negatives is not None else test_edge_index.size(1)
+    num_negatives = min(num_negatives, num_lineages * num_airports)
+
+    key = _pool_key(test_edge_index, num_lineages, num_airports, num_negatives, exclude_edge_index,
+                    hard_airports, hard_ratio, seed)
+    if path is not None and Path(path).exists():
+        stored = torch.load(path, weights_only=True)
+        # Pools saved for other inputs (or before the digest was stored) are rebuilt
+        if isinstance(stored, dict) and stored.get('key') == key:
+            return stored['pool']
+
+    positives = edge_keys(test_edge_index, num_airports)
+    if exclude_edge_index is not None:
+        positives = torch.cat([positives, edge_keys(exclude_edge_index.cpu(), num_airports)])
+    positives = positives.unique()
+
+    generator = torch.Generator().manual_seed(seed)
+    num_hard = int(round(num_negatives * hard_ratio)) if hard_airports is not None else 0
+    hard_ids = hard_airports.cpu().nonzero().flatten() if num_hard else None
+    if hard_ids is not None and not len(hard_ids):
+        num_hard = 0
+
+    # Draw in rounds, oversampling to absorb rejected positives and duplicates
+    keys = torch.empty(0, dtype=torch.long)
+    for target, airports in ((num_hard, hard_ids), (num_negatives, num_airports)):
+        for _ in range(100):
+            missing = target - len(keys)
+            if missing <= 0:
+                break
+            candidates = edge_keys(_sample_pairs(num_lineages, airports, 2 * missing + 16, generator), num_airports)
+            candidates = candidates[~torch.isin(candidates, positives) & ~torch.isin(candidates, keys)]
+            # Keep the first occurrence of each candidate, in draw order
+            unique, inverse = candidates.unique(return_inverse=True)
+            first = torch.full((len(unique),), len(candidates), dtype=torch.long).scatter_reduce_(
+                0, inverse, torch.arange(len(candidates)), reduce='amin')
+            keys = torch.cat([keys, candidates[first.sort().values][:missing]])
+
+    pool = torch.stack([keys // num_airports, keys % num_airports])
+    if path is not None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        torch.save({'key': key, 'pool': pool}, tmp_path)
+        os.replace(tmp_path, path)
+    return pool
+
+
+def negative_pool_path(cache_dir, test_edge_index, seed=0, **params):
+    """
+    File name for a negative pool keyed by the test edges, seed and sampling parameters
+
+    negative_pool() also checks the digest of all its inputs stored in the file, so a pool
+    built with other exclusions, hard airports or sizes is rebuilt rather than reused.
+    """
+    digest = hashlib.sha256(test_edge_index.cpu().contiguous().numpy().tobytes())
+    digest.update(repr((seed, sorted(params.items()))).encode())
+    return Path(cache_dir) / f'negatives-{digest.hexdigest()[:16]}.pt'
+
+
+# ========== RANKING METRICS ==========
+
+def _rank_positives(scores, positive_mask, ks):
+    """Per-query reciprocal rank of the first positive, and hits / recall at each K, over full rankings."""
+    order = scores.argsort(dim=1, descending=True, stable=True)
+    hit = positive_mask.gather(1, order)
+    num_pos = positive_mask.sum(dim=1)
+
+    first_rank = hit.to(torch.int8).argmax(dim=1) + 1
+    metrics = {'mrr': torch.where(num_pos > 0, 1.0 / first_rank, torch.zeros_like(first_rank, dtype=torch.float))}
+    for k in ks:
+        top_hits = hit[:, :k].sum(dim=1)
+        metrics[f'hits@{k}'] = (top_hits > 0).float()
+        metrics[f'recall@{k}'] = top_hits / num_pos.clamp(min=1)
+    return metrics
+
+
+@torch.no_grad()
+def ranking_metrics(lineage_embs, airport_embs, edge_index, edge_weeks, ks=(1, 10, 50), batch_size=1024):
+    """
+    Hits@K, MRR and recall@K per week, ranking all airports for every lineage
+
+    For each week, every lineage with test edges that week is a query; its positives are the
+    airports where it was sampled that week. Airports are ranked by embedding dot product.
+
+    Parameters:
+    -----------
+    lineage_embs, airport_embs : Tensor
+        e.g. NodeEmbeddings.lineage / .airport
+    edge_index : Tensor [2, num_test_edges]
+    edge_weeks : Tensor [num_test_edges]
+        Week index of each test edge
+    ks : tuple of int
+    batch_size : int
+        Lineages scored at a time; memory is about batch_size × num_airports
+
+    Returns:
+    --------
+    DataFrame with one row per week: week, num_queries, mrr, hits@K and recall@K (means over lineages)
+    """
+    edge_index, edge_weeks = edge_index.cpu(), edge_weeks.cpu().long()
+    lineage_embs, airport_embs = lineage_embs.cpu(), airport_embs.cpu()
+    num_airports = airport_embs.size(0)
+
+    rows = []
+    for week in edge_weeks.unique().tolist():
+        pos = edge_index[:, edge_weeks == week]
+        queries = pos[0].unique()
+        sums = {}
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            in_batch = (pos[0] >= batch[0]) & (pos[0] <= batch[-1])
+            positive_mask = torch.zeros(len(batch), num_airports, dtype=torch.bool)
+            positive_mask[torch.searchsorted(batch, pos[0, in_batch]), pos[1, in_batch]] = True
+
+            scores = lineage_embs[batch] @ airport_embs.t()
+            for name, values in _rank_positives(scores, positive_mask, ks).items():
+                sums[name] = sums.get(name, 0.0) + float(values.sum())
+
+        rows.append({'week': week, 'num_queries': len(queries),
+                     **{name: total / len(queries) for name, total in sums.items()}})
+    return pd.DataFrame(rows)
+
+
+def aggregate_ranking_metrics(airport_risk, positive_airports, ks=(50,)):
+    """
+    Ranking metrics for a single aggregated risk ranking, e.g. one simulation week
+
+    Parameters:
+    -----------
+    airport_risk : Tensor [num_airports]
+        Risk score per airport
+    positive_airports : Tensor
+        Indices of airports that actually had samples
+
+    Returns:
+    --------
+    dict with mrr, hits@K, recall@K, precision@K and the hit count at each K
+    """
+    airport_risk = airport_risk.cpu()
+    positive_mask = torch.zeros(1, airport_risk.numel(), dtype=torch.bool)
+    positive_mask[0, positive_airports.cpu()] = True
+    metrics = {name: float(values[0]) for name, values in _rank_positives(airport_risk.unsqueeze(0), positive_mask, ks).items()}
+
+    # Same stable order as _rank_positives; hits are counted, not recovered from recall
+    hit = positive_mask[0, airport_risk.argsort(descending=True, stable=True)]
+    for k in ks:
+        hits = int(hit[:k].sum())
+        metrics[f'num_hits@{k}'] = hits
+        metrics[f'precision@{k}'] = hits / min(k, airport_risk.numel())
+    return metrics
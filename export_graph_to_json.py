@@ -1,28 +1,434 @@
 """
 Export HeteroData graph to JSON format for D3.js visualization
 This script extracts the graph data and prepares it for web visualization
+
+Each node and edge type is converted to NumPy columns once and streamed to disk in chunks,
+as compact JSON (nodes / links records, the layout read by visualization.js), newline-
+delimited JSON, or a columnar JSON layout of parallel arrays per node and edge type.
+
+The binary format is the columnar layout with numeric columns as raw little-endian
+Int32 / Float32 blobs, which the explorer loads straight into typed arrays:
+    b'HGTB' | uint32 header length | JSON header (space-padded to 4 bytes) | column blobs
+The header lists every column's dtype, byte offset (from the end of the header) and length;
+string columns (codes, names, cities) are stored in the header itself.
+
+Command line: export a lineage-first visualization subgraph from a graph artifact, or
+filter an existing JSON / NDJSON export by streaming it (see main()):
+    python export_graph_to_json.py --artifact data1/processed/cache/graph-v3-<key>.pt \
+        --output visualization/graph_data_viz.json --max-edges 10000
+    python export_graph_to_json.py --input visualization/graph_data_full.json \
+        --output visualization/graph_data_viz.json --max-flights 5000
 """
 
-import torch
+import argparse
+import heapq
 import json
-import pandas as pd
-import numpy as np
+import math
+import re
+import struct
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+
+# Exported edge types: link type name, source / target node types, and the edge_attr
+# columns exported as fields, with their default when the edge type has no edge_attr
+EDGE_EXPORTS = {
+    ('airport', 'flight', 'airport'): ('flight', {'weight': (0, 1.0)}),
+    ('lineage', 'sampled_at', 'airport'): ('sampled_at', {'weight': (0, 1.0), 'week': (1, 0)}),
+    ('lineage', 'evolves_from', 'lineage'): ('evolves_from', {'weight': (0, 1.0)}),
+    ('lineage', 'temporal', 'lineage'): ('temporal', {'weight': (2, 1.0), 'time_start': (0, 0), 'time_end': (1, 0)}),
+}
+
+EXPORT_FORMATS = ('json', 'ndjson', 'columnar', 'binary')
+
+# How sample_size picks nodes: uniformly at random, the busiest nodes (flight volume / samples),
+# or the nodes closest to a set of seed lineages
+SAMPLING_MODES = ('uniform', 'degree', 'khop')
+
+BINARY_MAGIC = b'HGTB'
+BINARY_VERSION = 1
+
+# Rows serialized per write
+CHUNK_SIZE = 100_000
+
+
+def _sample_nodes(num_nodes, size):
+    """Boolean mask of the exported nodes (uniform sample of `size` nodes, or all)."""
+    mask = np.zeros(num_nodes, dtype=bool)
+    if size is None or size >= num_nodes:
+        mask[:] = True
+    else:
+        mask[np.random.choice(num_nodes, size, replace=False)] = True
+    return mask
+
+
+def _edge_weights(store):
+    edge_index = store.edge_index.cpu().numpy()
+    if 'edge_attr' in store:
+        return edge_index, store.edge_attr[:, 0].cpu().numpy().astype(np.float64)
+    return edge_index, np.ones(edge_index.shape[1])
+
+
+def node_importance(hg, num_nodes):
+    """
+    Importance of every airport and lineage, for sampling
+
+    Airports score their flight volume (flights in and out) plus the samples taken there;
+    lineages score their number of samples.
+
+    Parameters:
+    -----------
+    num_nodes : dict
+        {'airport': num_airports, 'lineage': num_lineages}
+
+    Returns:
+    --------
+    dict {node_type: float64 array [num_nodes]}
+    """
+    importance = {node_type: np.zeros(n) for node_type, n in num_nodes.items()}
+    for edge_type in (('airport', 'flight', 'airport'), ('lineage', 'sampled_at', 'airport')):
+        if edge_type not in hg.edge_types:
+            continue
+        edge_index, weights = _edge_weights(hg[edge_type])
+        for row, node_type in ((0, edge_type[0]), (1, edge_type[2])):
+            importance[node_type] += np.bincount(edge_index[row], weights=weights,
+                                                 minlength=num_nodes[node_type])[:num_nodes[node_type]]
+    return importance
+
+
+def hop_distance(hg, seeds, num_nodes, num_hops=2):
+    """
+    Hop distance of every node from the seed nodes, over all exported edge types (undirected)
+
+    Parameters:
+    -----------
+    seeds : dict
+        {node_type: array of seed node indices}
+    num_nodes : dict
+        {node_type: number of nodes}
+    num_hops : int
+        Nodes further than this keep an infinite distance
+
+    Returns:
+    --------
+    dict {node_type: float64 array [num_nodes]}, 0 for seeds and inf for unreached nodes
+    """
+    distance = {node_type: np.full(n, np.inf) for node_type, n in num_nodes.items()}
+    for node_type, index in seeds.items():
+        distance[node_type][index] = 0
+    edges = [(edge_type, hg[edge_type].edge_index.cpu().numpy())
+             for edge_type in EDGE_EXPORTS if edge_type in hg.edge_types]
+
+    for hop in range(1, num_hops + 1):
+        frontier = {node_type: d == hop - 1 for node_type, d in distance.items()}
+        for (src_type, _, dst_type), edge_index in edges:
+            for from_type, to_type, a, b in ((src_type, dst_type, edge_index[0], edge_index[1]),
+                                             (dst_type, src_type, edge_index[1], edge_index[0])):
+                reached = b[frontier[from_type][a]]
+                distance[to_type][reached] = np.minimum(distance[to_type][reached], hop)
+    return distance
+
+
+def _top_nodes(num_nodes, size, importance, distance=None):
+    """Boolean mask of the `size` nodes closest to the seeds (if given), then most important."""
+    if distance is None:
+        order = np.argsort(-importance, kind='stable')
+    else:
+        order = np.lexsort((-importance, distance))
+        order = order[np.isfinite(distance[order])]
+    mask = np.zeros(num_nodes, dtype=bool)
+    mask[order[:size]] = True
+    return mask
+
+
+def _select_nodes(hg, num_nodes, sample_size, sampling, seed_lineages, num_hops):
+    """Node masks per type, and node importance (None for uniform sampling)."""
+    if sampling == 'uniform':
+        masks = {node_type: _sample_nodes(n, sample_size.get(f'{node_type}s')) for node_type, n in num_nodes.items()}
+        return masks, None
+
+    importance = node_importance(hg, num_nodes)
+    distance = {node_type: None for node_type in num_nodes}
+    if sampling == 'khop':
+        if seed_lineages is None:
+            seed_lineages = np.flatnonzero(_top_nodes(num_nodes['lineage'], sample_size.get('lineages'),
+                                                      importance['lineage']))
+        distance = hop_distance(hg, {'lineage': np.asarray(seed_lineages, dtype=np.int64)}, num_nodes, num_hops)
+
+    masks = {node_type: _top_nodes(n, sample_size.get(f'{node_type}s'), importance[node_type], distance[node_type])
+             for node_type, n in num_nodes.items()}
+    return masks, importance
+
+
+def graph_columns(hg, airport_to_idx, lineage_to_idx, idx_to_airport=None, idx_to_lineage=None,
+                  flights_df=None, sample_size=None, airport_table=None, sampling='uniform',
+                  seed_lineages=None, num_hops=2):
+    """
+    Node and edge columns of the exported graph, as NumPy arrays
+
+    Airport coordinates and locations come from `airport_table` (see build_airport_table),
+    built from `flights_df` if not given; airports missing from it get 0 / ''.
+    See export_hetero_graph_to_json for the sampling parameters.
+
+    Returns:
+    --------
+    dict with
+        'nodes': {node_type: {field: array}}, 'index' being the node index
+        'links': {link_type: {'source': array, 'target': array, field: array}}, with node indices
+        'node_types': {link_type: (source node type, target node type)}
+    """
+    if idx_to_airport is None:
+        idx_to_airport = {v: k for k, v in airport_to_idx.items()}
+    if idx_to_lineage is None:
+        idx_to_lineage = {v: k for k, v in lineage_to_idx.items()}
+    sample_size = sample_size or {}
+
+    # ========== NODES ==========
+    num_nodes = {'airport': len(airport_to_idx), 'lineage': len(lineage_to_idx)}
+    if seed_lineages is not None:
+        seed_lineages = [lineage_to_idx[l] if isinstance(l, str) else int(l) for l in seed_lineages]
+    masks, importance = _select_nodes(hg, num_nodes, sample_size, sampling, seed_lineages, num_hops)
+
+    airport_index = np.flatnonzero(masks['airport'])
+    codes = [idx_to_airport[i] for i in airport_index.tolist()]
+    if airport_table is None and flights_df is not None:
+        from graph_construction import build_airport_table
+
+        airport_table = build_airport_table(flights_df)
+    if airport_table is not None:
+        locations = airport_table.reindex(codes)
+    else:
+        locations = pd.DataFrame(index=codes, columns=['lat', 'lon', 'city', 'country', 'region'])
+    coordinates = locations[['lat', 'lon']].astype(np.float64).fillna(0.0)
+    places = locations[['city', 'country', 'region']].astype(object).fillna('')
+
+    lineage_index = np.flatnonzero(masks['lineage'])
+    nodes = {
+        'airport': {
+            'index': airport_index,
+            'code': codes,
+            'lat': coordinates['lat'].to_numpy(),
+            'lon': coordinates['lon'].to_numpy(),
+            'city': places['city'].astype(str).tolist(),
+            'country': places['country'].astype(str).tolist(),
+            'region': places['region'].astype(str).tolist(),
+        },
+        'lineage': {
+            'index': lineage_index,
+            'name': [idx_to_lineage[i] for i in lineage_index.tolist()],
+        },
+    }
+
+    # ========== EDGES ==========
+    max_edges = sample_size.get('edges')
+    links, node_types = {}, {}
+    for edge_type, (name, fields) in EDGE_EXPORTS.items():
+        if edge_type not in hg.edge_types:
+            continue
+        store = hg[edge_type]
+        edge_index = store.edge_index.cpu().numpy()
+        edge_attr = store.edge_attr.cpu().numpy() if 'edge_attr' in store else None
+
+        keep = np.arange(edge_index.shape[1])
+        if importance is None:
+            # Sample edges, then keep only those between exported nodes
+            if max_edges and len(keep) > max_edges:
+                keep = np.sort(np.random.choice(len(keep), max_edges, replace=False))
+            keep = keep[masks[edge_type[0]][edge_index[0, keep]] & masks[edge_type[2]][edge_index[1, keep]]]
+        else:
+            # Keep the edges induced by the selected nodes, then the ones between the most
+            # important endpoints if there are too many
+            keep = keep[masks[edge_type[0]][edge_index[0]] & masks[edge_type[2]][edge_index[1]]]
+            if max_edges and len(keep) > max_edges:
+                score = (importance[edge_type[0]][edge_index[0, keep]] / max(importance[edge_type[0]].max(), 1e-12)
+                         + importance[edge_type[2]][edge_index[1, keep]] / max(importance[edge_type[2]].max(), 1e-12))
+                keep = np.sort(keep[np.argsort(-score, kind='stable')[:max_edges]])
+        src, dst = edge_index[0, keep], edge_index[1, keep]
+
+        columns = {'source': src, 'target': dst}
+        for field, (col, default) in fields.items():
+            dtype = np.float64 if isinstance(default, float) else np.int64
+            if edge_attr is not None and edge_attr.shape[1] > col:
+                columns[field] = np.nan_to_num(edge_attr[keep, col].astype(dtype), nan=default)
+            else:
+                columns[field] = np.full(len(keep), default, dtype=dtype)
+        links[name] = columns
+        node_types[name] = (edge_type[0], edge_type[2])
+
+    return {'nodes': nodes, 'links': links, 'node_types': node_types}
+
+
+def _node_records(node_type, columns):
+    """Node dicts in the layout read by visualization.js, yielded in chunks."""
+    fields = [f for f in columns if f != 'index']
+    index = columns['index']
+    for start in range(0, len(index), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        values = [columns[f][start:stop] for f in fields]
+        values = [v.tolist() if isinstance(v, np.ndarray) else v for v in values]
+        records = []
+        for i, label, *rest in zip(index[start:stop].tolist(), *values):
+            record = {'id': f'{node_type}_{i}', 'index': i, fields[0]: label, 'type': node_type}
+            record.update(zip(fields[1:], rest))
+            records.append(record)
+        yield records
+
+
+def _link_records(name, columns, source_type, target_type):
+    """Link dicts in the layout read by visualization.js, yielded in chunks."""
+    fields = [f for f in columns if f not in ('source', 'target')]
+    for start in range(0, len(columns['source']), CHUNK_SIZE):
+        stop = start + CHUNK_SIZE
+        values = [columns[f][start:stop].tolist() for f in fields]
+        yield [
+            {'source': f'{source_type}_{s}', 'target': f'{target_type}_{t}', 'type': name, **dict(zip(fields, row))}
+            for s, t, *row in zip(columns['source'][start:stop].tolist(), columns['target'][start:stop].tolist(),
+                                  *values)
+        ]
+
+
+def _iter_records(graph):
+    for node_type, columns in graph['nodes'].items():
+        for chunk in _node_records(node_type, columns):
+            yield 'node', chunk
+    for name, columns in graph['links'].items():
+        for chunk in _link_records(name, columns, *graph['node_types'][name]):
+            yield 'link', chunk
+
+
+def _write_json(graph, metadata, fh):
+    dumps = json.JSONEncoder(separators=(',', ':'), allow_nan=False).encode
+    fh.write('{"nodes":[')
+    section, first = 'node', True
+    for kind, chunk in _iter_records(graph):
+        if kind != section:
+            fh.write('],"links":[')
+            section, first = kind, True
+        if chunk:
+            fh.write(('' if first else ',') + ','.join(map(dumps, chunk)))
+            first = False
+    if section == 'node':
+        fh.write('],"links":[')
+    fh.write('],"metadata":' + dumps(metadata) + '}')
+
+
+def _write_ndjson(graph, metadata, fh):
+    dumps = json.JSONEncoder(separators=(',', ':'), allow_nan=False).encode
+    fh.write(dumps({'metadata': metadata}) + '\n')
+    for _, chunk in _iter_records(graph):
+        if chunk:
+            fh.write('\n'.join(map(dumps, chunk)) + '\n')
+
+
+def _write_columnar(graph, metadata, fh):
+    dumps = json.JSONEncoder(separators=(',', ':'), allow_nan=False).encode
+
+    def write_columns(columns):
+        fh.write('{' + ','.join(
+            dumps(field) + ':' + dumps(values.tolist() if isinstance(values, np.ndarray) else values)
+            for field, values in columns.items()
+        ) + '}')
+
+    fh.write('{"nodes":{')
+    for i, (node_type, columns) in enumerate(graph['nodes'].items()):
+        fh.write((',' if i else '') + dumps(node_type) + ':')
+        write_columns(columns)
+    fh.write('},"links":{')
+    for i, (name, columns) in enumerate(graph['links'].items()):
+        source_type, target_type = graph['node_types'][name]
+        fh.write((',' if i else '') + dumps(name) + ':')
+        write_columns({'source_type': source_type, 'target_type': target_type, **columns})
+    fh.write('},"metadata":' + dumps(metadata) + '}')
+
+
+def _write_binary(graph, metadata, fh):
+    blobs, offset = [], 0
+
+    def add(values):
+        nonlocal offset
+        blob = np.ascontiguousarray(values, dtype='<f4' if values.dtype.kind == 'f' else '<i4')
+        blobs.append(blob)
+        spec = {'dtype': 'float32' if blob.dtype.kind == 'f' else 'int32', 'offset': offset, 'length': len(blob)}
+        offset += blob.nbytes
+        return spec
+
+    def split(columns):
+        numeric = {f: add(v) for f, v in columns.items() if isinstance(v, np.ndarray)}
+        strings = {f: v for f, v in columns.items() if not isinstance(v, np.ndarray)}
+        return numeric, strings
+
+    header = {'version': BINARY_VERSION, 'metadata': metadata, 'nodes': {}, 'links': {}}
+    for node_type, columns in graph['nodes'].items():
+        numeric, strings = split(columns)
+        header['nodes'][node_type] = {'count': len(columns['index']), 'columns': numeric, 'strings': strings}
+    for name, columns in graph['links'].items():
+        numeric, _ = split(columns)
+        source_type, target_type = graph['node_types'][name]
+        header['links'][name] = {'source_type': source_type, 'target_type': target_type,
+                                 'count': len(columns['source']), 'columns': numeric}
+
+    encoded = json.dumps(header, separators=(',', ':')).encode()
+    encoded += b' ' * (-len(encoded) % 4)  # keep the blobs 4-byte aligned for typed arrays
+    fh.write(BINARY_MAGIC + struct.pack('<I', len(encoded)) + encoded)
+    for blob in blobs:
+        fh.write(blob.tobytes())
+
+
+def load_binary_graph(path):
+    """
+    Read a binary export back as NumPy columns (memory-mapped)
+
+    Returns:
+    --------
+    dict with 'metadata', 'nodes' {node_type: {field: array or list}} and
+    'links' {link_type: {'source_type', 'target_type', field: array}}
+    """
+    with open(path, 'rb') as fh:
+        if fh.read(4) != BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary graph export")
+        header_length, = struct.unpack('<I', fh.read(4))
+        header = json.loads(fh.read(header_length))
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=8 + header_length)
+
+    def column(spec):
+        dtype = np.dtype('<f4' if spec['dtype'] == 'float32' else '<i4')
+        return data[spec['offset']:spec['offset'] + spec['length'] * dtype.itemsize].view(dtype)
+
+    nodes = {
+        node_type: {**{f: column(spec) for f, spec in entry['columns'].items()}, **entry['strings']}
+        for node_type, entry in header['nodes'].items()
+    }
+    links = {
+        name: {'source_type': entry['source_type'], 'target_type': entry['target_type'],
+               **{f: column(spec) for f, spec in entry['columns'].items()}}
+        for name, entry in header['links'].items()
+    }
+    return {'metadata': header['metadata'], 'nodes': nodes, 'links': links}
+
+
+_WRITERS = {'json': _write_json, 'ndjson': _write_ndjson, 'columnar': _write_columnar, 'binary': _write_binary}
+
+
 def export_hetero_graph_to_json(
-    hg, 
-    airport_to_idx, 
+    hg,
+    airport_to_idx,
     lineage_to_idx,
     idx_to_airport=None,
     idx_to_lineage=None,
     flights_df=None,
     metadata_df=None,
     output_file='graph_data.json',
-    sample_size=None
+    sample_size=None,
+    format='json',
+    airport_table=None,
+    sampling='uniform',
+    seed_lineages=None,
+    num_hops=2
 ):
     """
     Export HeteroData graph to JSON format for D3.js visualization
-    
+
     Parameters:
     -----------
     hg : HeteroData
@@ -36,7 +442,7 @@ def export_hetero_graph_to_json(
     idx_to_lineage : dict (optional)
         Reverse mapping from index to lineage name
     flights_df : DataFrame (optional)
-        Flight data with airport coordinates
+        Flight data with airport coordinates; only used to build `airport_table` if it is not given
     metadata_df : DataFrame (optional)
         Genome metadata
     output_file : str
@@ -44,234 +450,273 @@ def export_hetero_graph_to_json(
     sample_size : dict (optional)
         Dictionary with keys 'airports', 'lineages', 'edges' to sample data
         Example: {'airports': 500, 'lineages': 500, 'edges': 5000}
+        The edge limit applies per edge type.
+    format : str
+        'json'     -- {"nodes": [...], "links": [...], "metadata": {...}} (read by visualization.js)
+        'ndjson'   -- a metadata line, then one node or link object per line
+        'columnar' -- {"nodes": {type: {field: [...]}}, "links": {type: {"source": [...], ...}}},
+                      parallel arrays with node indices as link endpoints
+        'binary'   -- the columnar layout as Int32 / Float32 blobs (see the module docstring),
+                      loaded by visualization.js from graph_data.bin
+    airport_table : DataFrame (optional)
+        Precomputed airport table (build_airport_table, or artifact['airport_table']), indexed
+        by code with lat, lon, city, country and region
+    sampling : str
+        How sample_size picks nodes; edges are those between the picked nodes
+        'uniform' -- uniformly at random (edges are sampled uniformly too, so the result is
+                     often fragmented)
+        'degree'  -- the busiest airports (flight volume + samples) and lineages (samples);
+                     over the edge limit, edges between the most important endpoints are kept
+        'khop'    -- the nodes within `num_hops` hops of `seed_lineages` (default: the
+                     sample_size['lineages'] most sampled lineages), closest and busiest first
+    seed_lineages : list of str or int (optional)
+        Lineage names or indices to center 'khop' sampling on
+    num_hops : int
+        Radius of the 'khop' ball (2: sampling airports, then their flight neighbours)
+
+    Returns:
+    --------
+    dict : export metadata (node / edge counts per type)
     """
-    
-    # Create reverse mappings if not provided
-    if idx_to_airport is None:
-        idx_to_airport = {v: k for k, v in airport_to_idx.items()}
-    if idx_to_lineage is None:
-        idx_to_lineage = {v: k for k, v in lineage_to_idx.items()}
-    
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format} (expected one of {EXPORT_FORMATS})")
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {sampling} (expected one of {SAMPLING_MODES})")
+
     print("Exporting graph data...")
-    
-    # ========== NODES ==========
-    print("Processing airport nodes...")
-    airports = []
-    airport_coords = {}
-    
-    # Try to get airport coordinates from flights_df
-    if flights_df is not None:
-        # Assuming flights_df has columns like 'Country', 'City'
-        for _, row in flights_df.drop_duplicates('origin').iterrows():
-            if row['origin'] in airport_to_idx:
-                airport_coords[row['origin']] = {
-                    'lat': row.get('Latitude', 0),
-                    'lon': row.get('Longitude', 0),
-                    'city': row.get('City', 'Unknown City'),      # Added Metadata
-                    'country': row.get('Country', 'Unknown Country'), # Added Metadata
-                    'region': row.get('Region', '')               # Added Metadata (if exists)
-                }
-        
-        for _, row in flights_df.drop_duplicates('destination').iterrows():
-            if row['destination'] in airport_to_idx:
-                if row['destination'] not in airport_coords:
-                    airport_coords[row['destination']] = {
-                        'lat': row.get('Latitude_destination', 0),
-                        'lon': row.get('Longitude_destination', 0),
-                        'city': row.get('City_destination', ''),
-                        'country': row.get('Country_destination', '')
-                    }
-    
-    # Sample airports if requested
-    airport_indices = list(range(len(airport_to_idx)))
-    if sample_size and 'airports' in sample_size:
-        airport_indices = np.random.choice(
-            airport_indices, 
-            min(sample_size['airports'], len(airport_indices)), 
-            replace=False
-        )
-        airport_indices = set(airport_indices)
-    else:
-        airport_indices = set(airport_indices)
-    
-    for idx in sorted(airport_indices):
-        airport_code = idx_to_airport[idx]
-        coords = airport_coords.get(airport_code, {})
-        
-        airports.append({
-            'id': f'airport_{idx}',
-            'index': idx,
-            'code': airport_code,
-            'type': 'airport',
-            'lat': float(coords.get('lat', 0)),
-            'lon': float(coords.get('lon', 0)),
-            'city': coords.get('city', ''),       # Export it
-            'country': coords.get('country', '')  # Export it
-        })
-    
-    print(f"Exported {len(airports)} airport nodes")
-    
-    # Process lineage nodes
-    print("Processing lineage nodes...")
-    lineages = []
-    
-    # Sample lineages if requested
-    lineage_indices = list(range(len(lineage_to_idx)))
-    if sample_size and 'lineages' in sample_size:
-        lineage_indices = np.random.choice(
-            lineage_indices, 
-            min(sample_size['lineages'], len(lineage_indices)), 
-            replace=False
-        )
-        lineage_indices = set(lineage_indices)
-    else:
-        lineage_indices = set(lineage_indices)
-    
-    for idx in sorted(lineage_indices):
-        lineage_name = idx_to_lineage[idx]
-        lineages.append({
-            'id': f'lineage_{idx}',
-            'index': idx,
-            'name': lineage_name,
-            'type': 'lineage'
-        })
-    
-    print(f"Exported {len(lineages)} lineage nodes")
-    
-    # ========== EDGES ==========
-    edges = []
-    
-    # Helper function to sample edges
-    def sample_edges(edge_index, edge_type, max_edges=None):
-        num_edges = edge_index.shape[1]
-        if max_edges and num_edges > max_edges:
-            indices = np.random.choice(num_edges, max_edges, replace=False)
-            return edge_index[:, indices]
-        return edge_index
-    
-    max_edges_per_type = sample_size.get('edges', None) if sample_size else None
-    
-    # 1. Airport -> Airport (flights)
-    print("Processing flight edges...")
-    if ('airport', 'flight', 'airport') in hg.edge_types:
-        edge_index = hg['airport', 'flight', 'airport'].edge_index
-        edge_attr = hg['airport', 'flight', 'airport'].edge_attr
-        
-        # Sample edges
-        edge_index_sampled = sample_edges(edge_index, 'flight', max_edges_per_type)
-        
-        for i in range(edge_index_sampled.shape[1]):
-            src = int(edge_index_sampled[0, i].item())
-            dst = int(edge_index_sampled[1, i].item())
-            
-            # Only include if nodes are in our sample
-            if src in airport_indices and dst in airport_indices:
-                edges.append({
-                    'source': f'airport_{src}',
-                    'target': f'airport_{dst}',
-                    'type': 'flight',
-                    'weight': float(edge_attr[i, 0].item()) if edge_attr is not None else 1.0
-                })
-    
-    print(f"Added {sum(1 for e in edges if e['type'] == 'flight')} flight edges")
-    
-    # 2. Lineage -> Airport (sampled_at)
-    print("Processing sampling edges...")
-    if ('lineage', 'sampled_at', 'airport') in hg.edge_types:
-        edge_index = hg['lineage', 'sampled_at', 'airport'].edge_index
-        edge_attr = hg['lineage', 'sampled_at', 'airport'].edge_attr
-        
-        edge_index_sampled = sample_edges(edge_index, 'sampled_at', max_edges_per_type)
-        
-        for i in range(edge_index_sampled.shape[1]):
-            src = int(edge_index_sampled[0, i].item())
-            dst = int(edge_index_sampled[1, i].item())
-            
-            if src in lineage_indices and dst in airport_indices:
-                time_info = edge_attr[i].tolist() if edge_attr is not None else [0, 0]
-                edges.append({
-                    'source': f'lineage_{src}',
-                    'target': f'airport_{dst}',
-                    'type': 'sampled_at',
-                    'weight': float(time_info[0]) if len(time_info) > 0 else 1.0,
-                    'week': int(time_info[1]) if len(time_info) > 1 else 0
-                })
-    
-    print(f"Added {sum(1 for e in edges if e['type'] == 'sampled_at')} sampling edges")
-    
-    # 3. Lineage -> Lineage (evolves_from)
-    print("Processing evolution edges...")
-    if ('lineage', 'evolves_from', 'lineage') in hg.edge_types:
-        edge_index = hg['lineage', 'evolves_from', 'lineage'].edge_index
-        edge_attr = hg['lineage', 'evolves_from', 'lineage'].edge_attr
-        
-        edge_index_sampled = sample_edges(edge_index, 'evolves_from', max_edges_per_type)
-        
-        for i in range(edge_index_sampled.shape[1]):
-            src = int(edge_index_sampled[0, i].item())
-            dst = int(edge_index_sampled[1, i].item())
-            
-            if src in lineage_indices and dst in lineage_indices:
-                edges.append({
-                    'source': f'lineage_{src}',
-                    'target': f'lineage_{dst}',
-                    'type': 'evolves_from',
-                    'weight': float(edge_attr[i, 0].item()) if edge_attr is not None else 1.0
-                })
-    
-    print(f"Added {sum(1 for e in edges if e['type'] == 'evolves_from')} evolution edges")
-    
-    # 4. Lineage -> Lineage (temporal)
-    print("Processing temporal edges...")
-    if ('lineage', 'temporal', 'lineage') in hg.edge_types:
-        edge_index = hg['lineage', 'temporal', 'lineage'].edge_index
-        edge_attr = hg['lineage', 'temporal', 'lineage'].edge_attr
-        
-        edge_index_sampled = sample_edges(edge_index, 'temporal', max_edges_per_type)
-        
-        for i in range(edge_index_sampled.shape[1]):
-            src = int(edge_index_sampled[0, i].item())
-            dst = int(edge_index_sampled[1, i].item())
-            
-            if src in lineage_indices and dst in lineage_indices:
-                time_info = edge_attr[i].tolist() if edge_attr is not None else [0, 0, 0]
-                edges.append({
-                    'source': f'lineage_{src}',
-                    'target': f'lineage_{dst}',
-                    'type': 'temporal',
-                    'weight': float(time_info[2]) if len(time_info) > 2 else 1.0,
-                    'time_start': int(time_info[0]) if len(time_info) > 0 else 0,
-                    'time_end': int(time_info[1]) if len(time_info) > 1 else 0
-                })
-    
-    print(f"Added {sum(1 for e in edges if e['type'] == 'temporal')} temporal edges")
-    
-    # ========== CREATE OUTPUT ==========
-    output_data = {
-        'nodes': airports + lineages,
-        'links': edges,
-        'metadata': {
-            'num_airports': len(airports),
-            'num_lineages': len(lineages),
-            'num_edges': len(edges),
-            'edge_types': list(set(e['type'] for e in edges)),
-            'sampled': sample_size is not None
-        }
+    graph = graph_columns(hg, airport_to_idx, lineage_to_idx, idx_to_airport, idx_to_lineage,
+                          flights_df, sample_size, airport_table, sampling, seed_lineages, num_hops)
+
+    num_edges = {name: int(len(columns['source'])) for name, columns in graph['links'].items()}
+    metadata = {
+        'num_airports': int(len(graph['nodes']['airport']['index'])),
+        'num_lineages': int(len(graph['nodes']['lineage']['index'])),
+        'num_edges': sum(num_edges.values()),
+        'edges_per_type': num_edges,
+        'edge_types': [name for name, count in num_edges.items() if count],
+        'sampled': sample_size is not None,
+        'sampling': sampling if sample_size is not None else None,
+        'format': format,
     }
-    
+
     # Save to JSON
     output_path = Path(output_file)
-    print(f"\nSaving to {output_path}...")
-    with open(output_path, 'w') as f:
-        json.dump(output_data, f, indent=2)
-    
+    print(f"Saving to {output_path}...")
+    with open(output_path, 'wb' if format == 'binary' else 'w') as f:
+        _WRITERS[format](graph, metadata, f)
+
     print(f"✓ Successfully exported graph data!")
-    print(f"  - {len(airports)} airports")
-    print(f"  - {len(lineages)} lineages")
-    print(f"  - {len(edges)} edges")
+    print(f"  - {metadata['num_airports']} airports")
+    print(f"  - {metadata['num_lineages']} lineages")
+    print(f"  - {metadata['num_edges']} edges ({', '.join(f'{k}: {v}' for k, v in num_edges.items())})")
     print(f"  - File size: {output_path.stat().st_size / 1024:.1f} KB")
-    
-    return output_data
+
+    return metadata
+
+
+# ========== LINEAGE-FIRST SUBGRAPH OF AN EXISTING EXPORT ==========
+
+def _iter_json_array(path, keys, chunk_size=1 << 20):
+    """
+    Items of the top-level array stored under one of `keys` in a JSON file, decoded one at a time
+
+    Only a window of the file is held in memory. NaN / Infinity literals decode to floats.
+    """
+    decoder = json.JSONDecoder()
+    pattern = re.compile(r'"(?:%s)"\s*:\s*\[' % '|'.join(map(re.escape, keys)))
+    buffer, pos, eof = '', 0, False
+
+    with open(path) as fh:
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = fh.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+        # Find the start of the array, keeping a tail in case the key straddles two chunks
+        while True:
+            match = pattern.search(buffer, pos)
+            if match:
+                pos = match.end()
+                break
+            if eof:
+                raise ValueError(f"{path}: no {' / '.join(repr(k) for k in keys)} array found")
+            pos = max(0, len(buffer) - 64)
+            fill()
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: unterminated array")
+                fill()
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The item continues in the next chunk
+                if eof:
+                    raise
+                fill()
+                continue
+            yield item
+            pos = end
+
+
+def export_format(path, head_size=1 << 16):
+    """
+    Format of an export file ('json', 'ndjson', 'columnar' or 'binary'), from its first bytes
+
+    Binary exports start with BINARY_MAGIC; columnar ones hold objects, not arrays, under
+    "nodes" / "links"; NDJSON exports start with a complete JSON object on their first line.
+    """
+    with open(path, 'rb') as fh:
+        head = fh.read(head_size)
+    if head.startswith(BINARY_MAGIC):
+        return 'binary'
+    text = head.decode('utf-8', errors='ignore')
+
+    first_line, newline, _ = text.partition('\n')
+    if Path(path).suffix in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if newline:
+        try:
+            record = json.loads(first_line)
+        except json.JSONDecodeError:
+            record = None
+        if isinstance(record, dict) and not {'nodes', 'links', 'edges'} & record.keys():
+            return 'ndjson'
+
+    match = re.search(r'"(?:nodes|links|edges)"\s*:\s*([\[{])', text)
+    if match and match.group(1) == '{':
+        return 'columnar'
+    return 'json'
+
+
+def _iter_export(path, section, format='json'):
+    """Node ('nodes') or link ('links') records of a json or ndjson export, streamed."""
+    if format == 'ndjson':
+        with open(path) as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'metadata' not in record and ('source' in record) == (section == 'links'):
+                    yield record
+    else:
+        yield from _iter_json_array(path, ('links', 'edges') if section == 'links' else ('nodes',))
+
+
+def _finite(record):
+    """Record with NaN / infinite floats as null, and missing coordinates as 0."""
+    record = {k: None if isinstance(v, float) and not math.isfinite(v) else v for k, v in record.items()}
+    for field in ('lat', 'lon'):
+        if field in record and record[field] is None:
+            record[field] = 0.0
+    return record
+
+
+def _is_lineage(node_id):
+    return node_id.startswith('lineage_')
+
+
+def filter_viz_graph(input_file, output_file='visualization/graph_data_viz.json', lineages=None, max_flights=None):
+    """
+    Lineage-first visualization subgraph of a json / ndjson export, without loading it
+
+    Keeps every link that touches a lineage (or one of `lineages`), the nodes those links touch,
+    and the flights between the airports among them, merged into one link per airport pair with
+    the summed weight. The input is streamed three times (links, flights, nodes); memory holds
+    the kept node ids and the flight pairs, not the file. The output is compact JSON
+    ({"links", "nodes", "metadata"}) with NaN written as null (0.0 for coordinates).
+
+    Parameters:
+    -----------
+    input_file : str or Path
+        Export written by export_hetero_graph_to_json (format 'json' or 'ndjson'), or an older
+        export with NaN values. Columnar and binary exports raise ValueError.
+    output_file : str or Path
+    lineages : list of str (optional)
+        Lineage names or node ids to keep (default: all lineages)
+    max_flights : int (optional)
+        Keep only the heaviest airport pairs
+
+    Returns:
+    --------
+    dict : metadata of the written graph
+    """
+    format = export_format(input_file)
+    if format not in ('json', 'ndjson'):
+        raise ValueError(f"{input_file} is a {format} export; filter_viz_graph reads json or ndjson exports "
+                         f"(export with format='json', or build the subgraph from the graph artifact)")
+
+    dumps = json.JSONEncoder(separators=(',', ':'), allow_nan=False).encode
+    selected = None
+    if lineages is not None:
+        wanted = set(lineages)
+        selected = {node['id'] for node in _iter_export(input_file, 'nodes', format)
+                    if node.get('type') == 'lineage' and (node['id'] in wanted or node.get('name') in wanted)}
+
+    def keep_link(link):
+        ends = [node_id for node_id in (link['source'], link['target']) if _is_lineage(node_id)]
+        return bool(ends) and (selected is None or any(node_id in selected for node_id in ends))
+
+    output_path = Path(output_file)
+    active, edges_per_type = set(), {}
+    with open(output_path, 'w') as out:
+        # 1. Links touching the selected lineages, written as they are read
+        out.write('{"links":[')
+        first = True
+        for link in _iter_export(input_file, 'links', format):
+            if link.get('type') == 'flight' or not keep_link(link):
+                continue
+            active.add(link['source'])
+            active.add(link['target'])
+            edges_per_type[link.get('type')] = edges_per_type.get(link.get('type'), 0) + 1
+            out.write(('' if first else ',') + dumps(_finite(link)))
+            first = False
+
+        # 2. Flights between the active airports, one link per airport pair
+        pairs = {}
+        for link in _iter_export(input_file, 'links', format):
+            if link.get('type') == 'flight' and link['source'] in active and link['target'] in active:
+                key = (link['source'], link['target'])
+                weight = link.get('weight')
+                pairs[key] = pairs.get(key, 0.0) + (weight if isinstance(weight, (int, float)) and math.isfinite(weight) else 0.0)
+        flights = pairs.items() if max_flights is None else heapq.nlargest(max_flights, pairs.items(), key=lambda kv: kv[1])
+        for (src, dst), weight in flights:
+            out.write(('' if first else ',') + dumps({'source': src, 'target': dst, 'type': 'flight', 'weight': weight}))
+            first = False
+        edges_per_type['flight'] = len(flights)
+
+        # 3. The active nodes
+        out.write('],"nodes":[')
+        num_nodes = {'airport': 0, 'lineage': 0}
+        first = True
+        for node in _iter_export(input_file, 'nodes', format):
+            if node['id'] in active:
+                num_nodes[node.get('type')] = num_nodes.get(node.get('type'), 0) + 1
+                out.write(('' if first else ',') + dumps(_finite(node)))
+                first = False
+
+        metadata = {
+            'num_airports': num_nodes['airport'],
+            'num_lineages': num_nodes['lineage'],
+            'num_edges': sum(edges_per_type.values()),
+            'edges_per_type': edges_per_type,
+            'edge_types': [name for name, count in edges_per_type.items() if count],
+            'sampled': True,
+            'sampling': 'lineage_first',
+            'format': 'json',
+        }
+        out.write('],"metadata":' + dumps(metadata) + '}')
+
+    print(f"✓ Saved {output_path}: {metadata['num_airports']} airports, {metadata['num_lineages']} lineages, "
+          f"{metadata['num_edges']} edges ({output_path.stat().st_size / 1024:.1f} KB)")
+    return metadata
 
 
 # Example usage (add this to your notebook):
@@ -282,28 +727,74 @@ def export_hetero_graph_to_json(
 idx_to_airport = {v: k for k, v in airport_to_idx.items()}
 idx_to_lineage = {v: k for k, v in lineage_to_idx.items()}
 
-# Export with sampling for better performance (recommended for large graphs)
+# Export a small, connected sample for better performance (recommended for large graphs):
+# the airports and lineages closest to the most sampled lineages
 export_hetero_graph_to_json(
     hg=hg,
     airport_to_idx=airport_to_idx,
     lineage_to_idx=lineage_to_idx,
     idx_to_airport=idx_to_airport,
     idx_to_lineage=idx_to_lineage,
-    flights_df=flights_with_airport_info_df,
+    airport_table=build_airport_table(flights_with_airport_info_df),  # or artifact['airport_table']
     metadata_df=metadata_df,
     output_file='visualization/graph_data.json',
-    sample_size={'airports': 1000, 'lineages': 500, 'edges': 10000}  # Adjust as needed
+    sample_size={'airports': 1000, 'lineages': 500, 'edges': 10000},  # Adjust as needed
+    sampling='khop'
 )
 
-# Or export full graph (might be large):
+# Or export full graph (might be large), as parallel arrays per edge type:
 # export_hetero_graph_to_json(
 #     hg=hg,
 #     airport_to_idx=airport_to_idx,
 #     lineage_to_idx=lineage_to_idx,
 #     idx_to_airport=idx_to_airport,
 #     idx_to_lineage=idx_to_lineage,
-#     flights_df=flights_with_airport_info_df,
-#     output_file='visualization/graph_data_full.json'
+#     airport_table=airport_table,
+#     output_file='visualization/graph_data_full.json',
+#     format='columnar'
 # )
 """
 
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export a lineage-first visualization subgraph, from a graph artifact or an existing export',
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--artifact', help='graph artifact saved by build_graph()')
+    source.add_argument('--input', help='json / ndjson export to filter (streamed)')
+    parser.add_argument('--output', default='visualization/graph_data_viz.json')
+    parser.add_argument('--lineages', nargs='+', help='lineages to keep (default: all)')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='json', help='output format (--artifact only)')
+    parser.add_argument('--num-hops', type=int, default=1,
+                        help='hops around the lineages (--artifact only; 1: sampling airports)')
+    parser.add_argument('--max-airports', type=int, help='--artifact only')
+    parser.add_argument('--max-lineages', type=int, help='--artifact only')
+    parser.add_argument('--max-edges', type=int, help='edge limit per edge type (--artifact only)')
+    parser.add_argument('--max-flights', type=int, help='airport pairs to keep (--input only)')
+    args = parser.parse_args()
+
+    if args.input:
+        filter_viz_graph(args.input, args.output, lineages=args.lineages, max_flights=args.max_flights)
+        return
+
+    from graph_construction import load_graph_artifact
+
+    artifact = load_graph_artifact(args.artifact)
+    unknown = [l for l in args.lineages or [] if l not in artifact['lineage_to_idx']]
+    if unknown:
+        parser.error(f"unknown lineages: {', '.join(unknown)}")
+    export_hetero_graph_to_json(
+        artifact['hg'], artifact['airport_to_idx'], artifact['lineage_to_idx'],
+        airport_table=artifact.get('airport_table'),
+        output_file=args.output,
+        format=args.format,
+        sample_size={'airports': args.max_airports, 'lineages': args.max_lineages, 'edges': args.max_edges},
+        sampling='khop',
+        seed_lineages=args.lineages,
+        num_hops=args.num_hops,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Spatial index for mapping genome sample locations to their nearest airports
+Airports are projected to 3D unit vectors so a KD-tree over Euclidean (chord) distance
+gives exact great-circle nearest neighbours, including near the poles and the antimeridian.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def latlon_to_unit_vectors(lat, lon):
+    """Convert latitude/longitude in degrees to an [N, 3] array of unit vectors."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    """Convert chord length on the unit sphere to great-circle distance in km."""
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def km_to_chord(distance_km):
+    """Convert great-circle distance in km to chord length on the unit sphere."""
+    angle = np.minimum(np.asarray(distance_km, dtype=np.float64) / EARTH_RADIUS_KM, np.pi)
+    return 2.0 * np.sin(angle / 2.0)
+
+
+class AirportIndex:
+    """
+    Nearest-airport lookup on the sphere
+
+    Parameters:
+    -----------
+    codes : array-like
+        Airport codes, one per coordinate
+    lat, lon : array-like
+        Airport coordinates in degrees
+    """
+
+    def __init__(self, codes, lat, lon):
+        self.codes = np.asarray(codes, dtype=object)
+        self.tree = cKDTree(latlon_to_unit_vectors(lat, lon))
+
+    @classmethod
+    def from_flights(cls, flights_df):
+        """
+        Build the index from the flight table, using (latitude_1, longitude_1) for origin
+        airports and (latitude_2, longitude_2) for destination airports
+        """
+        origin = flights_df[['origin', 'latitude_1', 'longitude_1']].set_axis(
+            ['airport_code', 'latitude', 'longitude'], axis=1
+        )
+        destination = flights_df[['destination', 'latitude_2', 'longitude_2']].set_axis(
+            ['airport_code', 'latitude', 'longitude'], axis=1
+        )
+        airport_nodes = pd.concat([origin, destination], ignore_index=True)
+        airport_nodes = airport_nodes.drop_duplicates().dropna(subset=['latitude', 'longitude'])
+        return cls(airport_nodes['airport_code'], airport_nodes['latitude'], airport_nodes['longitude'])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def query(self, lat, lon, k=1, max_distance_km=None):
+        """
+        Batched k-nearest airport query
+
+        Parameters:
+        -----------
+        lat, lon : array-like
+            Query coordinates in degrees
+        k : int
+            Number of neighbours per point
+        max_distance_km : float (optional)
+            Neighbours further than this are reported as missing
+
+        Returns:
+        --------
+        codes : object array [N] (k=1) or [N, k], None where no airport is within range
+        distance_km : float array of the same shape, inf where no airport is within range
+        """
+        points = latlon_to_unit_vectors(lat, lon)
+        upper = np.inf if max_distance_km is None else km_to_chord(max_distance_km)
+
+        chord, idx = self.tree.query(points, k=k, distance_upper_bound=upper)
+
+        # cKDTree marks misses with index == len(data) and an infinite distance
+        missing = idx >= len(self.codes)
+        codes = np.empty(idx.shape, dtype=object)
+        codes[~missing] = self.codes[idx[~missing]]
+        distance_km = np.full(idx.shape, np.inf)
+        distance_km[~missing] = chord_to_km(chord[~missing])
+        return codes, distance_km
+
+
+def map_locations_to_airports(locations_df, airport_index, max_distance_km=500,
+                              loc_col='full_loc', lat_col='lat', lon_col='lon'):
+    """
+    Map each unique sample location to its nearest airport in one batched query
+
+    Parameters:
+    -----------
+    locations_df : DataFrame
+        Locations with name and coordinate columns (e.g. metadata_df[['full_loc', 'lat', 'lon']])
+    airport_index : AirportIndex
+        Index over airport coordinates
+    max_distance_km : float (optional)
+        Locations with no airport within this great-circle distance are dropped
+
+    Returns:
+    --------
+    DataFrame with columns [loc_col, 'nearest_airport', 'distance_km']
+    """
+    locs = locations_df[[loc_col, lat_col, lon_col]].drop_duplicates().dropna(subset=[lat_col, lon_col])
+    codes, distance_km = airport_index.query(
+        locs[lat_col].to_numpy(), locs[lon_col].to_numpy(), k=1, max_distance_km=max_distance_km
+    )
+    mapped = pd.DataFrame({
+        loc_col: locs[loc_col].to_numpy(),
+        'nearest_airport': codes,
+        'distance_km': distance_km,
+    })
+    return mapped[np.isfinite(mapped['distance_km'])].reset_index(drop=True)
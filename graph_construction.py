@@ -0,0 +1,747 @@
+"""
+Heterogeneous graph construction for HGT-BioGuard
+Vectorized builders for the lineage/airport edge stores used by the HeteroData graph,
+and build_graph(), which runs the whole pipeline and caches the result on disk.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+
+# Bump when the artifact layout or the build logic changes to invalidate cached graphs
+GRAPH_ARTIFACT_VERSION = 3
+
+# Flight-table columns holding each airport field, for the (origin, destination) side.
+# The first column present wins; later ones only fill its gaps.
+AIRPORT_TABLE_COLUMNS = {
+    'lat': (('latitude_1', 'Latitude'), ('latitude_2', 'Latitude_destination')),
+    'lon': (('longitude_1', 'Longitude'), ('longitude_2', 'Longitude_destination')),
+    'city': (('City',), ('City_destination',)),
+    'country': (('Country',), ('Country_destination',)),
+    'region': (('Region',), ('Region_destination',)),
+}
+
+
+def map_to_index(values, mapping):
+    """
+    Map keys (airport codes, lineage names, weeks) to graph indices in one pass
+
+    Parameters:
+    -----------
+    values : array-like or Series
+        Keys to look up
+    mapping : dict
+        Mapping from key to integer index (e.g. airport_to_idx)
+
+    Returns:
+    --------
+    np.ndarray of int64, with -1 wherever the key is not in the mapping
+    """
+    keys = list(mapping.keys())
+    if not keys:
+        return np.full(len(values), -1, dtype=np.int64)
+
+    # Position of each value in `keys` (-1 if absent)
+    codes = pd.Index(keys).get_indexer(values).astype(np.int64)
+    lookup = np.fromiter(mapping.values(), dtype=np.int64, count=len(keys))
+
+    indices = np.full(len(codes), -1, dtype=np.int64)
+    found = codes >= 0
+    indices[found] = lookup[codes[found]]
+    return indices
+
+
+def _edge_tensors(src, dst, columns):
+    """Stack src/dst indices and attribute columns into (edge_index, edge_attr) tensors."""
+    edge_index = torch.from_numpy(np.stack([src, dst]).astype(np.int64))
+    edge_attr = torch.from_numpy(np.stack(columns, axis=1).astype(np.float32))
+    return edge_index, edge_attr
+
+
+def build_flight_edges(flight_edges, airport_to_idx, week_to_idx):
+    """
+    Build Airport -> Airport flight edges
+
+    Parameters:
+    -----------
+    flight_edges : DataFrame
+        Weekly flight routes with columns 'origin', 'destination', 'week', 'flight_count'
+    airport_to_idx : dict
+        Mapping from airport code to index
+    week_to_idx : dict
+        Mapping from week (Period) to index
+
+    Returns:
+    --------
+    flight_edge_index : LongTensor [2, E]
+    flight_edge_attr : FloatTensor [E, 2] with columns [flight_count, week_index]
+    """
+    src = map_to_index(flight_edges['origin'], airport_to_idx)
+    dst = map_to_index(flight_edges['destination'], airport_to_idx)
+    week = map_to_index(flight_edges['week'], week_to_idx)
+
+    # Rows with an unknown airport or week are dropped, as in the original loop
+    keep = (src >= 0) & (dst >= 0) & (week >= 0)
+    counts = flight_edges['flight_count'].to_numpy()
+
+    return _edge_tensors(src[keep], dst[keep], [counts[keep], week[keep]])
+
+
+def build_sample_edges(lineage_airport_weekly, lineage_to_idx, airport_to_idx, week_to_idx):
+    """
+    Build Lineage -> Airport (sampled_at) edges
+
+    Parameters:
+    -----------
+    lineage_airport_weekly : DataFrame
+        Weekly observations with columns 'pango_lineage', 'nearest_airport', 'week', 'sample_count'
+    lineage_to_idx : dict
+        Mapping from lineage name to index
+    airport_to_idx : dict
+        Mapping from airport code to index
+    week_to_idx : dict
+        Mapping from week (Period) to index
+
+    Returns:
+    --------
+    sample_edge_index : LongTensor [2, E]
+    sample_edge_attr : FloatTensor [E, 2] with columns [sample_count, week_index]
+    """
+    src = map_to_index(lineage_airport_weekly['pango_lineage'], lineage_to_idx)
+    dst = map_to_index(lineage_airport_weekly['nearest_airport'], airport_to_idx)
+    week = map_to_index(lineage_airport_weekly['week'], week_to_idx)
+
+    keep = (src >= 0) & (dst >= 0)
+    if (week[keep] < 0).any():
+        missing = lineage_airport_weekly['week'][keep & (week < 0)].iloc[0]
+        raise KeyError(f"Week {missing} is not in week_to_idx")
+    counts = lineage_airport_weekly['sample_count'].to_numpy()
+
+    return _edge_tensors(src[keep], dst[keep], [counts[keep], week[keep]])
+
+
+def build_edge_tensors(flight_edges, lineage_airport_weekly, airport_to_idx, lineage_to_idx, week_to_idx):
+    """
+    Build the flight and sampled_at edge stores in one call
+
+    Returns:
+    --------
+    dict with keys 'flight_edge_index', 'flight_edge_attr', 'sample_edge_index', 'sample_edge_attr'
+    """
+    flight_edge_index, flight_edge_attr = build_flight_edges(
+        flight_edges, airport_to_idx, week_to_idx
+    )
+    sample_edge_index, sample_edge_attr = build_sample_edges(
+        lineage_airport_weekly, lineage_to_idx, airport_to_idx, week_to_idx
+    )
+    return {
+        'flight_edge_index': flight_edge_index,
+        'flight_edge_attr': flight_edge_attr,
+        'sample_edge_index': sample_edge_index,
+        'sample_edge_attr': sample_edge_attr,
+    }
+
+
+def _majority_update(counts, best, lineage, added):
+    """Add `added` samples of `lineage` to counts and return the updated (lineage, count) majority."""
+    total = counts.get(lineage, 0) + added
+    counts[lineage] = total
+    best_lineage, best_count = best
+    # Counts only ever grow, so the majority can only move to a lineage we just touched.
+    # Ties are broken by lineage name to keep the output deterministic.
+    if total > best_count or (total == best_count and lineage < best_lineage):
+        return lineage, total
+    return best
+
+
+def build_phylo_edges(tree, strain_to_lineage, lineage_to_idx, strain_prefix='hCoV-19/'):
+    """
+    Build Lineage -> Lineage (evolves_from) edges from a phylogenetic tree
+
+    Every clade is labelled with the majority pango lineage of the strains below it.
+    The lineage histograms are computed bottom-up in a single post-order traversal,
+    merging the smaller child histogram into the larger one, so each tip is visited
+    O(log n) times instead of once per ancestor.
+
+    Parameters:
+    -----------
+    tree : Bio.Phylo tree (or root Clade)
+        Parsed Newick tree, e.g. Phylo.read(path, 'newick')
+    strain_to_lineage : dict
+        Mapping from strain name (without prefix) to pango lineage
+    lineage_to_idx : dict
+        Mapping from lineage name to index
+    strain_prefix : str
+        Prefix stripped from tip names before the strain lookup
+
+    Returns:
+    --------
+    phylo_edge_index : LongTensor [2, E] (parent lineage -> child lineage)
+    phylo_edge_attr : FloatTensor [E, 1] with the child branch length
+    """
+    root = getattr(tree, 'root', tree)
+
+    src, dst, distances = [], [], []
+    # id(clade) -> (lineage counts, (majority lineage, count)) for clades awaiting their parent
+    state = {}
+
+    # Iterative post-order: deep, ladder-like trees would overflow the recursion limit
+    stack = [(root, False)]
+    while stack:
+        clade, children_done = stack.pop()
+
+        if not clade.clades:
+            counts, best = {}, (None, 0)
+            name = clade.name.replace(strain_prefix, '') if clade.name else None
+            lineage = strain_to_lineage.get(name)
+            if lineage is not None:
+                best = _majority_update(counts, best, lineage, 1)
+            state[id(clade)] = (counts, best)
+            continue
+
+        if not children_done:
+            stack.append((clade, True))
+            stack.extend((child, False) for child in reversed(clade.clades))
+            continue
+
+        children = [state.pop(id(child)) for child in clade.clades]
+
+        # Small-to-large merge: reuse the biggest child histogram as the parent's
+        largest = max(range(len(children)), key=lambda i: len(children[i][0]))
+        counts, best = children[largest]
+        for i, (child_counts, _) in enumerate(children):
+            if i != largest:
+                for lineage, n in child_counts.items():
+                    best = _majority_update(counts, best, lineage, n)
+
+        parent_lineage = best[0]
+        if parent_lineage in lineage_to_idx:
+            for child, (_, (child_lineage, _)) in zip(clade.clades, children):
+                if child_lineage in lineage_to_idx and child_lineage != parent_lineage:
+                    src.append(lineage_to_idx[parent_lineage])
+                    dst.append(lineage_to_idx[child_lineage])
+                    distances.append(child.branch_length if child.branch_length is not None else 0.0)
+
+        state[id(clade)] = (counts, best)
+
+    phylo_edge_index = torch.tensor([src, dst], dtype=torch.long)
+    phylo_edge_attr = torch.tensor(distances, dtype=torch.float).unsqueeze(1)
+    return phylo_edge_index, phylo_edge_attr
+
+
+def build_temporal_edges(lineage_airport_weekly, lineage_to_idx, week_to_idx, max_gap=2):
+    """
+    Build Lineage -> Lineage temporal edges
+
+    For every (lineage, airport) pair, consecutive observed weeks at most `max_gap` weeks
+    apart are connected by a self-edge on the lineage carrying the log growth in samples.
+
+    Returns:
+    --------
+    temporal_edge_index : LongTensor [2, E]
+    temporal_edge_attr : FloatTensor [E, 3] with columns [source_week, target_week, log_growth]
+    """
+    df = lineage_airport_weekly[lineage_airport_weekly['pango_lineage'].isin(list(lineage_to_idx))]
+    lineage = map_to_index(df['pango_lineage'], lineage_to_idx)
+    week = map_to_index(df['week'], week_to_idx)
+    counts = df['sample_count'].to_numpy(dtype=np.float64)
+
+    # Same order as iterating groupby(['pango_lineage', 'nearest_airport']) and sorting by week
+    order = np.lexsort((week, df['nearest_airport'].astype(str).to_numpy(),
+                        df['pango_lineage'].astype(str).to_numpy()))
+    lineage, week, counts = lineage[order], week[order], counts[order]
+    airport = df['nearest_airport'].astype(str).to_numpy()[order]
+
+    same_pair = (lineage[1:] == lineage[:-1]) & (airport[1:] == airport[:-1])
+    close = np.abs(week[1:] - week[:-1]) <= max_gap
+    pairs = np.flatnonzero(same_pair & close)
+
+    src = lineage[pairs]
+    growth = np.log(counts[pairs + 1] + 1) - np.log(counts[pairs] + 1)
+    return _edge_tensors(src, src, [week[pairs], week[pairs + 1], growth])
+
+
+def _first_valid(flights_df, code_column, column):
+    """First non-null value of `column` per airport code, indexed by code."""
+    values = flights_df[[code_column, column]].dropna(subset=[column]).drop_duplicates(code_column)
+    return pd.Series(values[column].to_numpy(), index=values[code_column].astype(str).to_numpy())
+
+
+def _airport_side(flights_df, code_column, side):
+    codes = pd.Index(flights_df[code_column].dropna().unique().astype(str))
+    side_table = pd.DataFrame(index=codes)
+    for field, columns in AIRPORT_TABLE_COLUMNS.items():
+        numeric = field in ('lat', 'lon')
+        values = pd.Series(np.nan if numeric else None, index=codes, dtype=np.float64 if numeric else object)
+        # Later columns first, so earlier ones overwrite them where present
+        for column in reversed([c for c in columns[side] if c in flights_df.columns]):
+            valid = _first_valid(flights_df, code_column, column)
+            values.loc[valid.index] = valid.to_numpy(dtype=values.dtype)
+        side_table[field] = values
+    return side_table
+
+
+def build_airport_table(flights_df):
+    """
+    One row per airport code with lat, lon, city, country and region, from the flight table
+
+    Built with vectorized first-valid lookups per column instead of row iteration. Origin rows take their fields from
+    latitude_1/longitude_1 (falling back to Latitude/Longitude), City, Country and Region;
+    destination rows from latitude_2/longitude_2, *_destination. Airports seen as origin use
+    the origin values, with destination values filling any gaps. Columns missing from the
+    flight table are left empty (NaN coordinates, None strings).
+
+    Returns:
+    --------
+    DataFrame indexed by airport code (str), columns ['lat', 'lon', 'city', 'country', 'region']
+    """
+    sides = [_airport_side(flights_df, 'origin', 0), _airport_side(flights_df, 'destination', 1)]
+    # first() skips missing values: origin fields win, destination fields fill the gaps
+    table = pd.concat(sides).groupby(level=0, sort=True).first()
+    table['lat'] = table['lat'].astype(np.float64)
+    table['lon'] = table['lon'].astype(np.float64)
+    table.index.name = 'code'
+    return table
+
+
+def build_airport_features(flights_df, airport_to_idx, airport_table=None):
+    """
+    Airport node features: [lat / 90, lon / 180], in airport_to_idx order
+
+    Coordinates come from build_airport_table (origin columns, falling back to the
+    destination columns); pass a prebuilt `airport_table` to skip the flight table.
+    Missing airports get [0, 0].
+    """
+    if airport_table is None:
+        airport_table = build_airport_table(flights_df)
+
+    feats = np.zeros((len(airport_to_idx), 2), dtype=np.float32)
+    idx = map_to_index(airport_table.index, airport_to_idx)
+    found = idx >= 0
+    feats[idx[found], 0] = airport_table['lat'].to_numpy()[found] / 90.0
+    feats[idx[found], 1] = airport_table['lon'].to_numpy()[found] / 180.0
+    return torch.from_numpy(np.nan_to_num(feats))
+
+
+def build_mutation_features(metadata_df, lineage_to_idx, max_features=500, vocabulary=None):
+    """
+    Lineage node features: multi-hot "bag of mutations" over the most common aaSubstitutions
+
+    Parameters:
+    -----------
+    metadata_df : DataFrame
+        Genome metadata with 'pango_lineage' and 'aaSubstitutions'
+    lineage_to_idx : dict
+        Mapping from lineage name to index
+    max_features : int
+        Vocabulary size when fitting a new vectorizer
+    vocabulary : dict (optional)
+        Fitted vocabulary to reuse (e.g. when updating a subset of lineages)
+
+    Returns:
+    --------
+    mutation_features : FloatTensor [num_lineages, num_mutations]
+    vocabulary : dict mapping mutation token to column
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    lineage_mutations = metadata_df.groupby('pango_lineage', observed=True)['aaSubstitutions'].apply(
+        lambda x: ' '.join(x.dropna().astype(str))
+    ).to_dict()
+
+    idx_to_lineage = {v: k for k, v in lineage_to_idx.items()}
+    # Commas separate mutations, so they become distinct "words"
+    corpus = [lineage_mutations.get(idx_to_lineage[i], '').replace(',', ' ') for i in range(len(lineage_to_idx))]
+
+    if vocabulary is None:
+        vectorizer = CountVectorizer(binary=True, max_features=max_features)
+        X_mutations = vectorizer.fit_transform(corpus)
+    else:
+        vectorizer = CountVectorizer(binary=True, vocabulary=vocabulary)
+        X_mutations = vectorizer.transform(corpus)
+
+    vocabulary = {k: int(v) for k, v in vectorizer.vocabulary_.items()}
+    return torch.tensor(X_mutations.toarray(), dtype=torch.float), vocabulary
+
+
+# ========== GRAPH ARTIFACT ==========
+
+@dataclass
+class GraphConfig:
+    """Inputs and build parameters of the lineage/airport graph."""
+    genome_file: str = './data1/processed/df_genome_with_coords.tsv'
+    flight_file: str = './data1/processed/flights_with_airport_info.tsv'
+    tree_file: str = './data1/processed/filtered_tree_before_april30_2020.nwk'
+    start_date: str = '2020-01-01'
+    end_date: str = '2020-04-30'
+    max_distance_km: float = 500.0       # sample location -> nearest airport cutoff
+    min_lineage_samples: int = 10        # lineages with fewer samples globally are dropped
+    temporal_max_gap: int = 2            # max week gap for temporal edges
+    max_mutation_features: int = 500
+    cache_dir: str = './data1/processed/cache'
+    content_hash: bool = False           # hash file contents instead of (size, mtime)
+
+    def cache_key(self):
+        """Hash of the input files and build parameters identifying a graph artifact."""
+        from ingest import file_sha256
+
+        params = {k: v for k, v in asdict(self).items() if k not in ('cache_dir', 'content_hash')}
+        files = {}
+        for name in ('genome_file', 'flight_file', 'tree_file'):
+            path = getattr(self, name)
+            if path is None:
+                continue
+            if self.content_hash:
+                files[name] = file_sha256(path)
+            else:
+                stat = os.stat(path)
+                files[name] = [stat.st_size, stat.st_mtime_ns]
+        payload = json.dumps({'version': GRAPH_ARTIFACT_VERSION, 'params': params, 'files': files}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def artifact_path(self):
+        return Path(self.cache_dir) / f'graph-v{GRAPH_ARTIFACT_VERSION}-{self.cache_key()}.pt'
+
+
+def aggregate_lineage_airport_weekly(metadata_df, flights_df, max_distance_km=500.0):
+    """
+    Map samples to their nearest airport and count samples per (lineage, airport, week)
+
+    Returns:
+    --------
+    DataFrame with columns 'pango_lineage', 'nearest_airport', 'week', 'sample_count'
+    """
+    from geo_index import AirportIndex, map_locations_to_airports
+
+    airport_index = AirportIndex.from_flights(flights_df)
+    full_loc_to_airport = map_locations_to_airports(metadata_df, airport_index, max_distance_km=max_distance_km)
+
+    samples = metadata_df[['pango_lineage', 'full_loc', 'date']].merge(
+        full_loc_to_airport[['full_loc', 'nearest_airport']], on='full_loc', how='inner'
+    )
+    samples['pango_lineage'] = samples['pango_lineage'].astype(str)
+    samples['week'] = pd.to_datetime(samples['date']).dt.to_period('W')
+
+    return samples.groupby(
+        ['pango_lineage', 'nearest_airport', 'week'], observed=True
+    ).size().reset_index(name='sample_count')
+
+
+def assemble_hetero_graph(airport_x, lineage_x, edges):
+    """
+    Assemble the HeteroData graph
+
+    Parameters:
+    -----------
+    airport_x, lineage_x : FloatTensor
+        Node features
+    edges : dict
+        Mapping from edge type to (edge_index, edge_attr)
+    """
+    from torch_geometric.data import HeteroData
+
+    hg = HeteroData()
+    hg['airport'].x = airport_x
+    hg['lineage'].x = lineage_x
+    for edge_type, (edge_index, edge_attr) in edges.items():
+        hg[edge_type].edge_index = edge_index
+        hg[edge_type].edge_attr = edge_attr
+    return hg
+
+
+def _run_pipeline(config):
+    from ingest import load_flight_table, load_genome_table
+
+    print("Loading genome and flight tables...")
+    metadata_df = load_genome_table(config.genome_file)
+    metadata_df = metadata_df[
+        (metadata_df['date'] >= config.start_date) &
+        (metadata_df['date'] <= config.end_date) &
+        metadata_df['pango_lineage'].notna() &
+        (metadata_df['pango_lineage'] != 'unclassifiable')
+    ]
+    flights_df = load_flight_table(config.flight_file)
+    flights_df = flights_df[flights_df['latitude_2'].notna() & flights_df['longitude_2'].notna()]
+
+    print("Mapping samples to airports...")
+    lineage_airport_weekly = aggregate_lineage_airport_weekly(metadata_df, flights_df, config.max_distance_km)
+    return assemble_graph_artifact(metadata_df, flights_df, lineage_airport_weekly, config)
+
+
+def assemble_graph_artifact(metadata_df, flights_df, lineage_airport_weekly, config):
+    """
+    Build the graph artifact from already loaded and filtered tables
+
+    Parameters:
+    -----------
+    metadata_df : DataFrame
+        Genome rows ('strain', 'pango_lineage', 'aaSubstitutions')
+    flights_df : DataFrame
+        Flight rows with destination coordinates
+    lineage_airport_weekly : DataFrame
+        Output of aggregate_lineage_airport_weekly()
+    config : GraphConfig
+        Build parameters; the tree is read from config.tree_file unless it is None
+
+    Returns:
+    --------
+    dict artifact, as stored by build_graph()
+    """
+    # ===== Node mappings =====
+    all_airports = set(flights_df['origin'].astype(str)) | set(flights_df['destination'].astype(str))
+    airport_to_idx = {airport: idx for idx, airport in enumerate(sorted(all_airports))}
+
+    lineage_counts = lineage_airport_weekly.groupby('pango_lineage')['sample_count'].sum()
+    common_lineages = lineage_counts[lineage_counts >= config.min_lineage_samples].index
+    lineage_to_idx = {lineage: idx for idx, lineage in enumerate(sorted(common_lineages))}
+    lineage_airport_filtered = lineage_airport_weekly[lineage_airport_weekly['pango_lineage'].isin(common_lineages)]
+
+    weeks = sorted(lineage_airport_weekly['week'].unique())
+    week_to_idx = {week: idx for idx, week in enumerate(weeks)}
+
+    # ===== Edges =====
+    print("Building edges...")
+    flight_edges = flights_df.groupby(
+        ['origin', 'destination', 'week'], observed=True
+    ).size().reset_index(name='flight_count')
+
+    edges = {
+        ('airport', 'flight', 'airport'): build_flight_edges(flight_edges, airport_to_idx, week_to_idx),
+        ('lineage', 'sampled_at', 'airport'): build_sample_edges(
+            lineage_airport_filtered, lineage_to_idx, airport_to_idx, week_to_idx
+        ),
+    }
+
+    if config.tree_file is not None:
+        from Bio import Phylo
+
+        tree = Phylo.read(config.tree_file, 'newick')
+        strain_to_lineage = metadata_df[['strain', 'pango_lineage']].astype(str).set_index('strain')['pango_lineage'].to_dict()
+        edges[('lineage', 'evolves_from', 'lineage')] = build_phylo_edges(tree, strain_to_lineage, lineage_to_idx)
+    else:
+        edges[('lineage', 'evolves_from', 'lineage')] = (torch.empty((2, 0), dtype=torch.long), torch.empty((0, 1)))
+
+    edges[('lineage', 'temporal', 'lineage')] = build_temporal_edges(
+        lineage_airport_filtered, lineage_to_idx, week_to_idx, config.temporal_max_gap
+    )
+
+    # ===== Node features =====
+    airport_table = build_airport_table(flights_df)
+    airport_x = build_airport_features(flights_df, airport_to_idx, airport_table)
+    lineage_x, mutation_vocabulary = build_mutation_features(
+        metadata_df, lineage_to_idx, config.max_mutation_features
+    )
+
+    hg = assemble_hetero_graph(airport_x, lineage_x, edges)
+    return {
+        'hg': hg,
+        'airport_to_idx': airport_to_idx,
+        'lineage_to_idx': lineage_to_idx,
+        'week_to_idx': week_to_idx,
+        'mutation_vocabulary': mutation_vocabulary,
+        'airport_table': airport_table,
+        # Kept for incremental updates (update_graph)
+        'lineage_airport_weekly': lineage_airport_weekly,
+        'lineage_sample_counts': lineage_counts.astype(np.int64).to_dict(),
+        'config': asdict(config),
+    }
+
+
+def save_graph_artifact(artifact, path):
+    """Save a graph artifact (graph + index mappings) to a single file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    torch.save(artifact, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_graph_artifact(path, mmap=True):
+    """Load a graph artifact; tensors are memory-mapped from disk instead of copied."""
+    artifact = torch.load(path, mmap=mmap, weights_only=False)
+    if artifact.get('version') != GRAPH_ARTIFACT_VERSION:
+        raise ValueError(f"{path} has artifact version {artifact.get('version')}, expected {GRAPH_ARTIFACT_VERSION}")
+    return artifact
+
+
+def build_graph(config=None, refresh=False):
+    """
+    Build the lineage/airport HeteroData graph, or load it from the artifact cache
+
+    The artifact is keyed by a hash of the input files and build parameters
+    (see GraphConfig.cache_key), so any change to either triggers a rebuild.
+
+    Parameters:
+    -----------
+    config : GraphConfig (optional)
+        Inputs and build parameters; defaults to GraphConfig()
+    refresh : bool
+        Rebuild even if a cached artifact exists
+
+    Returns:
+    --------
+    dict with keys 'hg', 'airport_to_idx', 'lineage_to_idx', 'week_to_idx',
+    'mutation_vocabulary', 'airport_table', 'lineage_airport_weekly',
+    'lineage_sample_counts', 'config', 'key', 'version'
+    """
+    config = config or GraphConfig()
+    path = config.artifact_path()
+
+    if not refresh and path.exists():
+        print(f"Loading cached graph from {path}")
+        return load_graph_artifact(path)
+
+    artifact = _run_pipeline(config)
+    artifact.update({
+        'version': GRAPH_ARTIFACT_VERSION,
+        'key': config.cache_key(),
+    })
+    save_graph_artifact(artifact, path)
+    print(f"✓ Saved graph artifact to {path}")
+    return artifact
+
+
+# ========== INCREMENTAL UPDATES ==========
+
+def _append_edges(hg, edge_type, edge_index, edge_attr):
+    store = hg[edge_type]
+    store.edge_index = torch.cat([store.edge_index, edge_index], dim=1)
+    store.edge_attr = torch.cat([store.edge_attr, edge_attr.to(store.edge_attr.dtype)], dim=0)
+
+
+def _extend_mapping(mapping, keys):
+    """Append unseen keys to an index mapping; returns the list of added keys."""
+    added = [k for k in keys if k not in mapping]
+    for key in added:
+        mapping[key] = len(mapping)
+    return added
+
+
+def update_graph(graph, new_lineage_airport_weekly, new_flights=None, new_metadata=None):
+    """
+    Extend a built graph with newly arrived weeks instead of rebuilding it
+
+    The week, airport and lineage mappings are extended (new entities get the next
+    free index, so existing indices stay valid), node features are padded, and new
+    flight, sampled_at and temporal edges are appended. Because the new weeks come
+    after all existing ones, every edge store stays ordered by week.
+
+    Parameters:
+    -----------
+    graph : dict
+        Artifact returned by build_graph(); updated in place
+    new_lineage_airport_weekly : DataFrame
+        New rows with columns 'pango_lineage', 'nearest_airport', 'week', 'sample_count'
+    new_flights : DataFrame (optional)
+        New raw flight rows with 'origin', 'destination', 'week' and the
+        latitude_1/longitude_1/latitude_2/longitude_2 coordinate columns
+    new_metadata : DataFrame (optional)
+        New genome rows ('pango_lineage', 'aaSubstitutions'); mutation features are
+        recomputed only for the lineages they touch. Lineages that are newly promoted
+        past the sample threshold only get the mutations present in this delta.
+
+    Returns:
+    --------
+    graph : the same dict, updated
+    """
+    config = GraphConfig(**graph['config'])
+    hg = graph['hg']
+    airport_to_idx, lineage_to_idx, week_to_idx = graph['airport_to_idx'], graph['lineage_to_idx'], graph['week_to_idx']
+
+    new_rows = new_lineage_airport_weekly[['pango_lineage', 'nearest_airport', 'week', 'sample_count']].copy()
+    new_rows['pango_lineage'] = new_rows['pango_lineage'].astype(str)
+    new_rows['nearest_airport'] = new_rows['nearest_airport'].astype(str)
+    if new_flights is not None:
+        # Same filter as the full build: flights to unknown destinations are dropped
+        new_flights = new_flights[new_flights['latitude_2'].notna() & new_flights['longitude_2'].notna()]
+
+    # ===== 1. Weeks =====
+    delta_weeks = set(new_rows['week'])
+    if new_flights is not None:
+        delta_weeks |= set(new_flights['week'])
+    last_week = max(week_to_idx) if week_to_idx else None
+    stale = sorted(w for w in delta_weeks if w in week_to_idx or (last_week is not None and w < last_week))
+    if stale:
+        raise ValueError(f"Updates must only contain weeks after {last_week}; got {stale[0]}")
+    new_weeks = _extend_mapping(week_to_idx, sorted(delta_weeks))
+
+    # ===== 2. Airports =====
+    if new_flights is not None:
+        codes = pd.unique(pd.concat([new_flights['origin'], new_flights['destination']]).astype(str))
+        added_airports = _extend_mapping(airport_to_idx, sorted(codes))
+        new_table = build_airport_table(new_flights)
+        graph['airport_table'] = pd.concat([graph['airport_table'], new_table]).groupby(level=0, sort=True).first()
+        if added_airports:
+            feats = build_airport_features(new_flights, airport_to_idx, new_table)
+            hg['airport'].x = torch.cat([hg['airport'].x, feats[-len(added_airports):]], dim=0)
+
+    # ===== 3. Lineages: promote those crossing the sample threshold =====
+    counts = graph['lineage_sample_counts']
+    for lineage, n in new_rows.groupby('pango_lineage')['sample_count'].sum().items():
+        counts[lineage] = counts.get(lineage, 0) + int(n)
+    promoted = sorted(l for l in new_rows['pango_lineage'].unique()
+                      if l not in lineage_to_idx and counts[l] >= config.min_lineage_samples)
+    _extend_mapping(lineage_to_idx, promoted)
+    if promoted:
+        pad = hg['lineage'].x.new_zeros((len(promoted), hg['lineage'].x.shape[1]))
+        hg['lineage'].x = torch.cat([hg['lineage'].x, pad], dim=0)
+
+    history = graph['lineage_airport_weekly']
+    # Rows of promoted lineages recorded before they crossed the threshold become edges now
+    backfill = history[history['pango_lineage'].isin(promoted)]
+    graph['lineage_airport_weekly'] = pd.concat([history, new_rows], ignore_index=True)
+
+    # ===== 4. Flight edges =====
+    if new_flights is not None:
+        flight_edges = new_flights.groupby(
+            ['origin', 'destination', 'week'], observed=True
+        ).size().reset_index(name='flight_count')
+        _append_edges(hg, ('airport', 'flight', 'airport'),
+                      *build_flight_edges(flight_edges, airport_to_idx, week_to_idx))
+
+    # ===== 5. Sample edges =====
+    _append_edges(hg, ('lineage', 'sampled_at', 'airport'), *build_sample_edges(
+        pd.concat([backfill, new_rows], ignore_index=True), lineage_to_idx, airport_to_idx, week_to_idx
+    ))
+
+    # ===== 6. Temporal edges =====
+    # Only pairs touched by the delta can gain edges; their last earlier observation
+    # links the existing history to the new week.
+    pairs = new_rows[['pango_lineage', 'nearest_airport']].drop_duplicates()
+    previous = history.merge(pairs, on=['pango_lineage', 'nearest_airport'], how='inner')
+    previous = previous[~previous['pango_lineage'].isin(promoted)]
+    previous = previous.sort_values('week').groupby(['pango_lineage', 'nearest_airport']).tail(1)
+
+    temporal_index, temporal_attr = build_temporal_edges(
+        pd.concat([previous, backfill, new_rows], ignore_index=True),
+        lineage_to_idx, week_to_idx, config.temporal_max_gap
+    )
+    # Edges between two pre-existing weeks of an already indexed lineage are in the graph already
+    new_week_idx = torch.tensor([week_to_idx[w] for w in new_weeks], dtype=torch.float)
+    promoted_idx = torch.tensor([lineage_to_idx[l] for l in promoted], dtype=torch.long)
+    keep = torch.isin(temporal_attr[:, 1], new_week_idx) | torch.isin(temporal_index[0], promoted_idx)
+    _append_edges(hg, ('lineage', 'temporal', 'lineage'), temporal_index[:, keep], temporal_attr[keep])
+
+    # ===== 7. Mutation features for touched lineages =====
+    if new_metadata is not None:
+        touched = new_metadata[new_metadata['pango_lineage'].astype(str).isin(list(lineage_to_idx))]
+        touched_lineages = sorted(touched['pango_lineage'].astype(str).unique())
+        if touched_lineages:
+            local_to_idx = {lineage: i for i, lineage in enumerate(touched_lineages)}
+            delta_features, _ = build_mutation_features(
+                touched.astype({'pango_lineage': str}), local_to_idx, vocabulary=graph['mutation_vocabulary']
+            )
+            rows = torch.tensor([lineage_to_idx[l] for l in touched_lineages], dtype=torch.long)
+            lineage_x = hg['lineage'].x.clone()
+            # Features are multi-hot, so merging the delta is an element-wise OR
+            lineage_x[rows] = torch.maximum(lineage_x[rows], delta_features)
+            hg['lineage'].x = lineage_x
+
+    graph.setdefault('updates', []).append([str(w) for w in new_weeks])
+    return graph
@@ -0,0 +1,248 @@
+"""
+HGTDetector model and training loops
+Heterogeneous Graph Transformer that scores (lineage, airport) pairs for the
+('lineage', 'sampled_at', 'airport') link prediction task.
+"""
+
+import copy
+import warnings
+
+import torch
+import torch.nn.functional as F
+from torch_geometric.nn import HGTConv, Linear
+from torch_geometric.utils import negative_sampling
+
+TARGET_EDGE = ('lineage', 'sampled_at', 'airport')
+
+# Max absolute difference allowed between InferenceHGT and eager float32 embeddings (unit vectors,
+# so cosine scores move by at most about twice this). Checked when an InferenceHGT is built.
+INFERENCE_TOLERANCE = {torch.float32: 1e-4, torch.bfloat16: 2e-2}
+
+
+class HGTDetector(torch.nn.Module):
+    def __init__(self, metadata, in_channels, hidden_channels, out_channels, num_heads, num_layers, dropout=0.6):
+        """
+        Parameters:
+        -----------
+        metadata : tuple
+            (node_types, edge_types), as returned by HeteroData.metadata()
+        in_channels : dict
+            Input feature dimension per node type
+        """
+        super().__init__()
+        self.dropout = dropout
+
+        # Linear projection of raw node features to hidden_channels
+        self.lin_dict = torch.nn.ModuleDict()
+        for node_type in metadata[0]:
+            self.lin_dict[node_type] = Linear(in_channels[node_type], hidden_channels)
+
+        self.convs = torch.nn.ModuleList()
+        for _ in range(num_layers):
+            self.convs.append(HGTConv(hidden_channels, hidden_channels, metadata, num_heads))
+
+        # Learnable temperature: stretches cosine scores in [-1, 1] to logits in [-10, 10]
+        self.temperature = torch.nn.Parameter(torch.tensor(10.0))
+
+    @classmethod
+    def from_graph(cls, hg, hidden_channels=32, out_channels=32, num_heads=2, num_layers=2, dropout=0.6):
+        """Build a model sized for the node features and edge types of `hg`."""
+        in_channels = {node_type: hg[node_type].x.shape[1] for node_type in hg.node_types}
+        return cls(hg.metadata(), in_channels, hidden_channels, out_channels, num_heads, num_layers, dropout)
+
+    def forward(self, x_dict, edge_index_dict):
+        # 1. Project features to common dimension
+        x_dict = {node_type: self.lin_dict[node_type](x) for node_type, x in x_dict.items()}
+
+        # 2. Apply GNN layers, with activation and dropout between them
+        for i, conv in enumerate(self.convs):
+            x_dict = conv(x_dict, edge_index_dict)
+            if i < len(self.convs) - 1:
+                for node_type in x_dict:
+                    x_dict[node_type] = F.relu(x_dict[node_type])
+                    x_dict[node_type] = F.dropout(x_dict[node_type], p=self.dropout, training=self.training)
+
+        # 3. Normalize embeddings so dot products are cosine similarities
+        return {node_type: F.normalize(x, p=2, dim=-1) for node_type, x in x_dict.items()}
+
+
+def link_loss(out, pos_edge_index, neg_edge_index, temperature):
+    """Binary cross entropy over scaled cosine scores of positive and negative (lineage, airport) pairs."""
+    pos_score = (out['lineage'][pos_edge_index[0]] * out['airport'][pos_edge_index[1]]).sum(dim=-1) * temperature
+    neg_score = (out['lineage'][neg_edge_index[0]] * out['airport'][neg_edge_index[1]]).sum(dim=-1) * temperature
+
+    scores = torch.cat([pos_score, neg_score])
+    labels = torch.cat([torch.ones_like(pos_score), torch.zeros_like(neg_score)])
+    return F.binary_cross_entropy_with_logits(scores, labels)
+
+
+def train_epoch(model, optimizer, data, edge_label_index=None, negative_sampler=None):
+    """
+    One full-batch training step
+
+    Message passing runs over the whole of `data`; the loss is computed on
+    `edge_label_index` (default: all supervision edges of `data`). Negatives are uniform
+    unless a `negative_sampler` (sampling.HardNegativeSampler) is given.
+    """
+    model.train()
+    optimizer.zero_grad()
+
+    out = model(data.x_dict, data.edge_index_dict)
+
+    edge_index = edge_label_index if edge_label_index is not None else data[TARGET_EDGE].edge_index
+    if negative_sampler is not None:
+        neg_edge_index = negative_sampler.sample(edge_index[0]).to(edge_index.device)
+    else:
+        neg_edge_index = negative_sampling(
+            edge_index,
+            num_nodes=(data['lineage'].num_nodes, data['airport'].num_nodes),
+            num_neg_samples=edge_index.size(1)
+        )
+
+    loss = link_loss(out, edge_index, neg_edge_index, model.temperature)
+    loss.backward()
+    optimizer.step()
+    return loss.item()
+
+
+def train_minibatch_epoch(model, optimizer, loader, device=None):
+    """
+    One epoch of mini-batch training over a LinkBatchLoader
+
+    Each batch is a sampled subgraph around a batch of supervision edges, so memory
+    is bounded by the batch size and fan-out rather than by the size of the graph.
+
+    Returns:
+    --------
+    float : mean loss over supervision edges
+    """
+    model.train()
+    total_loss, total_edges = 0.0, 0
+
+    for batch in loader:
+        if device is not None:
+            batch = batch.to(device)
+        optimizer.zero_grad()
+
+        out = model(batch.x_dict, batch.edge_index_dict)
+        loss = link_loss(out, batch.pos_edge_label_index, batch.neg_edge_label_index, model.temperature)
+        loss.backward()
+        optimizer.step()
+
+        num_edges = batch.pos_edge_label_index.size(1)
+        total_loss += loss.item() * num_edges
+        total_edges += num_edges
+
+    return total_loss / max(total_edges, 1)
+
+
+# ========== INFERENCE ==========
+
+class _ConvStack(torch.nn.Module):
+    """HGTConv layers of a trained HGTDetector in eval mode, over flat per-type tensors (traceable)."""
+
+    def __init__(self, convs, node_types, edge_types):
+        super().__init__()
+        self.convs = convs
+        self.node_types = list(node_types)
+        self.edge_types = list(edge_types)
+
+    def forward(self, *tensors):
+        x_dict = dict(zip(self.node_types, tensors[:len(self.node_types)]))
+        edge_index_dict = dict(zip(self.edge_types, tensors[len(self.node_types):]))
+        for i, conv in enumerate(self.convs):
+            x_dict = conv(x_dict, edge_index_dict)
+            if i < len(self.convs) - 1:
+                x_dict = {node_type: F.relu(x) for node_type, x in x_dict.items()}
+        return tuple(F.normalize(x_dict[node_type].float(), p=2, dim=-1) for node_type in self.node_types)
+
+
+class InferenceHGT:
+    """
+    Inference-only HGTDetector for weekly risk scoring on CPU
+
+    - The lin_dict projections of the (static) node features are computed once and frozen
+    - Weights and activations can run in bfloat16
+    - The HGTConv stack is compiled with torch.compile, falling back to a TorchScript trace
+      and then to eager execution if a backend fails or exceeds INFERENCE_TOLERANCE; if no
+      backend is accurate enough in the requested dtype, float32 eager is used (with a warning)
+
+    Outputs are float32 L2-normalized embeddings, like HGTDetector.forward.
+
+    Parameters:
+    -----------
+    model : HGTDetector
+        Trained model (left unchanged)
+    data : HeteroData
+        Graph whose node features are frozen
+    dtype : torch.dtype
+        torch.float32 or torch.bfloat16
+    backend : str
+        'compile', 'script' or 'eager'; the backend and dtype actually used are stored in
+        `self.backend` and `self.dtype`
+    """
+
+    def __init__(self, model, data, dtype=torch.float32, backend='compile'):
+        self.node_types = list(data.node_types)
+        self.edge_types = list(data.edge_types)
+
+        was_training = model.training
+        model.eval()
+        with torch.no_grad():
+            projected = [model.lin_dict[nt](data[nt].x) for nt in self.node_types]
+            reference = model(data.x_dict, data.edge_index_dict)
+        model.train(was_training)
+
+        self._freeze(model, projected, dtype)
+        edge_index = [data[et].edge_index for et in self.edge_types]
+
+        backends = ['compile', 'script', 'eager']
+        for name in backends[backends.index(backend):]:
+            try:
+                self.module = self._build(name, edge_index)
+                with torch.no_grad():
+                    out = self.module(*self.frozen_x, *edge_index)
+                error = max(float((o - reference[nt]).abs().max()) for o, nt in zip(out, self.node_types))
+                if error <= INFERENCE_TOLERANCE[dtype]:
+                    self.backend, self.max_error = name, error
+                    return
+                warnings.warn(f"{name} inference differs from eager float32 by {error:.2e}; falling back")
+            except Exception as exc:
+                warnings.warn(f"{name} inference backend failed ({type(exc).__name__}: {exc}); falling back")
+
+        warnings.warn(f"No {dtype} inference backend matches the eager model within "
+                      f"{INFERENCE_TOLERANCE[dtype]}; using float32 eager")
+        self._freeze(model, projected, torch.float32)
+        self.module = self.eager
+        with torch.no_grad():
+            out = self.module(*self.frozen_x, *edge_index)
+        self.backend = 'eager'
+        self.max_error = max(float((o - reference[nt]).abs().max()) for o, nt in zip(out, self.node_types))
+
+    def _freeze(self, model, projected, dtype):
+        """Cast the projected node features and a copy of the conv stack to `dtype`."""
+        self.dtype = dtype
+        self.frozen_x = [x.to(dtype) for x in projected]
+        convs = copy.deepcopy(model.convs).to(dtype).eval()
+        self.eager = _ConvStack(convs, self.node_types, self.edge_types)
+
+    def _build(self, name, edge_index):
+        if name == 'compile':
+            return torch.compile(self.eager)
+        if name == 'script':
+            with torch.no_grad():
+                return torch.jit.trace(self.eager, (*self.frozen_x, *edge_index), check_trace=False)
+        return self.eager
+
+    @torch.no_grad()
+    def __call__(self, edge_index_dict):
+        """
+        Node embeddings for the frozen node features and the given edges (e.g. a newer snapshot
+        over the same nodes)
+
+        Returns:
+        --------
+        dict {node_type: Tensor [num_nodes, out_channels]} of float32 unit vectors
+        """
+        out = self.module(*self.frozen_x, *(edge_index_dict[et] for et in self.edge_types))
+        return dict(zip(self.node_types, out))
@@ -0,0 +1,319 @@
+"""
+Streaming ingestion of the raw GISAID inputs (metadata.tsv.zst, sequences.fasta.zst)
+Files are decompressed on the fly and filtered chunk by chunk, so peak memory depends on
+the chunk size rather than on the size of the input.
+
+Processed TSV tables are cached as typed, compressed Parquet next to the source file and
+reused for as long as the source is unchanged.
+
+Command line: filter the raw GISAID files to the study window without decompressing them
+to disk (see main()):
+    python ingest.py metadata data1/metadata.tsv.zst data1/processed/metadata_2020.tsv
+    python ingest.py sequences data1/sequences.fasta.zst data1/processed/sequences_2020.fasta \
+        --metadata data1/processed/metadata_2020.tsv
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import zstandard
+
+# Columns needed to build the graph; others are dropped while parsing
+GRAPH_COLUMNS = ['strain', 'date', 'pango_lineage', 'full_loc', 'lat', 'lon', 'aaSubstitutions']
+# Columns filter_metadata_chunk() reads, parsed even when they are not kept
+FILTER_COLUMNS = ['date', 'pango_lineage']
+
+DEFAULT_START_DATE = '2020-01-01'
+DEFAULT_END_DATE = '2020-04-30'
+
+# Bump when the cached table layout changes to invalidate existing Parquet caches
+CACHE_VERSION = 1
+
+
+def open_zst_text(path, encoding='utf-8'):
+    """Open a .zst file as a decompressing text stream."""
+    fh = open(path, 'rb')
+    reader = zstandard.ZstdDecompressor().stream_reader(fh, closefd=True)
+    return io.TextIOWrapper(reader, encoding=encoding, newline='')
+
+
+def filter_metadata_chunk(chunk, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                          exclude_lineages=('unclassifiable',)):
+    """
+    Apply the date-window and pango_lineage filters to one metadata chunk
+
+    Rows with unparseable dates, missing lineages or excluded lineages are dropped.
+    """
+    chunk = chunk.copy()
+    # An explicit format keeps pandas off the per-value dateutil fallback
+    chunk['date'] = pd.to_datetime(chunk['date'], format='ISO8601', errors='coerce')
+    mask = (chunk['date'] >= start_date) & (chunk['date'] <= end_date)
+    mask &= chunk['pango_lineage'].notna() & ~chunk['pango_lineage'].isin(exclude_lineages)
+    return chunk[mask]
+
+
+def iter_metadata_zst(path, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                      columns=GRAPH_COLUMNS, chunksize=200_000, exclude_lineages=('unclassifiable',)):
+    """
+    Stream filtered chunks of a (zstd compressed) metadata TSV
+
+    Parameters:
+    -----------
+    path : str or Path
+        metadata.tsv.zst (or a plain .tsv)
+    start_date, end_date : str
+        Inclusive sampling date window
+    columns : list
+        Columns to keep; columns missing from the file are skipped. The date and
+        pango_lineage columns are always read for the filters.
+    chunksize : int
+        Rows parsed per chunk
+
+    Yields:
+    -------
+    DataFrame chunks containing only the requested columns and rows passing the filters
+    """
+    wanted = set(columns) | set(FILTER_COLUMNS)
+    path = Path(path)
+    source = open_zst_text(path) if path.suffix == '.zst' else open(path, newline='')
+
+    with source:
+        reader = pd.read_csv(
+            source,
+            sep='\t',
+            usecols=lambda c: c in wanted,
+            dtype={'strain': str, 'pango_lineage': str, 'full_loc': str, 'aaSubstitutions': str},
+            chunksize=chunksize,
+        )
+        for chunk in reader:
+            chunk = filter_metadata_chunk(chunk, start_date, end_date, exclude_lineages)
+            if len(chunk):
+                yield chunk[[c for c in chunk.columns if c in columns]]
+
+
+def load_metadata_zst(path, **kwargs):
+    """Read a metadata file through iter_metadata_zst and return the filtered rows as one DataFrame."""
+    chunks = list(iter_metadata_zst(path, **kwargs))
+    if not chunks:
+        return pd.DataFrame(columns=[c for c in kwargs.get('columns', GRAPH_COLUMNS)])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def filter_metadata_zst(path, output_file, **kwargs):
+    """
+    Stream-filter a metadata file to a TSV on disk without holding the result in memory
+
+    Returns:
+    --------
+    int : number of rows written
+    """
+    written = 0
+    with open(output_file, 'w', newline='') as out:
+        for chunk in iter_metadata_zst(path, **kwargs):
+            chunk.to_csv(out, sep='\t', index=False, header=written == 0, date_format='%Y-%m-%d')
+            written += len(chunk)
+    return written
+
+
+def iter_fasta_zst(path, strains=None, strip_prefix='hCoV-19/'):
+    """
+    Stream (strain, sequence) records from a (zstd compressed) FASTA file
+
+    Parameters:
+    -----------
+    path : str or Path
+        sequences.fasta.zst (or a plain .fasta)
+    strains : set (optional)
+        Only records whose strain name is in this set are yielded
+    strip_prefix : str
+        Prefix removed from headers before the strain lookup
+
+    Yields:
+    -------
+    (strain, sequence) tuples
+    """
+    path = Path(path)
+    source = open_zst_text(path) if path.suffix == '.zst' else open(path)
+
+    with source:
+        strain, parts, keep = None, [], False
+        for line in source:
+            if line.startswith('>'):
+                if keep:
+                    yield strain, ''.join(parts)
+                strain = line[1:].strip().split('|')[0].replace(strip_prefix, '')
+                parts = []
+                keep = strains is None or strain in strains
+            elif keep:
+                parts.append(line.strip())
+        if keep:
+            yield strain, ''.join(parts)
+
+
+def filter_fasta_zst(path, output_file, strains, line_width=80):
+    """
+    Stream-filter a FASTA file down to the given strains
+
+    Returns:
+    --------
+    int : number of records written
+    """
+    written = 0
+    with open(output_file, 'w') as out:
+        for strain, sequence in iter_fasta_zst(path, strains=strains):
+            out.write(f'>{strain}\n')
+            for i in range(0, len(sequence), line_width):
+                out.write(sequence[i:i + line_width] + '\n')
+            written += 1
+    return written
+
+
+# ========== PARQUET CACHE ==========
+
+def file_sha256(path, block_size=1 << 20):
+    """Content hash of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(source, cache_dir):
+    # Keyed on the full file name: metadata.tsv.zst and metadata.2024.tsv.zst must not share a cache
+    source = Path(source)
+    cache_dir = Path(cache_dir) if cache_dir is not None else source.parent / 'cache'
+    return cache_dir / f'{source.name}.parquet', cache_dir / f'{source.name}.meta.json'
+
+
+def _cache_is_fresh(source, meta_path, kind):
+    """The cache is fresh if size and mtime match, or if only the mtime moved but the content hash matches."""
+    if not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text())
+    stat = os.stat(source)
+    if meta.get('version') != CACHE_VERSION or meta.get('kind') != kind or meta.get('size') != stat.st_size:
+        return False
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    if meta.get('sha256') == file_sha256(source):
+        # Touched but unchanged: refresh the mtime so the next check is cheap again
+        meta['mtime_ns'] = stat.st_mtime_ns
+        meta_path.write_text(json.dumps(meta, indent=2))
+        return True
+    return False
+
+
+def load_cached_table(source, kind, prepare, cache_dir=None, refresh=False):
+    """
+    Load a processed table through a Parquet cache
+
+    Parameters:
+    -----------
+    source : str or Path
+        Source TSV file
+    kind : str
+        Table kind recorded in the cache metadata ('genome', 'flights')
+    prepare : callable
+        Function reading `source` and returning the typed DataFrame to cache
+    cache_dir : str or Path (optional)
+        Cache directory; defaults to a 'cache' folder next to the source file
+    refresh : bool
+        Rebuild the cache even if it is fresh
+
+    Returns:
+    --------
+    DataFrame
+    """
+    parquet_path, meta_path = _cache_paths(source, cache_dir)
+
+    if not refresh and parquet_path.exists() and _cache_is_fresh(source, meta_path, kind):
+        return pd.read_parquet(parquet_path)
+
+    df = prepare(source)
+
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(parquet_path, compression='zstd', index=False)
+    stat = os.stat(source)
+    meta_path.write_text(json.dumps({
+        'version': CACHE_VERSION,
+        'kind': kind,
+        'source': str(source),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(source),
+    }, indent=2))
+    return df
+
+
+def _prepare_genome_table(path):
+    df = pd.read_csv(path, sep='\t', low_memory=False)
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df['week'] = df['date'].dt.to_period('W')
+    for col in ('pango_lineage', 'full_loc', 'country', 'region', 'division'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _prepare_flight_table(path):
+    df = pd.read_csv(path, sep='\t', low_memory=False)
+    if 'week' not in df.columns:
+        df['week'] = pd.to_datetime(df['firstseen'], utc=True).dt.tz_localize(None).dt.to_period('W')
+    for col in ('origin', 'destination'):
+        df[col] = df[col].astype('category')
+    return df
+
+
+def load_genome_table(path='./data1/processed/df_genome_with_coords.tsv', cache_dir=None, refresh=False):
+    """
+    Load df_genome_with_coords.tsv with a parsed `date`, a precomputed `week` period
+    and categorical lineage/location columns, through the Parquet cache
+    """
+    return load_cached_table(path, 'genome', _prepare_genome_table, cache_dir, refresh)
+
+
+def load_flight_table(path='./data1/processed/flights_with_airport_info.tsv', cache_dir=None, refresh=False):
+    """
+    Load flights_with_airport_info.tsv with categorical `origin`/`destination`
+    and a precomputed `week` period, through the Parquet cache
+    """
+    return load_cached_table(path, 'flights', _prepare_flight_table, cache_dir, refresh)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream-filter the raw GISAID metadata / sequences files',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    metadata = commands.add_parser('metadata', help='filter metadata.tsv(.zst) to a date window')
+    metadata.add_argument('input', help='metadata.tsv.zst or .tsv')
+    metadata.add_argument('output', help='filtered TSV to write')
+    metadata.add_argument('--start-date', default=DEFAULT_START_DATE)
+    metadata.add_argument('--end-date', default=DEFAULT_END_DATE)
+    metadata.add_argument('--columns', nargs='+', default=GRAPH_COLUMNS, help='columns to keep')
+    metadata.add_argument('--chunksize', type=int, default=200_000)
+
+    sequences = commands.add_parser('sequences', help='filter sequences.fasta(.zst) to a set of strains')
+    sequences.add_argument('input', help='sequences.fasta.zst or .fasta')
+    sequences.add_argument('output', help='filtered FASTA to write')
+    sequences.add_argument('--metadata', required=True, help="TSV whose 'strain' column lists the strains to keep")
+    args = parser.parse_args()
+
+    if args.command == 'metadata':
+        written = filter_metadata_zst(args.input, args.output, start_date=args.start_date, end_date=args.end_date,
+                                      columns=args.columns, chunksize=args.chunksize)
+        print(f"✓ Wrote {written} metadata rows to {args.output}")
+    else:
+        strains = set(pd.read_csv(args.metadata, sep='\t', usecols=['strain'], dtype=str)['strain'].dropna())
+        written = filter_fasta_zst(args.input, args.output, strains)
+        print(f"✓ Wrote {written} of {len(strains)} strains to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
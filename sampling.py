@@ -0,0 +1,548 @@
+"""
+Neighbor sampling for mini-batch training on the lineage/airport HeteroData graph
+Pure PyTorch implementation (no pyg-lib / torch-sparse needed): edges are indexed once
+in CSC order per edge type, and each batch samples a bounded neighborhood around its
+seed nodes, hop by hop.
+
+The temporal variant only samples edges whose week lies strictly before the week of the
+supervision edges in the batch, so training is leakage-free without cloning the graph.
+"""
+
+import math
+
+import torch
+from torch_geometric.data import HeteroData
+
+# Column of edge_attr holding the week index of each timestamped edge type.
+# Temporal edges use their *target* week: the growth rate they carry is only known then.
+# Edge types not listed here (evolves_from) are static and always available.
+EDGE_TIME_COLUMNS = {
+    ('airport', 'flight', 'airport'): 1,
+    ('lineage', 'sampled_at', 'airport'): 1,
+    ('lineage', 'temporal', 'lineage'): 1,
+}
+
+
+def edge_times(data, edge_time_columns=EDGE_TIME_COLUMNS):
+    """Per-edge week index (LongTensor) for every timestamped edge type present in `data`."""
+    return {
+        edge_type: data[edge_type].edge_attr[:, col].long()
+        for edge_type, col in edge_time_columns.items()
+        if edge_type in data.edge_types
+    }
+
+
+def _ranges(start, length):
+    """Concatenate arange(start[i], start[i] + length[i]) for all i."""
+    total = int(length.sum())
+    if total == 0:
+        return start.new_empty(0)
+    offsets = torch.repeat_interleave(start - (torch.cumsum(length, 0) - length), length)
+    return offsets + torch.arange(total, device=start.device)
+
+
+class HeteroNeighborSampler:
+    """
+    Uniform heterogeneous neighbor sampler
+
+    Parameters:
+    -----------
+    data : HeteroData
+        Graph to sample from
+    num_neighbors : list or dict
+        Fan-out per hop, either shared by all edge types (e.g. [15, 10]) or given
+        per edge type as {edge_type: [15, 10]}. -1 keeps all neighbors, 0 none.
+    edge_time : dict (optional)
+        Mapping from edge type to a per-edge LongTensor timestamp; enables `before=`
+        in sample(). Edge types without timestamps are never filtered.
+    generator : torch.Generator (optional)
+        Random number generator, for reproducible sampling
+    """
+
+    def __init__(self, data, num_neighbors, edge_time=None, generator=None):
+        self.data = data
+        self.generator = generator
+        edge_time = edge_time or {}
+
+        if isinstance(num_neighbors, dict):
+            self.num_neighbors = {et: list(num_neighbors.get(et, [])) for et in data.edge_types}
+        else:
+            self.num_neighbors = {et: list(num_neighbors) for et in data.edge_types}
+        self.num_hops = max((len(v) for v in self.num_neighbors.values()), default=0)
+
+        # Incoming edges of every destination node, in CSC order. Timestamped edge
+        # types are additionally sorted by time within each node, so the edges
+        # before time t form a prefix of the node's segment.
+        self.csc = {}
+        self.time_key = {}
+        for edge_type in data.edge_types:
+            src, dst = data[edge_type].edge_index
+            num_dst = data[edge_type[2]].num_nodes
+            if edge_type in edge_time:
+                time = edge_time[edge_type]
+                perm = torch.argsort(time, stable=True)
+                perm = perm[torch.argsort(dst[perm], stable=True)]
+                stride = int(time.max()) + 2 if time.numel() else 1
+                self.time_key[edge_type] = (dst[perm] * stride + time[perm], stride)
+            else:
+                perm = torch.argsort(dst, stable=True)
+            ptr = torch.zeros(num_dst + 1, dtype=torch.long)
+            ptr[1:] = torch.cumsum(torch.bincount(dst, minlength=num_dst), 0)
+            self.csc[edge_type] = (ptr, src[perm], perm)
+
+    def _sample_incoming(self, edge_type, nodes, fanout, before=None):
+        """
+        Sample up to `fanout` incoming edges for each node
+
+        Returns CSC positions of the sampled edges. Nodes with more than `fanout`
+        neighbors draw exactly `fanout` distinct edges, uniformly without replacement.
+        With `before`, only edges with timestamp < before are eligible.
+        """
+        ptr, _, _ = self.csc[edge_type]
+        start = ptr[nodes]
+        if before is not None and edge_type in self.time_key:
+            key, stride = self.time_key[edge_type]
+            bound = min(max(int(before), 0), stride - 1)
+            end = torch.searchsorted(key, nodes * stride + bound)
+        else:
+            end = ptr[nodes + 1]
+        deg = end - start
+
+        if fanout < 0:
+            pos = _ranges(start, deg)
+        else:
+            small = deg <= fanout
+            pos_small = _ranges(start[small], deg[small])
+            big_start, big_deg = start[~small], deg[~small]
+            # Shuffle each node's segment with random keys and keep its first `fanout` edges
+            segment = torch.repeat_interleave(torch.arange(big_deg.numel()), big_deg)
+            order = torch.argsort(torch.rand(segment.numel(), generator=self.generator))
+            order = order[torch.argsort(segment[order], stable=True)]
+            rank = torch.arange(segment.numel()) - torch.repeat_interleave(torch.cumsum(big_deg, 0) - big_deg, big_deg)
+            pos_big = _ranges(big_start, big_deg)[order[rank < fanout]]
+            pos = torch.cat([pos_small, pos_big])
+        return pos
+
+    def sample(self, seeds, before=None):
+        """
+        Sample the multi-hop neighborhood of the seed nodes
+
+        Parameters:
+        -----------
+        seeds : dict
+            Mapping from node type to LongTensor of unique global node ids.
+            Seeds are the first nodes of each type in the returned subgraph.
+        before : int (optional)
+            Only sample timestamped edges with time < before
+
+        Returns:
+        --------
+        HeteroData subgraph with local edge indices; `n_id` and `e_id` hold the global ids
+        """
+        data = self.data
+        n_id = {nt: [seeds.get(nt, torch.empty(0, dtype=torch.long))] for nt in data.node_types}
+        seen = {}
+        for nt in data.node_types:
+            seen[nt] = torch.zeros(data[nt].num_nodes, dtype=torch.bool)
+            seen[nt][n_id[nt][0]] = True
+        frontier = {nt: n_id[nt][0] for nt in data.node_types}
+        sampled = {et: [] for et in data.edge_types}
+
+        for hop in range(self.num_hops):
+            next_frontier = {nt: [] for nt in data.node_types}
+            for edge_type in data.edge_types:
+                fanouts = self.num_neighbors[edge_type]
+                fanout = fanouts[hop] if hop < len(fanouts) else 0
+                dst_nodes = frontier[edge_type[2]]
+                if fanout == 0 or dst_nodes.numel() == 0:
+                    continue
+
+                pos = self._sample_incoming(edge_type, dst_nodes, fanout, before)
+                sampled[edge_type].append(pos)
+
+                # Newly reached source nodes join the subgraph and the next frontier
+                src_nodes = torch.unique(self.csc[edge_type][1][pos])
+                fresh = src_nodes[~seen[edge_type[0]][src_nodes]]
+                if fresh.numel():
+                    seen[edge_type[0]][fresh] = True
+                    next_frontier[edge_type[0]].append(fresh)
+
+            frontier = {}
+            for nt, parts in next_frontier.items():
+                frontier[nt] = torch.cat(parts) if parts else torch.empty(0, dtype=torch.long)
+                n_id[nt].append(frontier[nt])
+
+        return self._build_subgraph(n_id, sampled)
+
+    def _build_subgraph(self, n_id, sampled):
+        data = self.data
+        sub = HeteroData()
+        local = {}
+        for node_type in data.node_types:
+            ids = torch.cat(n_id[node_type])
+            sub[node_type].n_id = ids
+            sub[node_type].num_nodes = ids.numel()
+            if 'x' in data[node_type]:
+                sub[node_type].x = data[node_type].x[ids]
+            lookup = torch.full((data[node_type].num_nodes,), -1, dtype=torch.long)
+            lookup[ids] = torch.arange(ids.numel())
+            local[node_type] = lookup
+
+        for edge_type in data.edge_types:
+            src_type, _, dst_type = edge_type
+            ptr, col, perm = self.csc[edge_type]
+            pos = torch.cat(sampled[edge_type]) if sampled[edge_type] else torch.empty(0, dtype=torch.long)
+            dst = torch.searchsorted(ptr, pos, right=True) - 1
+
+            sub[edge_type].edge_index = torch.stack([local[src_type][col[pos]], local[dst_type][dst]])
+            sub[edge_type].e_id = perm[pos]
+            if 'edge_attr' in data[edge_type]:
+                sub[edge_type].edge_attr = data[edge_type].edge_attr[perm[pos]]
+        return sub
+
+
+class AliasTable:
+    """
+    Walker alias table: O(1) draws from a fixed discrete distribution
+
+    Parameters:
+    -----------
+    weights : Tensor [n]
+        Non-negative, unnormalized weights (all zero = uniform)
+    """
+
+    def __init__(self, weights):
+        weights = weights.double().clamp(min=0)
+        n = weights.numel()
+        if n == 0:
+            raise ValueError("AliasTable needs at least one weight")
+        total = weights.sum()
+        scaled = (weights * n / total if total > 0 else torch.ones(n, dtype=torch.double)).tolist()
+
+        prob, alias = [1.0] * n, list(range(n))
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s], alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        self.prob = torch.tensor(prob, dtype=torch.float)
+        self.alias = torch.tensor(alias, dtype=torch.long)
+
+    def __len__(self):
+        return self.prob.numel()
+
+    def sample(self, num, generator=None):
+        """Draw `num` indices."""
+        idx = torch.randint(len(self), (num,), generator=generator)
+        keep = torch.rand(num, generator=generator) < self.prob[idx]
+        return torch.where(keep, idx, self.alias[idx])
+
+
+class HardNegativeSampler:
+    """
+    Negative airports biased towards plausible destinations instead of uniform over all airports
+
+    Modes:
+        'degree'    -- airports drawn proportionally to (flight volume) ** degree_power, from one alias table
+        'reachable' -- airports 1 to `num_hops` flights away from an airport where the same
+                       lineage was sampled; each draw picks a random known airport of the lineage
+                       and walks random flight edges (edges per route-week, so busier routes are
+                       more likely). Lineages without known airports fall back to 'degree'.
+
+    Every draw is O(1): alias lookups and CSR offsets, vectorized over the batch. Draws that
+    hit a known positive pair are redrawn a few times, then replaced by uniform airports.
+
+    Parameters:
+    -----------
+    data : HeteroData
+        Training graph (only edges visible at training time should be used)
+    mode : str
+        'degree' or 'reachable'
+    uniform_ratio : float
+        Share of negatives drawn uniformly over all airports (keeps some easy negatives)
+    before : int (optional)
+        Only use timestamped edges with week < before (see edge_times); `at(week)` builds
+        such a restricted copy of an unrestricted sampler
+    """
+
+    def __init__(self, data, mode='degree', edge_type=('lineage', 'sampled_at', 'airport'),
+                 flight_edge_type=('airport', 'flight', 'airport'), num_hops=2, degree_power=0.75,
+                 uniform_ratio=0.0, max_retries=3, generator=None, before=None,
+                 edge_time_columns=EDGE_TIME_COLUMNS):
+        if mode not in ('degree', 'reachable'):
+            raise ValueError(f"Unknown negative sampling mode: {mode}")
+        self.data = data
+        self.options = dict(mode=mode, edge_type=edge_type, flight_edge_type=flight_edge_type,
+                            num_hops=num_hops, degree_power=degree_power, uniform_ratio=uniform_ratio,
+                            max_retries=max_retries, generator=generator,
+                            edge_time_columns=edge_time_columns)
+        self.before = before
+        self.mode = mode
+        self.num_hops = num_hops
+        self.uniform_ratio = uniform_ratio
+        self.max_retries = max_retries
+        self.generator = generator
+        self.num_airports = data[edge_type[2]].num_nodes
+
+        times = edge_times(data, edge_time_columns) if before is not None else {}
+
+        def visible(store_type, edge_index):
+            if store_type not in times:
+                return edge_index
+            return edge_index[:, times[store_type].cpu() < before]
+
+        # Positive pairs, as sorted int64 keys lineage * num_airports + airport
+        pos = visible(edge_type, data[edge_type].edge_index.cpu())
+        self.positive_keys = torch.unique(pos[0] * self.num_airports + pos[1])
+
+        # Flight volume per airport (both directions), for the degree alias table
+        volume = torch.zeros(self.num_airports, dtype=torch.double)
+        if flight_edge_type in data.edge_types:
+            store = data[flight_edge_type]
+            flights = store.edge_index.cpu()
+            counts = store.edge_attr[:, 0].double().cpu() if 'edge_attr' in store else torch.ones(flights.size(1))
+            if flight_edge_type in times:
+                mask = times[flight_edge_type].cpu() < before
+                flights, counts = flights[:, mask], counts[mask]
+            volume.index_add_(0, flights[0], counts.to(torch.double))
+            volume.index_add_(0, flights[1], counts.to(torch.double))
+        self.degree_table = AliasTable(volume.pow(degree_power))
+
+        if mode == 'reachable':
+            # Known airports per lineage and flight destinations per airport, in CSR order
+            num_lineages = data[edge_type[0]].num_nodes
+            self.lineage_ptr, self.lineage_airports = self._csr(pos[0], pos[1], num_lineages)
+            flights = visible(flight_edge_type, data[flight_edge_type].edge_index.cpu()) \
+                if flight_edge_type in data.edge_types else torch.empty(2, 0, dtype=torch.long)
+            self.flight_ptr, self.flight_dst = self._csr(flights[0], flights[1], self.num_airports)
+
+    def at(self, week):
+        """Copy of this sampler that only sees timestamped edges with week < `week`."""
+        if self.before is not None and week > self.before:
+            raise ValueError(f"Sampler is restricted to weeks < {self.before}, cannot move it to week {week}")
+        return HardNegativeSampler(self.data, before=week, **self.options)
+
+    @staticmethod
+    def _csr(src, dst, num_src):
+        perm = torch.argsort(src, stable=True)
+        ptr = torch.zeros(num_src + 1, dtype=torch.long)
+        ptr[1:] = torch.cumsum(torch.bincount(src, minlength=num_src), 0)
+        return ptr, dst[perm]
+
+    def _pick(self, ptr, values, nodes):
+        """One uniformly random CSR neighbor per node; -1 for nodes without neighbors."""
+        start, deg = ptr[nodes], ptr[nodes + 1] - ptr[nodes]
+        offset = (torch.rand(nodes.numel(), generator=self.generator) * deg).long()
+        has = deg > 0
+        out = torch.full_like(nodes, -1)
+        out[has] = values[start[has] + offset[has]]
+        return out
+
+    def _draw(self, lineages):
+        airports = self.degree_table.sample(lineages.numel(), self.generator)
+        if self.mode == 'reachable':
+            current = self._pick(self.lineage_ptr, self.lineage_airports, lineages)
+            hops = torch.randint(1, self.num_hops + 1, (lineages.numel(),), generator=self.generator)
+            for hop in range(1, self.num_hops + 1):
+                walking = (current >= 0) & (hops >= hop)
+                nxt = self._pick(self.flight_ptr, self.flight_dst, current[walking])
+                # Stop at the last airport reached if it has no outgoing flights
+                current[walking] = torch.where(nxt >= 0, nxt, current[walking])
+            airports = torch.where(current >= 0, current, airports)
+
+        if self.uniform_ratio > 0:
+            uniform = torch.rand(lineages.numel(), generator=self.generator) < self.uniform_ratio
+            airports[uniform] = torch.randint(self.num_airports, (int(uniform.sum()),), generator=self.generator)
+        return airports
+
+    def sample(self, lineages):
+        """
+        One negative airport per lineage
+
+        Parameters:
+        -----------
+        lineages : LongTensor [num_neg]
+            Source lineage of each negative (e.g. the lineages of a batch of positives)
+
+        Returns:
+        --------
+        LongTensor [2, num_neg] of (lineage, airport) negatives
+        """
+        lineages = lineages.cpu()
+        airports = self._draw(lineages)
+        for attempt in range(self.max_retries + 1):
+            clash = torch.isin(lineages * self.num_airports + airports, self.positive_keys)
+            if not bool(clash.any()):
+                break
+            if attempt < self.max_retries:
+                airports[clash] = self._draw(lineages[clash])
+            else:
+                airports[clash] = torch.randint(self.num_airports, (int(clash.sum()),), generator=self.generator)
+        return torch.stack([lineages, airports])
+
+
+class LinkBatchLoader:
+    """
+    Mini-batches of supervision edges with their sampled neighborhoods
+
+    Each batch holds a batch of positive (lineage, airport) edges, the same number of
+    negatives per positive (random airports for the same lineages), and the subgraph
+    sampled around all of their endpoints. Positives and negatives are exposed in local
+    subgraph indices as `pos_edge_label_index` / `neg_edge_label_index`.
+
+    Parameters:
+    -----------
+    data : HeteroData
+        Graph used for message passing
+    num_neighbors : list or dict
+        Fan-out per hop (see HeteroNeighborSampler)
+    edge_type : tuple
+        Supervision edge type
+    edge_label_index : LongTensor [2, E] (optional)
+        Supervision edges; defaults to all edges of `edge_type` in `data`
+    batch_size : int
+        Positive edges per batch
+    shuffle : bool
+        Shuffle the supervision edges every epoch
+    neg_sampling_ratio : float
+        Negatives per positive
+    negative_sampler : HardNegativeSampler (optional)
+        Draws the negative airports; defaults to uniform over all airports
+    """
+
+    def __init__(self, data, num_neighbors, edge_type=('lineage', 'sampled_at', 'airport'),
+                 edge_label_index=None, batch_size=1024, shuffle=True, neg_sampling_ratio=1.0,
+                 generator=None, negative_sampler=None):
+        self.data = data
+        self.edge_type = edge_type
+        self.edge_label_index = edge_label_index if edge_label_index is not None else data[edge_type].edge_index
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.neg_sampling_ratio = neg_sampling_ratio
+        self.generator = generator
+        self.negative_sampler = negative_sampler
+        self.sampler = HeteroNeighborSampler(data, num_neighbors, generator=generator)
+
+    def __len__(self):
+        return math.ceil(self.edge_label_index.size(1) / self.batch_size)
+
+    def _batch_order(self):
+        num_edges = self.edge_label_index.size(1)
+        if self.shuffle:
+            return torch.randperm(num_edges, generator=self.generator)
+        return torch.arange(num_edges)
+
+    def _negatives(self, pos, negative_sampler=None):
+        num_neg = int(round(pos.size(1) * self.neg_sampling_ratio))
+        src = pos[0][torch.randint(pos.size(1), (num_neg,), generator=self.generator)]
+        negative_sampler = negative_sampler if negative_sampler is not None else self.negative_sampler
+        if negative_sampler is not None:
+            return negative_sampler.sample(src)
+        dst = torch.randint(self.data[self.edge_type[2]].num_nodes, (num_neg,), generator=self.generator)
+        return torch.stack([src, dst])
+
+    def _make_batch(self, pos, neg, before=None):
+        src_type, _, dst_type = self.edge_type
+        src_seeds = torch.unique(torch.cat([pos[0], neg[0]]))
+        dst_seeds = torch.unique(torch.cat([pos[1], neg[1]]))
+        seeds = {src_type: src_seeds, dst_type: dst_seeds} if src_type != dst_type else \
+            {src_type: torch.unique(torch.cat([src_seeds, dst_seeds]))}
+
+        batch = self.sampler.sample(seeds, before=before)
+
+        # Seeds come first in the subgraph and are sorted, so their local id is their rank
+        def to_local(edges):
+            return torch.stack([
+                torch.searchsorted(seeds[src_type], edges[0]),
+                torch.searchsorted(seeds[dst_type], edges[1]),
+            ])
+
+        batch.pos_edge_label_index = to_local(pos)
+        batch.neg_edge_label_index = to_local(neg)
+        return batch
+
+    def __iter__(self):
+        order = self._batch_order()
+        for start in range(0, order.numel(), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            pos = self.edge_label_index[:, idx]
+            yield self._make_batch(pos, self._negatives(pos))
+
+
+class TemporalLinkBatchLoader(LinkBatchLoader):
+    """
+    Leakage-free mini-batches over supervision edges from all weeks
+
+    Supervision edges are batched per week; for a batch at week t, only edges with a
+    week index < t are sampled as neighbors (evolves_from edges carry no time and are
+    always eligible). Training can therefore use every week of the full graph at once,
+    without cloning and masking a separate graph per split.
+
+    Parameters:
+    -----------
+    data : HeteroData
+        Full graph (all weeks)
+    num_neighbors : list or dict
+        Fan-out per hop (see HeteroNeighborSampler)
+    edge_time_columns : dict
+        Column of edge_attr holding the week for each timestamped edge type
+    edge_label_index : LongTensor [2, E] (optional)
+        Supervision edges; defaults to all edges of `edge_type` in `data`
+    edge_label_time : LongTensor [E] (optional)
+        Week of each supervision edge; defaults to the edge type's week column
+    negative_sampler : HardNegativeSampler (optional)
+        Built on the full graph; batches of week t draw from `negative_sampler.at(t)` so hard
+        negatives never use (or avoid) positives and flights from week t onwards
+    """
+
+    def __init__(self, data, num_neighbors, edge_type=('lineage', 'sampled_at', 'airport'),
+                 edge_label_index=None, edge_label_time=None, batch_size=1024, shuffle=True,
+                 neg_sampling_ratio=1.0, edge_time_columns=EDGE_TIME_COLUMNS, generator=None,
+                 negative_sampler=None):
+        super().__init__(data, num_neighbors, edge_type, edge_label_index, batch_size, shuffle,
+                         neg_sampling_ratio, generator, negative_sampler)
+        times = edge_times(data, edge_time_columns)
+        self.sampler = HeteroNeighborSampler(data, num_neighbors, edge_time=times, generator=generator)
+        if edge_label_time is None:
+            if edge_label_index is not None:
+                raise ValueError("edge_label_time is required when edge_label_index is given")
+            edge_label_time = times[edge_type]
+        self.edge_label_time = edge_label_time.long()
+        self._week_samplers = {}
+
+    def _week_negatives(self, pos, week):
+        if self.negative_sampler is None:
+            return self._negatives(pos)
+        # One time-restricted copy per week, built the first time the week comes up
+        if week not in self._week_samplers:
+            self._week_samplers[week] = self.negative_sampler.at(week)
+        return self._negatives(pos, self._week_samplers[week])
+
+    def _week_batches(self):
+        """(week, edge ids) for every batch, each batch drawn from a single week."""
+        batches = []
+        for week in torch.unique(self.edge_label_time).tolist():
+            idx = torch.nonzero(self.edge_label_time == week).flatten()
+            if self.shuffle:
+                idx = idx[torch.randperm(idx.numel(), generator=self.generator)]
+            batches.extend((week, chunk) for chunk in torch.split(idx, self.batch_size))
+        if self.shuffle:
+            order = torch.randperm(len(batches), generator=self.generator).tolist()
+            batches = [batches[i] for i in order]
+        return batches
+
+    def __len__(self):
+        if self.edge_label_time.numel() == 0:
+            return 0
+        counts = torch.bincount(self.edge_label_time - self.edge_label_time.min())
+        return sum(math.ceil(int(c) / self.batch_size) for c in counts if c > 0)
+
+    def __iter__(self):
+        for week, idx in self._week_batches():
+            pos = self.edge_label_index[:, idx]
+            batch = self._make_batch(pos, self._week_negatives(pos, week), before=week)
+            batch.week = week
+            yield batch
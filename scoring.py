@@ -0,0 +1,79 @@
+"""
+Chunked lineage × airport risk scoring
+The (lineage, airport) score matrix is computed tile by tile, keeping only a running
+per-airport aggregate and a running per-lineage top-k, so memory is bounded by the
+tile size instead of num_lineages × num_airports.
+"""
+
+import torch
+
+
+@torch.no_grad()
+def stream_risk_scores(lineage_embs, airport_embs, k=20, lineage_chunk_size=4096, airport_chunk_size=65536,
+                       temperature=1.0):
+    """
+    Score every lineage against every airport without materializing the full matrix
+
+    Scores are sigmoid(temperature * lineage_emb · airport_emb), as in the hotspot cells.
+
+    Parameters:
+    -----------
+    lineage_embs : Tensor [num_lineages, dim]
+    airport_embs : Tensor [num_airports, dim]
+    k : int
+        Number of airports kept per lineage (clipped to num_airports)
+    lineage_chunk_size, airport_chunk_size : int
+        Tile shape; peak extra memory is about lineage_chunk_size × (airport_chunk_size + k) floats
+
+    Returns:
+    --------
+    (airport_risk, top_scores, top_indices)
+        airport_risk : Tensor [num_airports], scores summed over all lineages ("total infection pressure")
+        top_scores, top_indices : Tensor [num_lineages, k], each lineage's k highest-scoring airports, descending
+    """
+    num_lineages, num_airports = lineage_embs.size(0), airport_embs.size(0)
+    k = min(k, num_airports)
+
+    airport_risk = torch.zeros(num_airports, dtype=airport_embs.dtype, device=airport_embs.device)
+    top_scores = torch.empty(num_lineages, k, dtype=airport_embs.dtype, device=airport_embs.device)
+    top_indices = torch.empty(num_lineages, k, dtype=torch.long, device=airport_embs.device)
+
+    for l_start in range(0, num_lineages, lineage_chunk_size):
+        lineage_chunk = lineage_embs[l_start:l_start + lineage_chunk_size]
+        best_scores = lineage_chunk.new_empty(lineage_chunk.size(0), 0)
+        best_indices = torch.empty(lineage_chunk.size(0), 0, dtype=torch.long, device=airport_embs.device)
+
+        for a_start in range(0, num_airports, airport_chunk_size):
+            tile = (lineage_chunk @ airport_embs[a_start:a_start + airport_chunk_size].t() * temperature).sigmoid_()
+            airport_risk[a_start:a_start + tile.size(1)] += tile.sum(dim=0)
+
+            # Merge this tile into the running top-k of each lineage
+            tile_k = min(k, tile.size(1))
+            tile_scores, tile_indices = tile.topk(tile_k, dim=1)
+            best_scores, order = torch.cat([best_scores, tile_scores], dim=1).topk(
+                min(k, best_scores.size(1) + tile_k), dim=1)
+            best_indices = torch.cat([best_indices, tile_indices + a_start], dim=1).gather(1, order)
+
+        top_scores[l_start:l_start + lineage_chunk.size(0)] = best_scores
+        top_indices[l_start:l_start + lineage_chunk.size(0)] = best_indices
+
+    return airport_risk, top_scores, top_indices
+
+
+@torch.no_grad()
+def total_airport_risk(lineage_embs, airport_embs, **kwargs):
+    """Per-airport risk summed over all lineages (the first output of stream_risk_scores)."""
+    return stream_risk_scores(lineage_embs, airport_embs, k=1, **kwargs)[0]
+
+
+@torch.no_grad()
+def lineage_hotspots(lineage_emb, airport_embs, k=20, **kwargs):
+    """
+    Top-k airports for a single lineage embedding [dim]
+
+    Returns:
+    --------
+    (top_scores, top_indices), each of shape [k]
+    """
+    _, top_scores, top_indices = stream_risk_scores(lineage_emb.unsqueeze(0), airport_embs, k=k, **kwargs)
+    return top_scores[0], top_indices[0]
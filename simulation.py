@@ -0,0 +1,276 @@
+"""
+Time-Machine simulation
+For every week, train on the graph as of that week, predict the top-k airports most at risk
+the following week, and compare them with the airports where lineages were actually sampled.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import torch
+
+from evaluation import aggregate_ranking_metrics
+from hgt_model import TARGET_EDGE, HGTDetector, train_epoch
+from scoring import total_airport_risk
+
+DEFAULT_MODEL_KWARGS = {'hidden_channels': 32, 'out_channels': 32, 'num_heads': 2, 'num_layers': 2}
+
+
+@torch.no_grad()
+def score_airport_risk(model, data):
+    """
+    Total infection pressure per airport: sigmoid scores summed over all lineages active in `data`
+
+    Returns:
+    --------
+    Tensor [num_airports]
+    """
+    model.eval()
+    out = model(data.x_dict, data.edge_index_dict)
+    airport_embs = out['airport']
+
+    recent_lineages = data[TARGET_EDGE].edge_index[0].unique()
+    lineage_embs = out['lineage'][recent_lineages]
+
+    # Summed tile by tile, without the dense [num_lineages, num_airports] risk matrix
+    return total_airport_risk(lineage_embs, airport_embs)
+
+
+def airport_points(hg, indices, idx_to_airport):
+    """Airport code and coordinates (un-normalized from the [lat / 90, lon / 180] node features)."""
+    coords = hg['airport'].x[:, :2]
+    return [
+        {'code': idx_to_airport[idx], 'lat': float(coords[idx, 0] * 90.0), 'lon': float(coords[idx, 1] * 180.0)}
+        for idx in indices
+    ]
+
+
+def train_cold(data, epochs, model_kwargs=None, lr=0.01, device=None):
+    """Train a freshly initialized HGTDetector on all supervision edges of `data`; returns (model, optimizer)."""
+    model_kwargs = {**DEFAULT_MODEL_KWARGS, **(model_kwargs or {})}
+    model = HGTDetector.from_graph(data, **model_kwargs).to(device or torch.device('cpu'))
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    for _ in range(epochs):
+        train_epoch(model, optimizer, data)
+    return model, optimizer
+
+
+def simulation_frame(temporal_graph, model, data, split_t, idx_to_airport, idx_to_week, top_k):
+    """
+    Predict the top-k airports at risk in week `split_t` and compare them with the ground truth
+
+    Returns:
+    --------
+    dict : frame {'week', 'predicted', 'actual', 'stats'} (stats without training info)
+    """
+    hg = temporal_graph.hg
+
+    # PREDICT FUTURE (Risk Scoring)
+    airport_risk = score_airport_risk(model, data)
+    _, top_risk_indices = torch.topk(airport_risk, min(top_k, airport_risk.numel()))
+
+    # GET ACTUAL GROUND TRUTH: airports with samples in split_t
+    actual_edges, _ = temporal_graph.edges_between(TARGET_EDGE, split_t, split_t + 1)
+    actual_airport_indices = actual_edges[1].unique()
+
+    # Rank all airports by risk against the ground truth
+    ranking = aggregate_ranking_metrics(airport_risk, actual_airport_indices, ks=(top_k,))
+    hits = ranking[f'num_hits@{top_k}']
+
+    return {
+        'week': idx_to_week[split_t],
+        'predicted': airport_points(hg, top_risk_indices.cpu().tolist(), idx_to_airport),
+        'actual': airport_points(hg, actual_airport_indices.tolist(), idx_to_airport),
+        'stats': {
+            'hits': hits,
+            'missed': len(actual_airport_indices) - hits,
+            'false_alarms': len(top_risk_indices) - hits,
+            'precision': ranking[f'precision@{top_k}'],
+            'recall': ranking[f'recall@{top_k}'],
+            'mrr': ranking['mrr'],
+        },
+    }
+
+
+def _print_frame(frame):
+    stats = frame['stats']
+    print(f"   -> Predicted {len(frame['predicted'])} hotspots. Found {len(frame['actual'])} actual outbreaks.")
+    print(f"   -> Matches (Hits): {stats['hits']}")
+    print(f"   -> Missed (False Negatives): {stats['missed']}")
+    print(f"   -> False Alarms (False Positives): {stats['false_alarms']}")
+    print(f"   -> Recall: {stats['recall']:.2%}, MRR: {stats['mrr']:.3f}")
+    print(f"   -> Training: {stats['train_seconds']:.1f}s ({'cold' if stats['cold_start'] else 'warm'})")
+
+
+def run_simulation(temporal_graph, idx_to_airport, idx_to_week, start_week, end_week, top_k=50,
+                   mode='cold', epochs=30, finetune_epochs=5, cold_restart_every=None,
+                   model_kwargs=None, lr=0.01, device=None, verbose=True):
+    """
+    Run the Time-Machine simulation over [start_week, end_week)
+
+    Parameters:
+    -----------
+    temporal_graph : TemporalGraph
+        Week-indexed full graph
+    idx_to_airport : dict
+        Mapping from airport index to code
+    idx_to_week : dict
+        Mapping from week index to label
+    start_week, end_week : int
+        For each current_week in the range, train on weeks < current_week + 1 and predict current_week + 1
+    top_k : int
+        Number of "Red Zone" airports predicted per week
+    mode : str
+        'cold'    -- train a freshly initialized model for `epochs` every week
+        'rolling' -- carry the previous week's weights and optimizer state forward and
+                     fine-tune for `finetune_epochs` on the newly revealed week's edges
+    cold_restart_every : int (optional)
+        In rolling mode, retrain from scratch every N weeks
+    model_kwargs : dict (optional)
+        HGTDetector hyperparameters (defaults to DEFAULT_MODEL_KWARGS)
+
+    Returns:
+    --------
+    list of frames {'week', 'predicted', 'actual', 'stats'}, as consumed by simulation.html
+    """
+    if mode not in ('cold', 'rolling'):
+        raise ValueError(f"Unknown simulation mode: {mode}")
+    device = device or torch.device('cpu')
+
+    simulation_history = []
+    model, optimizer = None, None
+
+    for step, current_week in enumerate(range(start_week, end_week)):
+        split_t = current_week + 1  # The future we want to predict
+        if verbose:
+            print(f"\n📅 Simulating: Training up to Week {current_week}, Predicting Week {split_t}...")
+
+        # 1. TIME TRAVEL: the graph as of split_t (views, no copy)
+        train_data_sim = temporal_graph.snapshot(split_t).to(device)
+
+        # 2. TRAIN MODEL
+        cold = mode == 'cold' or model is None or bool(cold_restart_every and step % cold_restart_every == 0)
+        started = time.perf_counter()
+        if cold:
+            # Re-initialize model to forget the "future"
+            model, optimizer = train_cold(train_data_sim, epochs, model_kwargs, lr, device)
+        else:
+            new_edges, _ = temporal_graph.edges_between(TARGET_EDGE, current_week, split_t)
+            if new_edges.size(1) > 0:
+                for _ in range(finetune_epochs):
+                    train_epoch(model, optimizer, train_data_sim, new_edges.to(device))
+        train_seconds = time.perf_counter() - started
+
+        # 3. PREDICT, COMPARE WITH GROUND TRUTH AND SAVE FRAME DATA
+        frame = simulation_frame(temporal_graph, model, train_data_sim, split_t, idx_to_airport, idx_to_week, top_k)
+        frame['stats'].update(cold_start=cold, train_seconds=round(train_seconds, 3))
+        simulation_history.append(frame)
+
+        if verbose:
+            _print_frame(frame)
+
+    return simulation_history
+
+
+# ========== PARALLEL BACKTEST ==========
+
+# Per-process state set up once by _init_backtest_worker
+_WORKER = {}
+
+
+def _init_backtest_worker(temporal_graph, idx_to_airport, idx_to_week, num_threads):
+    # One pool worker = `num_threads` intra-op threads, so workers do not oversubscribe the cores
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    _WORKER.update(temporal_graph=temporal_graph, idx_to_airport=idx_to_airport, idx_to_week=idx_to_week)
+
+
+def _backtest_job(current_week, seed, params, top_k):
+    random.seed(seed)
+    torch.manual_seed(seed)
+
+    temporal_graph = _WORKER['temporal_graph']
+    split_t = current_week + 1
+    train_data_sim = temporal_graph.snapshot(split_t)
+
+    started = time.perf_counter()
+    model, _ = train_cold(train_data_sim, params.get('epochs', 30), params.get('model_kwargs'), params.get('lr', 0.01))
+    train_seconds = time.perf_counter() - started
+
+    frame = simulation_frame(temporal_graph, model, train_data_sim, split_t,
+                             _WORKER['idx_to_airport'], _WORKER['idx_to_week'], top_k)
+    frame['stats'].update(cold_start=True, train_seconds=round(train_seconds, 3))
+    return frame
+
+
+def run_backtest(temporal_graph, idx_to_airport, idx_to_week, start_week, end_week, seeds=(0,), param_grid=None,
+                 top_k=50, max_workers=None, threads_per_worker=None):
+    """
+    Cold-start Time-Machine backtest with (week, seed, hyperparameters) jobs fanned out to a process pool
+
+    Every week trains a fresh model, so jobs are independent. The graph tensors are moved to
+    shared memory once and mapped read-only by every worker instead of being copied per job.
+    Jobs run on CPU. Workers are spawned, so call this from a notebook or under
+    `if __name__ == '__main__':` in a script.
+
+    Parameters:
+    -----------
+    start_week, end_week : int
+        Weeks simulated, as in run_simulation
+    seeds : iterable of int
+        Random seeds; each (seed, params) pair is a separate run
+    param_grid : list of dict (optional)
+        Hyperparameter settings with optional keys 'epochs', 'lr' and 'model_kwargs'
+        (defaults to a single run with the run_simulation defaults)
+    max_workers : int (optional)
+        Pool size (default: number of CPUs)
+    threads_per_worker : int (optional)
+        torch.set_num_threads value per worker (default: CPUs // max_workers, at least 1)
+
+    Returns:
+    --------
+    list of {'seed', 'params', 'simulation_history'} runs, in (params, seed) order; each
+    simulation_history holds its frames in week order
+    """
+    param_grid = list(param_grid) if param_grid is not None else [{}]
+    seeds = list(seeds)
+    weeks = list(range(start_week, end_week))
+
+    cpu_count = os.cpu_count() or 1
+    max_workers = max_workers or cpu_count
+    threads_per_worker = threads_per_worker or max(1, cpu_count // max_workers)
+
+    # Share node features, edge stores and week offsets instead of pickling a copy per worker
+    for store in temporal_graph.hg.stores:
+        for value in store.values():
+            if isinstance(value, torch.Tensor):
+                value.share_memory_()
+    for ptr in temporal_graph.week_ptr.values():
+        ptr.share_memory_()
+
+    jobs = [(params, seed, week) for params in param_grid for seed in seeds for week in weeks]
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=torch.multiprocessing.get_context('spawn'),
+        initializer=_init_backtest_worker,
+        initargs=(temporal_graph, idx_to_airport, idx_to_week, threads_per_worker),
+    ) as executor:
+        futures = [executor.submit(_backtest_job, week, seed, params, top_k) for params, seed, week in jobs]
+        frames = [future.result() for future in futures]
+
+    runs = []
+    for i, (params, seed) in enumerate((params, seed) for params in param_grid for seed in seeds):
+        runs.append({
+            'seed': seed,
+            'params': params,
+            'simulation_history': frames[i * len(weeks):(i + 1) * len(weeks)],
+        })
+    return runs
+
+
+def simulation_stats(simulation_history):
+    """Per-week ranking metrics and training time as a DataFrame, e.g. to compare cold vs. rolling runs."""
+    return pd.DataFrame([{'week': frame['week'], **frame['stats']} for frame in simulation_history])
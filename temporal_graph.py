@@ -0,0 +1,85 @@
+"""
+Week-indexed views of the lineage/airport HeteroData graph
+Timestamped edge stores are sorted by week once, with a per-type offset index, so the
+"graph as of week t" is a contiguous slice of every edge store (a view, not a copy).
+"""
+
+import torch
+from torch_geometric.data import HeteroData
+
+from sampling import EDGE_TIME_COLUMNS
+
+
+class TemporalGraph:
+    """
+    Heterogeneous graph with week-sorted edge stores
+
+    Parameters:
+    -----------
+    hg : HeteroData
+        Full graph; timestamped edge stores are reordered by week in place (stable,
+        so edges of the same week keep their relative order)
+    time_columns : dict
+        Column of edge_attr holding the week index for each timestamped edge type.
+        Edge types not listed (evolves_from) are static and appear in every snapshot.
+    """
+
+    def __init__(self, hg, time_columns=EDGE_TIME_COLUMNS):
+        self.hg = hg
+        self.time_columns = {et: col for et, col in time_columns.items() if et in hg.edge_types}
+        self.week_ptr = {}
+        self.reindex()
+
+    def reindex(self):
+        """(Re)sort the timestamped edge stores by week and rebuild the offsets, e.g. after update_graph()."""
+        weeks = {et: self.hg[et].edge_attr[:, col].long() for et, col in self.time_columns.items()}
+        self.num_weeks = max((int(w.max()) + 1 for w in weeks.values() if w.numel()), default=0)
+
+        for edge_type, week in weeks.items():
+            store = self.hg[edge_type]
+            if week.numel() > 1 and bool((week[1:] < week[:-1]).any()):
+                perm = torch.argsort(week, stable=True)
+                store.edge_index = store.edge_index[:, perm]
+                store.edge_attr = store.edge_attr[perm]
+                week = week[perm]
+            # week_ptr[t] = position of the first edge with week >= t
+            self.week_ptr[edge_type] = torch.searchsorted(week, torch.arange(self.num_weeks + 1))
+
+    def _offset(self, edge_type, week):
+        # Weeks past the last one map to the end of the store
+        return int(self.week_ptr[edge_type][min(max(week, 0), self.num_weeks)])
+
+    def edges_between(self, edge_type, start_week, end_week):
+        """
+        Edges of a timestamped type with start_week <= week < end_week, as views
+
+        Returns:
+        --------
+        (edge_index, edge_attr)
+        """
+        store = self.hg[edge_type]
+        start = self._offset(edge_type, start_week)
+        length = max(self._offset(edge_type, end_week) - start, 0)
+        return store.edge_index.narrow(1, start, length), store.edge_attr.narrow(0, start, length)
+
+    def snapshot(self, week):
+        """
+        The graph as of `week`: timestamped edges with week index < `week`, plus all static edges
+
+        Node stores and static edge stores share their tensors with the full graph and
+        timestamped edge stores are narrowed views, so no edge data is copied.
+        """
+        snap = HeteroData()
+        for node_type in self.hg.node_types:
+            for key, value in self.hg[node_type].items():
+                snap[node_type][key] = value
+
+        for edge_type in self.hg.edge_types:
+            if edge_type in self.time_columns:
+                edge_index, edge_attr = self.edges_between(edge_type, 0, week)
+                snap[edge_type].edge_index = edge_index
+                snap[edge_type].edge_attr = edge_attr
+            else:
+                for key, value in self.hg[edge_type].items():
+                    snap[edge_type][key] = value
+        return snap
@@ -0,0 +1,42 @@
+import pytest
+import torch
+from torch_geometric.data import HeteroData
+
+NUM_LINEAGES, NUM_AIRPORTS, NUM_WEEKS = 12, 10, 6
+
+
+def random_graph(seed=0, num_lineages=NUM_LINEAGES, num_airports=NUM_AIRPORTS, num_weeks=NUM_WEEKS):
+    """Small lineage/airport graph with the edge stores and edge_attr layouts of build_graph()."""
+    g = torch.Generator().manual_seed(seed)
+
+    def timestamped(num_src, num_dst, num_edges):
+        edge_index = torch.stack([torch.randint(num_src, (num_edges,), generator=g),
+                                  torch.randint(num_dst, (num_edges,), generator=g)])
+        count = torch.randint(1, 20, (num_edges,), generator=g).float()
+        week = torch.randint(num_weeks, (num_edges,), generator=g).float()
+        return edge_index, torch.stack([count, week], dim=1)
+
+    hg = HeteroData()
+    hg['airport'].x = torch.rand(num_airports, 2, generator=g)
+    hg['lineage'].x = (torch.rand(num_lineages, 16, generator=g) < 0.3).float()
+
+    store = hg['airport', 'flight', 'airport']
+    store.edge_index, store.edge_attr = timestamped(num_airports, num_airports, 120)
+    store = hg['lineage', 'sampled_at', 'airport']
+    store.edge_index, store.edge_attr = timestamped(num_lineages, num_airports, 80)
+
+    lineage = torch.randint(num_lineages, (30,), generator=g)
+    src_week = torch.randint(num_weeks - 1, (30,), generator=g)
+    hg['lineage', 'temporal', 'lineage'].edge_index = torch.stack([lineage, lineage])
+    hg['lineage', 'temporal', 'lineage'].edge_attr = torch.stack(
+        [src_week.float(), (src_week + 1).float(), torch.randn(30, generator=g)], dim=1)
+
+    hg['lineage', 'evolves_from', 'lineage'].edge_index = torch.stack(
+        [torch.arange(1, num_lineages), torch.arange(num_lineages - 1)])
+    hg['lineage', 'evolves_from', 'lineage'].edge_attr = torch.rand(num_lineages - 1, 1, generator=g)
+    return hg
+
+
+@pytest.fixture
+def graph():
+    return random_graph()
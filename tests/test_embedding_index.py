@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import torch
+
+from embedding_index import IVFIndex, spherical_kmeans
+
+
+def _embeddings(num, dim=16, seed=0):
+    return torch.randn(num, dim, generator=torch.Generator().manual_seed(seed))
+
+
+def _exact(queries, items, k):
+    queries, items = torch.nn.functional.normalize(queries, dim=-1), torch.nn.functional.normalize(items, dim=-1)
+    return torch.topk(queries @ items.T, k, dim=-1)
+
+
+def test_full_probe_is_an_exact_search():
+    airports, lineages = _embeddings(200), _embeddings(30, seed=1)
+    index = IVFIndex(airports, n_lists=10)
+    scores, indices = index.search(lineages, k=15, n_probe=10)
+    exact_scores, exact_indices = _exact(lineages, airports, 15)
+
+    assert np.array_equal(indices, exact_indices.numpy())
+    assert np.allclose(scores, exact_scores.numpy(), atol=1e-5)
+    assert index.recall(lineages, k=15, n_probe=10) == 1.0
+
+
+def test_every_item_is_in_exactly_one_list():
+    index = IVFIndex(_embeddings(100), n_lists=7)
+    assert sorted(index.item_ids.tolist()) == list(range(100))
+    assert index.list_ptr[0] == 0 and index.list_ptr[-1] == 100
+    assert np.allclose(index.list_vectors, index.embeddings[index.item_ids])
+
+
+def test_fewer_probes_scan_fewer_items():
+    airports, lineages = _embeddings(400), _embeddings(50, seed=1)
+    index = IVFIndex(airports, n_lists=20)
+    _, indices = index.search(lineages, k=10, n_probe=2)
+    assert indices.shape == (50, 10)
+    # Approximate results are still real, distinct items, and recall grows with n_probe
+    assert all(len(set(row[row >= 0].tolist())) == (row >= 0).sum() for row in indices)
+    assert 0 < index.recall(lineages, k=10, n_probe=2) <= index.recall(lineages, k=10, n_probe=10) <= 1.0
+
+
+def test_single_query_and_scaling():
+    airports = _embeddings(50)
+    index = IVFIndex(airports, n_lists=5, n_probe=5)
+    query = _embeddings(1, seed=2)[0]
+
+    scores, indices = index.search(query, k=4)
+    assert scores.shape == indices.shape == (4,)
+    # Cosine similarity: the query's norm does not matter
+    assert np.array_equal(index.search(query * 10, k=4)[1], indices)
+    assert np.allclose(scores, _exact(query[None], airports, 4).values[0].numpy(), atol=1e-5)
+
+
+def test_short_candidate_lists_are_padded():
+    # Two tight, opposite clusters: one probe only sees the query's own cluster
+    airports = torch.cat([torch.tensor([[1.0, 0.0]]) + 0.01 * _embeddings(3, dim=2),
+                          torch.tensor([[-1.0, 0.0]]) + 0.01 * _embeddings(5, dim=2, seed=1)])
+    index = IVFIndex(airports, n_lists=2)
+    scores, indices = index.search(torch.tensor([1.0, 0.0]), k=6, n_probe=1)
+
+    assert sorted(indices[:3].tolist()) == [0, 1, 2]
+    assert indices[3:].tolist() == [-1, -1, -1]
+    assert np.isneginf(scores[3:]).all()
+    # k is clipped to the number of items
+    assert index.search(torch.tensor([1.0, 0.0]), k=50, n_probe=2)[1].shape == (8,)
+
+
+@pytest.mark.parametrize('n_clusters', [1, 4, 12])
+def test_spherical_kmeans_centroids_are_unit_vectors(n_clusters):
+    x = _embeddings(60).numpy()
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    centroids = spherical_kmeans(x, n_clusters)
+    assert centroids.shape == (n_clusters, 16)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
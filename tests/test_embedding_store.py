@@ -0,0 +1,95 @@
+import pytest
+import torch
+
+from conftest import random_graph
+from embedding_store import EmbeddingStore, graph_hash, model_hash
+from hgt_model import HGTDetector
+
+FLIGHT = ('airport', 'flight', 'airport')
+
+
+@pytest.fixture
+def model(graph):
+    torch.manual_seed(0)
+    return HGTDetector.from_graph(graph, hidden_channels=8, out_channels=8, num_heads=2, num_layers=2)
+
+
+@pytest.fixture
+def forward_calls(model, monkeypatch):
+    calls = []
+    forward = model.forward
+
+    def counting(*args, **kwargs):
+        calls.append(model.training)
+        return forward(*args, **kwargs)
+    monkeypatch.setattr(model, 'forward', counting)
+    return calls
+
+
+def test_second_get_skips_the_forward_pass(model, graph, forward_calls, tmp_path):
+    store = EmbeddingStore(tmp_path)
+    first = store.get(model, graph)
+    assert forward_calls == [False] and model.training
+
+    assert store.get(model, graph) is first
+    # A new store on the same directory reads the file instead of running the model
+    reloaded = EmbeddingStore(tmp_path).get(model, graph)
+    assert len(forward_calls) == 1
+    assert reloaded.key == first.key
+    assert torch.equal(reloaded.lineage, first.lineage) and torch.equal(reloaded.airport, first.airport)
+
+    store.get(model, graph, refresh=True)
+    assert len(forward_calls) == 2
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_stored_embeddings_match_a_fresh_forward_pass(model, graph, tmp_path, mmap):
+    embeddings = EmbeddingStore(tmp_path, mmap=mmap).get(model, graph)
+
+    model.eval()
+    with torch.no_grad():
+        out = model(graph.x_dict, graph.edge_index_dict)
+    assert torch.allclose(embeddings.lineage, out['lineage']) and torch.allclose(embeddings.airport, out['airport'])
+    assert embeddings.temperature == pytest.approx(model.temperature.item())
+
+    edge_index = graph['lineage', 'sampled_at', 'airport'].edge_index
+    expected = ((out['lineage'][edge_index[0]] * out['airport'][edge_index[1]]).sum(-1) * model.temperature).sigmoid()
+    assert torch.allclose(embeddings.probability(edge_index), expected, atol=1e-6)
+
+
+def test_parameter_changes_change_the_key(model, graph, forward_calls, tmp_path):
+    store = EmbeddingStore(tmp_path)
+    key = model_hash(model)
+    assert model_hash(model) == key
+
+    with torch.no_grad():
+        model.lin_dict['lineage'].weight[0].add_(1e-3)
+    assert model_hash(model) != key
+    with torch.no_grad():
+        model.lin_dict['lineage'].weight[0].sub_(1e-3)
+        model.temperature.fill_(5.0)
+    assert model_hash(model) != key
+
+    store.get(model, graph)
+    with torch.no_grad():
+        model.temperature.fill_(6.0)
+    assert store.get(model, graph).temperature == 6.0
+    assert len(forward_calls) == 2 and len(list(tmp_path.glob('*.pt'))) == 2
+
+
+def test_edge_and_feature_changes_change_the_key():
+    graph, same = random_graph(), random_graph()
+    key = graph_hash(graph)
+    assert graph_hash(same) == key
+
+    same[FLIGHT].edge_index[1, 0] = (same[FLIGHT].edge_index[1, 0] + 1) % same['airport'].num_nodes
+    assert graph_hash(same) != key
+
+    other = random_graph()
+    other['lineage'].x[0, 0] += 1
+    assert graph_hash(other) != key
+
+    # Dropping an edge changes the shape, and with it the key
+    other = random_graph()
+    other[FLIGHT].edge_index = other[FLIGHT].edge_index[:, 1:]
+    assert graph_hash(other) != key
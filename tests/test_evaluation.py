@@ -0,0 +1,124 @@
+import pytest
+import torch
+
+from conftest import random_graph
+from evaluation import (aggregate_ranking_metrics, edge_keys, negative_pool, partition_test_edges, ranking_metrics,
+                        reachable_airports)
+
+NUM_LINEAGES, NUM_AIRPORTS = 30, 20
+
+
+def _edges(num_edges, seed):
+    g = torch.Generator().manual_seed(seed)
+    return torch.stack([torch.randint(NUM_LINEAGES, (num_edges,), generator=g),
+                        torch.randint(NUM_AIRPORTS, (num_edges,), generator=g)])
+
+
+@pytest.fixture
+def splits():
+    return _edges(150, seed=1), _edges(200, seed=2)
+
+
+def test_partition_matches_a_set_reference(splits):
+    train, test = splits
+    reachable = torch.zeros(NUM_AIRPORTS, dtype=torch.bool)
+    reachable[::3] = True
+    masks = partition_test_edges(train, test, NUM_AIRPORTS, reachable=reachable)
+
+    known = set(zip(*train.tolist()))
+    pairs = list(zip(*test.tolist()))
+    assert masks['recurring'].tolist() == [pair in known for pair in pairs]
+    assert masks['novel'].tolist() == [pair not in known for pair in pairs]
+    assert masks['reachable'].tolist() == [airport % 3 == 0 for _, airport in pairs]
+    assert 0 < int(masks['recurring'].sum()) < len(pairs)
+
+    # Without a mask every airport counts as reachable
+    assert partition_test_edges(train, test, NUM_AIRPORTS)['reachable'].all()
+    # Duplicate test pairs get the same label
+    doubled = partition_test_edges(train, torch.cat([test, test], dim=1), NUM_AIRPORTS)
+    assert torch.equal(doubled['novel'], masks['novel'].repeat(2))
+
+
+def test_reachable_airports_have_a_flight():
+    graph = random_graph()
+    flights = graph['airport', 'flight', 'airport'].edge_index
+    graph['airport', 'flight', 'airport'].edge_index = flights[:, (flights != 0).all(dim=0)]
+    connected = set(graph['airport', 'flight', 'airport'].edge_index.flatten().tolist())
+
+    mask = reachable_airports(graph)
+    assert mask.tolist() == [airport in connected for airport in range(graph['airport'].num_nodes)]
+    assert not mask[0]
+    assert not reachable_airports(graph, edge_types=()).any()
+
+
+def test_negative_pool_is_deterministic(splits):
+    test, train = splits
+    pool = negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, exclude_edge_index=train, seed=3)
+    assert torch.equal(pool, negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, exclude_edge_index=train, seed=3))
+    assert not torch.equal(pool, negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, exclude_edge_index=train, seed=4))
+
+
+def test_negative_pool_excludes_positives_and_is_distinct(splits):
+    test, train = splits
+    pool = negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, num_negatives=300, exclude_edge_index=train)
+    keys = edge_keys(pool, NUM_AIRPORTS)
+
+    assert pool.shape == (2, 300)
+    assert keys.unique().numel() == 300
+    assert not torch.isin(keys, edge_keys(test, NUM_AIRPORTS)).any()
+    assert not torch.isin(keys, edge_keys(train, NUM_AIRPORTS)).any()
+    assert int(pool[0].max()) < NUM_LINEAGES and int(pool[1].max()) < NUM_AIRPORTS
+
+
+def test_negative_pool_is_capped_by_the_free_pairs():
+    test = torch.tensor([[0, 1], [0, 1]])
+    pool = negative_pool(test, 2, 2, num_negatives=10)
+    assert sorted(map(tuple, pool.t().tolist())) == [(0, 1), (1, 0)]
+
+
+def test_negative_pool_hard_airports(splits):
+    test, _ = splits
+    hard = torch.zeros(NUM_AIRPORTS, dtype=torch.bool)
+    hard[:4] = True
+    pool = negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, num_negatives=100, hard_airports=hard, hard_ratio=0.5)
+    assert int(hard[pool[1]].sum()) >= 50
+
+
+def test_negative_pool_cache_is_keyed_on_all_inputs(splits, tmp_path):
+    test, train = splits
+    path = tmp_path / 'pool.pt'
+    cached = negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, exclude_edge_index=train, path=path)
+    assert path.exists()
+    assert torch.equal(cached, negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, exclude_edge_index=train, path=path))
+
+    # Different exclusions or sizes must not reuse the cached file
+    unexcluded = negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, path=path)
+    assert torch.equal(unexcluded, negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS))
+    larger = negative_pool(test, NUM_LINEAGES, NUM_AIRPORTS, num_negatives=250, path=path)
+    assert larger.size(1) == 250
+
+
+def test_ranking_metrics_on_a_known_ranking():
+    # Lineage 0 ranks airports 2, 0, 1; lineage 1 ranks 1, 2, 0
+    lineage_embs = torch.tensor([[1.0, 0.0], [0.0, 1.0]])
+    airport_embs = torch.tensor([[0.5, 0.0], [0.0, 0.9], [0.9, 0.5]])
+    edge_index = torch.tensor([[0, 0, 1], [0, 1, 0]])
+    metrics = ranking_metrics(lineage_embs, airport_embs, edge_index, torch.zeros(3), ks=(1, 2))
+
+    row = metrics.iloc[0]
+    assert row['num_queries'] == 2
+    assert row['mrr'] == pytest.approx((1 / 2 + 1 / 3) / 2)
+    assert row['hits@1'] == 0.0
+    assert row['hits@2'] == pytest.approx(0.5)
+    assert row['recall@2'] == pytest.approx(0.25)
+
+
+def test_aggregate_ranking_metrics_counts_hits():
+    risk = torch.tensor([0.9, 0.1, 0.8, 0.7, 0.2, 0.3, 0.6])
+    metrics = aggregate_ranking_metrics(risk, torch.tensor([0, 3, 4]), ks=(1, 3, 5, 10))
+
+    assert metrics['mrr'] == 1.0
+    assert [metrics[f'num_hits@{k}'] for k in (1, 3, 5, 10)] == [1, 2, 2, 3]
+    assert metrics['precision@3'] == pytest.approx(2 / 3)
+    assert metrics['precision@10'] == pytest.approx(3 / 7)
+    assert metrics['recall@5'] == pytest.approx(2 / 3)
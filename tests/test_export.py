@@ -0,0 +1,293 @@
+import json
+import struct
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import NUM_AIRPORTS, NUM_LINEAGES, random_graph
+from export_graph_to_json import (EXPORT_FORMATS, export_format, export_hetero_graph_to_json, filter_viz_graph,
+                                  graph_columns, hop_distance, load_binary_graph, main, node_importance)
+from graph_construction import GRAPH_ARTIFACT_VERSION, save_graph_artifact
+
+
+def _canonical(value):
+    # Binary exports store floats as float32; compare every format at that precision
+    return float(np.float32(value)) if isinstance(value, float) else value
+
+
+def _bag(records):
+    return Counter(tuple(sorted((k, _canonical(v)) for k, v in record.items())) for record in records)
+
+
+def _columnar_records(nodes, links):
+    """nodes / links records, in the layout of the json export, from columnar columns."""
+    node_records = []
+    for node_type, columns in nodes.items():
+        fields = [f for f in columns if f != 'index']
+        for i, index in enumerate(np.asarray(columns['index']).tolist()):
+            record = {'id': f'{node_type}_{index}', 'index': index, 'type': node_type}
+            record.update({f: np.asarray(columns[f])[i].item() if isinstance(columns[f], np.ndarray)
+                           else columns[f][i] for f in fields})
+            node_records.append(record)
+
+    link_records = []
+    for name, columns in links.items():
+        fields = [f for f in columns if f not in ('source', 'target', 'source_type', 'target_type')]
+        for i in range(len(columns['source'])):
+            record = {'source': f"{columns['source_type']}_{int(columns['source'][i])}",
+                      'target': f"{columns['target_type']}_{int(columns['target'][i])}", 'type': name}
+            record.update({f: np.asarray(columns[f])[i].item() for f in fields})
+            link_records.append(record)
+    return node_records, link_records
+
+
+def read_export(path, format):
+    """(metadata, node records, link records) of an export in any format."""
+    if format == 'json':
+        data = json.loads(path.read_text())
+        return data['metadata'], data['nodes'], data['links']
+    if format == 'ndjson':
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        records = lines[1:]
+        return (lines[0]['metadata'], [r for r in records if 'source' not in r],
+                [r for r in records if 'source' in r])
+    data = load_binary_graph(path) if format == 'binary' else json.loads(path.read_text())
+    return (data['metadata'], *_columnar_records(data['nodes'], data['links']))
+
+
+@pytest.fixture
+def airport_table():
+    codes = [f'AP{i}' for i in range(NUM_AIRPORTS)]
+    table = pd.DataFrame({
+        'lat': np.linspace(-40.0, 60.0, NUM_AIRPORTS),
+        'lon': np.linspace(-120.0, 150.0, NUM_AIRPORTS),
+        'city': [f'City {i}' for i in range(NUM_AIRPORTS)],
+        'country': ['X'] * NUM_AIRPORTS,
+        'region': ['R'] * NUM_AIRPORTS,
+    }, index=pd.Index(codes, name='code'))
+    # One airport without coordinates or place names
+    table.loc['AP3', ['lat', 'lon']] = np.nan
+    table.loc['AP3', ['city', 'country', 'region']] = None
+    return table
+
+
+def _export(tmp_path, airport_table, format, **kwargs):
+    hg = random_graph()
+    airport_to_idx = {f'AP{i}': i for i in range(NUM_AIRPORTS)}
+    lineage_to_idx = {f'L.{i}': i for i in range(NUM_LINEAGES)}
+    path = tmp_path / f'graph.{format}'
+    metadata = export_hetero_graph_to_json(hg, airport_to_idx, lineage_to_idx, airport_table=airport_table,
+                                           output_file=path, format=format, **kwargs)
+    return hg, path, metadata
+
+
+@pytest.mark.parametrize('format', EXPORT_FORMATS)
+def test_export_round_trip(tmp_path, airport_table, format):
+    hg, path, metadata = _export(tmp_path, airport_table, format)
+    read_metadata, nodes, links = read_export(path, format)
+
+    assert read_metadata == metadata
+    assert metadata['num_edges'] == sum(hg[et].edge_index.size(1) for et in hg.edge_types)
+    assert len(nodes) == NUM_AIRPORTS + NUM_LINEAGES
+    airports = {node['code']: node for node in nodes if node['type'] == 'airport'}
+    assert airports['AP3']['lat'] == 0.0 and airports['AP3']['city'] == ''
+    assert airports['AP9']['lat'] == 60.0 and airports['AP9']['city'] == 'City 9'
+
+    src, dst = hg['lineage', 'temporal', 'lineage'].edge_index.tolist()
+    attr = hg['lineage', 'temporal', 'lineage'].edge_attr.tolist()
+    expected = [{'source': f'lineage_{s}', 'target': f'lineage_{d}', 'type': 'temporal',
+                 'weight': a[2], 'time_start': int(a[0]), 'time_end': int(a[1])} for s, d, a in zip(src, dst, attr)]
+    assert _bag(r for r in links if r['type'] == 'temporal') == _bag(expected)
+
+
+@pytest.mark.parametrize('format', EXPORT_FORMATS[1:])
+def test_formats_hold_the_same_graph(tmp_path, airport_table, format):
+    _, json_path, _ = _export(tmp_path, airport_table, 'json')
+    _, path, _ = _export(tmp_path, airport_table, format)
+    _, json_nodes, json_links = read_export(json_path, 'json')
+    _, nodes, links = read_export(path, format)
+
+    assert _bag(nodes) == _bag(json_nodes)
+    assert _bag(links) == _bag(json_links)
+
+
+def test_binary_columns_are_aligned_typed_arrays(tmp_path, airport_table):
+    hg, path, _ = _export(tmp_path, airport_table, 'binary')
+    data = load_binary_graph(path)
+
+    flights = data['links']['flight']
+    assert flights['source'].dtype == np.dtype('<i4') and flights['weight'].dtype == np.dtype('<f4')
+    assert np.array_equal(flights['source'], hg['airport', 'flight', 'airport'].edge_index[0].numpy())
+
+    # Float32Array / Int32Array views need 4-byte aligned offsets from the start of the file
+    raw = path.read_bytes()
+    header_length = struct.unpack('<I', raw[4:8])[0]
+    header = json.loads(raw[8:8 + header_length])
+    offsets = [spec['offset'] for entry in (*header['nodes'].values(), *header['links'].values())
+               for spec in entry['columns'].values()]
+    assert (8 + header_length) % 4 == 0
+    assert all(offset % 4 == 0 for offset in offsets)
+
+
+def test_load_binary_graph_rejects_other_files(tmp_path, airport_table):
+    _, path, _ = _export(tmp_path, airport_table, 'json')
+    with pytest.raises(ValueError, match='not a binary'):
+        load_binary_graph(path)
+
+
+def _columns(sampling, sample_size, **kwargs):
+    hg = random_graph()
+    airport_to_idx = {f'AP{i}': i for i in range(NUM_AIRPORTS)}
+    lineage_to_idx = {f'L.{i}': i for i in range(NUM_LINEAGES)}
+    return hg, graph_columns(hg, airport_to_idx, lineage_to_idx, sample_size=sample_size, sampling=sampling, **kwargs)
+
+
+def _links_stay_inside(graph):
+    for name, columns in graph['links'].items():
+        source_type, target_type = graph['node_types'][name]
+        assert np.isin(columns['source'], graph['nodes'][source_type]['index']).all(), name
+        assert np.isin(columns['target'], graph['nodes'][target_type]['index']).all(), name
+
+
+def test_uniform_sampling_sizes():
+    np.random.seed(0)
+    _, graph = _columns('uniform', {'airports': 4, 'lineages': 5, 'edges': 30})
+    assert len(graph['nodes']['airport']['index']) == 4
+    assert len(graph['nodes']['lineage']['index']) == 5
+    assert all(len(columns['source']) <= 30 for columns in graph['links'].values())
+    _links_stay_inside(graph)
+
+
+def test_degree_sampling_keeps_the_busiest_nodes_and_edges():
+    hg, graph = _columns('degree', {'airports': 4, 'lineages': 5, 'edges': 6})
+    importance = node_importance(hg, {'airport': NUM_AIRPORTS, 'lineage': NUM_LINEAGES})
+
+    airports = graph['nodes']['airport']['index']
+    assert sorted(airports) == sorted(np.argsort(-importance['airport'], kind='stable')[:4])
+    assert len(graph['nodes']['lineage']['index']) == 5
+    _links_stay_inside(graph)
+
+    # Over the edge limit, the kept flights are the ones between the busiest airports
+    flights = graph['links']['flight']
+    assert len(flights['source']) == 6
+    edge_index = hg['airport', 'flight', 'airport'].edge_index.numpy()
+    induced = np.isin(edge_index[0], airports) & np.isin(edge_index[1], airports)
+    score = importance['airport'][edge_index[0, induced]] + importance['airport'][edge_index[1, induced]]
+    kept = importance['airport'][flights['source']] + importance['airport'][flights['target']]
+    assert kept.min() >= np.sort(score)[-6]
+
+
+def test_khop_sampling_stays_around_the_seed_lineages():
+    hg, graph = _columns('khop', {'airports': 6, 'lineages': 6}, seed_lineages=['L.2', 5], num_hops=2)
+    distance = hop_distance(hg, {'lineage': np.array([2, 5])}, {'airport': NUM_AIRPORTS, 'lineage': NUM_LINEAGES}, 2)
+
+    lineages = graph['nodes']['lineage']['index']
+    assert {2, 5} <= set(lineages.tolist())
+    for node_type, index in (('lineage', lineages), ('airport', graph['nodes']['airport']['index'])):
+        assert np.isfinite(distance[node_type][index]).all()
+        # Closest nodes first: nothing left out is closer than a node that was kept
+        left_out = np.setdiff1d(np.flatnonzero(np.isfinite(distance[node_type])), index)
+        assert distance[node_type][left_out].min(initial=np.inf) >= distance[node_type][index].max()
+    _links_stay_inside(graph)
+
+
+def test_unknown_sampling_mode(tmp_path, airport_table):
+    with pytest.raises(ValueError, match='sampling mode'):
+        _export(tmp_path, airport_table, 'json', sampling='random')
+
+
+def _expected_viz(nodes, links, lineages=None):
+    """Lineage-first subgraph computed in memory, as clean.ipynb did."""
+    def touches(link):
+        ends = [e for e in (link['source'], link['target']) if e.startswith('lineage_')]
+        return bool(ends) and (lineages is None or any(e in lineages for e in ends))
+
+    kept = [link for link in links if link['type'] != 'flight' and touches(link)]
+    active = {e for link in kept for e in (link['source'], link['target'])}
+    flights = Counter()
+    for link in links:
+        if link['type'] == 'flight' and link['source'] in active and link['target'] in active:
+            flights[link['source'], link['target']] += link['weight']
+    return [n for n in nodes if n['id'] in active], kept, flights
+
+
+@pytest.mark.parametrize('format', ['json', 'ndjson'])
+def test_filter_viz_graph(tmp_path, airport_table, format):
+    _, path, _ = _export(tmp_path, airport_table, format)
+    _, nodes, links = read_export(path, format)
+    metadata = filter_viz_graph(path, tmp_path / 'viz.json')
+    viz = json.loads((tmp_path / 'viz.json').read_text())
+
+    expected_nodes, expected_links, expected_flights = _expected_viz(nodes, links)
+    assert viz['metadata'] == metadata
+    assert _bag(viz['nodes']) == _bag(expected_nodes)
+    assert _bag(link for link in viz['links'] if link['type'] != 'flight') == _bag(expected_links)
+    flights = {(link['source'], link['target']): link['weight'] for link in viz['links'] if link['type'] == 'flight'}
+    assert flights == pytest.approx(dict(expected_flights))
+
+
+def test_filter_viz_graph_lineages_and_max_flights(tmp_path, airport_table):
+    _, path, _ = _export(tmp_path, airport_table, 'json')
+    _, nodes, links = read_export(path, 'json')
+    filter_viz_graph(path, tmp_path / 'viz.json', lineages=['L.1', 'lineage_4'], max_flights=3)
+    viz = json.loads((tmp_path / 'viz.json').read_text())
+
+    expected_nodes, expected_links, expected_flights = _expected_viz(nodes, links, {'lineage_1', 'lineage_4'})
+    assert _bag(link for link in viz['links'] if link['type'] != 'flight') == _bag(expected_links)
+    flights = [link['weight'] for link in viz['links'] if link['type'] == 'flight']
+    assert sorted(flights, reverse=True) == pytest.approx(sorted(expected_flights.values(), reverse=True)[:3])
+
+
+def test_filter_viz_graph_reads_nan_exports(tmp_path):
+    path = tmp_path / 'old.json'
+    path.write_text('{"nodes": [{"id": "airport_0", "type": "airport", "lat": NaN, "lon": 2.0}, '
+                    '{"id": "lineage_0", "type": "lineage", "name": "B.1"}], '
+                    '"links": [{"source": "lineage_0", "target": "airport_0", "type": "sampled_at", "weight": NaN}]}')
+    filter_viz_graph(path, tmp_path / 'viz.json')
+    viz = json.loads((tmp_path / 'viz.json').read_text())
+
+    assert {node['id']: node.get('lat') for node in viz['nodes']} == {'airport_0': 0.0, 'lineage_0': None}
+    assert viz['links'] == [{'source': 'lineage_0', 'target': 'airport_0', 'type': 'sampled_at', 'weight': None}]
+
+
+@pytest.mark.parametrize('format', EXPORT_FORMATS)
+def test_export_format_detection(tmp_path, airport_table, format):
+    _, path, _ = _export(tmp_path, airport_table, format)
+    assert export_format(path) == format
+
+
+@pytest.mark.parametrize('format', ['columnar', 'binary'])
+def test_filter_viz_graph_rejects_columnar_and_binary(tmp_path, airport_table, monkeypatch, format):
+    _, path, _ = _export(tmp_path, airport_table, format)
+    output = tmp_path / 'viz.json'
+    with pytest.raises(ValueError, match=format):
+        filter_viz_graph(path, output)
+    assert not output.exists()
+
+    monkeypatch.setattr('sys.argv', ['export_graph_to_json.py', '--input', str(path), '--output', str(output)])
+    with pytest.raises(ValueError, match=format):
+        main()
+    assert not output.exists()
+
+
+def test_cli_exports_an_artifact_around_named_lineages(tmp_path, monkeypatch, capsys):
+    path, output = tmp_path / 'graph.pt', tmp_path / 'viz.json'
+    save_graph_artifact({'version': GRAPH_ARTIFACT_VERSION, 'hg': random_graph(),
+                         'airport_to_idx': {f'AP{i}': i for i in range(NUM_AIRPORTS)},
+                         'lineage_to_idx': {f'L.{i}': i for i in range(NUM_LINEAGES)}}, path)
+
+    monkeypatch.setattr('sys.argv', ['export_graph_to_json.py', '--artifact', str(path), '--output', str(output),
+                                     '--lineages', 'L.3', 'B.1.1.7', 'XBB'])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 2
+    assert 'unknown lineages: B.1.1.7, XBB' in capsys.readouterr().err
+    assert not output.exists()
+
+    monkeypatch.setattr('sys.argv', ['export_graph_to_json.py', '--artifact', str(path), '--output', str(output),
+                                     '--lineages', 'L.3'])
+    main()
+    names = {node['name'] for node in json.loads(output.read_text())['nodes'] if node['type'] == 'lineage'}
+    assert 'L.3' in names
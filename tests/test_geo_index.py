@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from geo_index import EARTH_RADIUS_KM, AirportIndex, chord_to_km, km_to_chord, map_locations_to_airports
+
+AIRPORTS = {
+    'JFK': (40.6413, -73.7781),
+    'LHR': (51.4700, -0.4543),
+    'CDG': (49.0097, 2.5479),
+    'SUV': (-18.0433, 178.5592),   # Fiji, west of the antimeridian
+    'FUN': (-8.5250, 179.1964),    # Tuvalu
+    'APW': (-13.8300, -172.0083),  # Samoa, east of the antimeridian
+}
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@pytest.fixture
+def index():
+    codes = list(AIRPORTS)
+    lat, lon = zip(*AIRPORTS.values())
+    return AirportIndex(codes, lat, lon)
+
+
+def test_distance_is_great_circle_km(index):
+    codes, distance_km = index.query([40.7128], [-74.0060])  # Manhattan
+    assert codes.tolist() == ['JFK']
+    assert distance_km[0] == pytest.approx(_haversine_km(40.7128, -74.0060, *AIRPORTS['JFK']), rel=1e-9)
+
+    # JFK -> LHR is about 5,540 km on a spherical Earth
+    lhr = AirportIndex(['LHR'], [AIRPORTS['LHR'][0]], [AIRPORTS['LHR'][1]])
+    assert lhr.query([AIRPORTS['JFK'][0]], [AIRPORTS['JFK'][1]])[1][0] == pytest.approx(5540, abs=5)
+
+
+def test_neighbours_across_the_antimeridian(index):
+    # Just east of 180: Fiji, on the other side of the line, is nearest (about 500 km), then Samoa
+    lat, lon = -15.0, -178.0
+    codes, distance_km = index.query([lat], [lon], k=3)
+    assert codes[0].tolist() == ['SUV', 'APW', 'FUN']
+    assert np.allclose(distance_km[0], [_haversine_km(lat, lon, *AIRPORTS[c]) for c in codes[0]], rtol=1e-9)
+    # A naive |lon difference| would put Fiji ~357 degrees away
+    assert distance_km[0, 0] < 550
+
+
+def test_k_neighbours_are_sorted(index):
+    codes, distance_km = index.query([48.0, -10.0], [0.0, -170.0], k=4)
+    assert codes.shape == distance_km.shape == (2, 4)
+    assert codes[0].tolist() == ['CDG', 'LHR', 'JFK', 'FUN']
+    assert codes[1, :3].tolist() == ['APW', 'FUN', 'SUV']
+    assert bool((np.diff(distance_km, axis=1) >= 0).all())
+
+
+def test_max_distance_marks_missing_neighbours(index):
+    # Paris: CDG is ~25 km away, LHR ~350 km, everything else much further
+    codes, distance_km = index.query([48.8566], [2.3522], k=3, max_distance_km=400)
+    assert codes[0, :2].tolist() == ['CDG', 'LHR'] and codes[0, 2] is None
+    assert np.isfinite(distance_km[0, :2]).all() and np.isinf(distance_km[0, 2])
+
+    codes, distance_km = index.query([0.0], [-30.0], max_distance_km=100)
+    assert codes.tolist() == [None] and np.isinf(distance_km).all()
+
+
+def test_chord_km_round_trip():
+    distance_km = np.array([0.0, 1.0, 500.0, 10_000.0, np.pi * EARTH_RADIUS_KM])
+    assert np.allclose(chord_to_km(km_to_chord(distance_km)), distance_km)
+    # Beyond half the circumference the chord saturates at the diameter
+    assert km_to_chord(50_000.0) == pytest.approx(2.0)
+
+
+def test_locations_out_of_range_are_dropped(index):
+    locations = pd.DataFrame({'full_loc': ['New York', 'Paris', 'Atlantic', 'Unknown'],
+                              'lat': [40.7128, 48.8566, 30.0, np.nan], 'lon': [-74.0060, 2.3522, -40.0, 0.0]})
+    mapped = map_locations_to_airports(locations, index, max_distance_km=500)
+    assert mapped['full_loc'].tolist() == ['New York', 'Paris']
+    assert mapped['nearest_airport'].tolist() == ['JFK', 'CDG']
@@ -0,0 +1,262 @@
+import random
+import warnings
+from collections import Counter
+from dataclasses import asdict, replace
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+from Bio import Phylo
+from Bio.Phylo.BaseTree import Clade
+
+import graph_construction
+from graph_construction import (GraphConfig, assemble_graph_artifact, build_graph, build_phylo_edges, map_to_index,
+                                update_graph)
+
+COORDS = {'AAA': (10.0, 20.0), 'BBB': (-30.0, 40.0), 'CCC': (50.0, -60.0), 'DDD': (0.0, 100.0)}
+
+
+def _flights(routes):
+    rows = []
+    for origin, destination, week in routes:
+        lat_2, lon_2 = COORDS.get(destination, (np.nan, np.nan))
+        rows.append({'origin': origin, 'destination': destination, 'week': pd.Period(week, 'W'),
+                     'latitude_1': COORDS[origin][0], 'longitude_1': COORDS[origin][1],
+                     'latitude_2': lat_2, 'longitude_2': lon_2})
+    return pd.DataFrame(rows)
+
+
+def _samples(rows):
+    df = pd.DataFrame(rows, columns=['pango_lineage', 'nearest_airport', 'week', 'sample_count'])
+    df['week'] = [pd.Period(w, 'W') for w in df['week']]
+    return df
+
+
+def _metadata(rows):
+    return pd.DataFrame(rows, columns=['strain', 'pango_lineage', 'aaSubstitutions'])
+
+
+def _edge_set(graph, edge_type):
+    """Edges as (source name, target name, *attributes), independent of index order."""
+    names = {
+        'airport': {i: k for k, i in graph['airport_to_idx'].items()},
+        'lineage': {i: k for k, i in graph['lineage_to_idx'].items()},
+    }
+    store = graph['hg'][edge_type]
+    src_names, dst_names = names[edge_type[0]], names[edge_type[2]]
+    return sorted(
+        (src_names[s], dst_names[d], *np.round(attr, 5).tolist())
+        for s, d, attr in zip(store.edge_index[0].tolist(), store.edge_index[1].tolist(), store.edge_attr.numpy())
+    )
+
+
+def test_map_to_index_marks_unknown_keys():
+    weeks = {pd.Period('2020-01-06', 'W'): 0, pd.Period('2020-01-20', 'W'): 1}
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert map_to_index(pd.Series(['BBB', 'ZZZ', 'AAA', None]), {'AAA': 3, 'BBB': 7}).tolist() == [7, -1, 3, -1]
+        assert map_to_index(pd.Series(['BBB', 'AAA'], dtype='category'), {'AAA': 0}).tolist() == [-1, 0]
+        assert map_to_index(pd.Series([pd.Period('2020-01-20', 'W'), pd.Period('2020-01-13', 'W')]),
+                            weeks).tolist() == [1, -1]
+    assert map_to_index(['AAA'], {}).tolist() == [-1]
+
+
+def _phylo_edges_reference(tree, strain_to_lineage, lineage_to_idx, strain_prefix='hCoV-19/'):
+    """The original notebook loop: majority lineage of every clade from its full list of tips."""
+    def majority(clade):
+        names = [tip.name.replace(strain_prefix, '') for tip in clade.get_terminals()]
+        lineages = [strain_to_lineage[name] for name in names if name in strain_to_lineage]
+        # The notebook broke ties in set order, which depends on the hash seed; sorting first
+        # gives the lowest lineage name, as build_phylo_edges documents
+        return max(sorted(set(lineages)), key=lineages.count) if lineages else None
+
+    edges = Counter()
+    for parent in tree.get_nonterminals():
+        parent_lineage = majority(parent)
+        for child in parent.clades:
+            child_lineage = majority(child)
+            if parent_lineage in lineage_to_idx and child_lineage in lineage_to_idx and parent_lineage != child_lineage:
+                distance = np.float32(child.branch_length if child.branch_length is not None else 0.0)
+                edges[(lineage_to_idx[parent_lineage], lineage_to_idx[child_lineage], round(float(distance), 5))] += 1
+    return edges
+
+
+def _phylo_edges(tree, strain_to_lineage, lineage_to_idx):
+    edge_index, edge_attr = build_phylo_edges(tree, strain_to_lineage, lineage_to_idx)
+    assert edge_index.shape == (2, edge_attr.size(0)) and edge_attr.shape[1:] == (1,)
+    return Counter(zip(*edge_index.tolist(), np.round(edge_attr[:, 0].numpy().astype(float), 5).tolist()))
+
+
+def test_phylo_edges_match_the_majority_vote_loop():
+    tree = Phylo.read(StringIO(
+        '((hCoV-19/s1:0.1,hCoV-19/s2:0.2):0.05,'
+        '((hCoV-19/s3:0.1,hCoV-19/s4:0.1):0.3,(hCoV-19/s5:0.1,hCoV-19/x1:0.2):0.1):0.2,'
+        '(hCoV-19/s6:0.1,(hCoV-19/s7,hCoV-19/s8:0.2,hCoV-19/s9:0.3):0.1):0.4);'
+    ), 'newick')
+    # x1 has no lineage and D is not a node. The root (A/B), the (s6, ...) clade (A/B/C/D) and
+    # (s7, s8, s9) (A/C/D) are ties, all won by A
+    strain_to_lineage = {'s1': 'A', 's2': 'A', 's3': 'B', 's4': 'B', 's5': 'C', 's6': 'B', 's7': 'C', 's8': 'A',
+                         's9': 'D'}
+    lineage_to_idx = {'A': 0, 'B': 1, 'C': 2}
+
+    edges = _phylo_edges(tree, strain_to_lineage, lineage_to_idx)
+    assert edges == _phylo_edges_reference(tree, strain_to_lineage, lineage_to_idx)
+    # root -> B clade, B clade -> (s5, x1), (s6, ...) -> s6 and (s7, s8, s9) -> s7 (no branch length)
+    assert edges == Counter({(0, 1, 0.2): 1, (1, 2, 0.1): 1, (0, 1, 0.1): 1, (0, 2, 0.0): 1})
+
+
+def _random_tree(rng, num_tips):
+    clades = [Clade(name=f'hCoV-19/s{i}', branch_length=rng.choice([None, rng.random()])) for i in range(num_tips)]
+    while len(clades) > 1:
+        rng.shuffle(clades)
+        size = min(rng.choice([2, 2, 3]), len(clades))
+        children, clades = clades[:size], clades[size:]
+        clades.append(Clade(clades=children, branch_length=rng.random()))
+    return Phylo.BaseTree.Tree(root=clades[0])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_phylo_edges_match_the_loop_on_random_trees(seed):
+    rng = random.Random(seed)
+    tree = _random_tree(rng, 200)
+    # Few lineages, so ties are common; some tips are unknown and one lineage is not a node
+    strain_to_lineage = {f's{i}': rng.choice('ABCDE') for i in range(200) if rng.random() < 0.8}
+    lineage_to_idx = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
+
+    edges = _phylo_edges(tree, strain_to_lineage, lineage_to_idx)
+    assert edges == _phylo_edges_reference(tree, strain_to_lineage, lineage_to_idx)
+    assert sum(edges.values()) > 0
+
+
+@pytest.fixture
+def tables():
+    weeks = ['2020-01-06', '2020-01-13', '2020-01-20', '2020-01-27']
+    flights = _flights([('AAA', 'BBB', weeks[0]), ('BBB', 'AAA', weeks[1]), ('AAA', 'CCC', weeks[1]),
+                        ('CCC', 'BBB', weeks[2]), ('BBB', 'DDD', weeks[3]), ('DDD', 'AAA', weeks[3]),
+                        ('AAA', 'ZZZ', weeks[3])])
+    samples = _samples([
+        ('B.1', 'AAA', weeks[0], 6), ('B.1', 'AAA', weeks[1], 4), ('B.1', 'BBB', weeks[1], 5),
+        ('A.2', 'CCC', weeks[0], 3), ('A.2', 'CCC', weeks[2], 2),
+        ('B.1', 'AAA', weeks[2], 8), ('A.2', 'CCC', weeks[3], 9), ('C.3', 'DDD', weeks[3], 4),
+        ('B.1', 'DDD', weeks[3], 1),
+    ])
+    metadata = _metadata([('s1', 'B.1', 'S:D614G,N:R203K'), ('s2', 'A.2', 'S:D614G'),
+                          ('s3', 'B.1', 'ORF1a:T265I'), ('s4', 'A.2', 'N:R203K')])
+    return weeks, flights, samples, metadata
+
+
+def test_update_graph_matches_full_rebuild(tables):
+    weeks, flights, samples, metadata = tables
+    config = GraphConfig(tree_file=None, min_lineage_samples=5)
+    split = pd.Period(weeks[2], 'W')
+
+    # The rebuild drops the flight to ZZZ, which has no destination coordinates
+    full = assemble_graph_artifact(metadata, flights[flights['latitude_2'].notna()], samples, config)
+
+    old_flights, new_flights = flights[flights['week'] < split], flights[flights['week'] >= split]
+    old_samples, new_samples = samples[samples['week'] < split], samples[samples['week'] >= split]
+    base = assemble_graph_artifact(metadata.iloc[:2], old_flights, old_samples, config)
+    update_graph(base, new_samples, new_flights=new_flights, new_metadata=metadata.iloc[2:])
+
+    assert set(base['week_to_idx']) == set(full['week_to_idx'])
+    assert set(base['airport_to_idx']) == set(full['airport_to_idx']) == set(COORDS)
+    # A.2 crosses min_lineage_samples only with the update; C.3 never does
+    assert set(base['lineage_to_idx']) == set(full['lineage_to_idx']) == {'A.2', 'B.1'}
+
+    for edge_type in full['hg'].edge_types:
+        assert _edge_set(base, edge_type) == _edge_set(full, edge_type), edge_type
+
+    for code, idx in full['airport_to_idx'].items():
+        assert torch.equal(base['hg']['airport'].x[base['airport_to_idx'][code]], full['hg']['airport'].x[idx])
+    pd.testing.assert_frame_equal(base['airport_table'], full['airport_table'])
+
+
+def test_update_graph_rejects_earlier_weeks(tables):
+    weeks, flights, samples, metadata = tables
+    config = GraphConfig(tree_file=None, min_lineage_samples=1)
+    graph = assemble_graph_artifact(metadata, flights[flights['latitude_2'].notna()], samples, config)
+
+    with pytest.raises(ValueError, match='after'):
+        update_graph(graph, _samples([('B.1', 'AAA', weeks[1], 1)]))
+
+
+GENOMES = (
+    'strain\tdate\tpango_lineage\tfull_loc\tlat\tlon\taaSubstitutions\n'
+    's1\t2020-01-07\tB.1\tNear AAA\t10.5\t20.5\tS:D614G\n'
+    's2\t2020-01-15\tB.1\tNear AAA\t10.5\t20.5\tS:D614G,N:R203K\n'
+    's3\t2020-01-21\tA.2\tNear CCC\t51.0\t-60.0\tORF1a:T265I\n'
+    's4\t2020-01-22\tA.2\tNowhere\t-80.0\t0.0\t\n'
+)
+
+FLIGHTS = (
+    'origin\tdestination\tfirstseen\tlatitude_1\tlongitude_1\tlatitude_2\tlongitude_2\n'
+    'AAA\tBBB\t2020-01-06 10:00:00+00:00\t10.0\t20.0\t-30.0\t40.0\n'
+    'BBB\tCCC\t2020-01-14 08:30:00+00:00\t-30.0\t40.0\t50.0\t-60.0\n'
+    'CCC\tAAA\t2020-01-21 12:00:00+00:00\t50.0\t-60.0\t10.0\t20.0\n'
+)
+
+
+@pytest.fixture
+def graph_config(tmp_path):
+    (tmp_path / 'genomes.tsv').write_text(GENOMES)
+    (tmp_path / 'flights.tsv').write_text(FLIGHTS)
+    return GraphConfig(genome_file=str(tmp_path / 'genomes.tsv'), flight_file=str(tmp_path / 'flights.tsv'),
+                       tree_file=None, min_lineage_samples=1, cache_dir=str(tmp_path / 'graphs'))
+
+
+@pytest.fixture
+def pipeline_runs(monkeypatch):
+    runs = []
+    run_pipeline = graph_construction._run_pipeline
+
+    def counting(config):
+        runs.append(config)
+        return run_pipeline(config)
+    monkeypatch.setattr(graph_construction, '_run_pipeline', counting)
+    return runs
+
+
+def test_build_graph_reuses_the_cached_artifact(graph_config, pipeline_runs):
+    built = build_graph(graph_config)
+    assert set(built['lineage_to_idx']) == {'A.2', 'B.1'}
+    # The sample 'Nowhere' is more than max_distance_km from any airport
+    assert int(built['hg']['lineage', 'sampled_at', 'airport'].edge_attr[:, 0].sum()) == 3
+
+    cached = build_graph(GraphConfig(**asdict(graph_config)))
+    assert len(pipeline_runs) == 1
+    assert cached['key'] == built['key']
+    for edge_type in built['hg'].edge_types:
+        assert _edge_set(cached, edge_type) == _edge_set(built, edge_type)
+    assert torch.equal(cached['hg']['lineage'].x, built['hg']['lineage'].x)
+
+    build_graph(graph_config, refresh=True)
+    assert len(pipeline_runs) == 2
+
+
+def test_build_graph_rebuilds_when_a_parameter_changes(graph_config, pipeline_runs):
+    build_graph(graph_config)
+    wider = replace(graph_config, max_distance_km=20_000.0)
+    assert wider.cache_key() != graph_config.cache_key()
+
+    rebuilt = build_graph(wider)
+    assert len(pipeline_runs) == 2
+    assert int(rebuilt['hg']['lineage', 'sampled_at', 'airport'].edge_attr[:, 0].sum()) == 4
+    # Both artifacts stay in the cache
+    build_graph(graph_config)
+    build_graph(wider)
+    assert len(pipeline_runs) == 2
+
+
+def test_build_graph_rebuilds_when_a_source_file_changes(graph_config, pipeline_runs):
+    built = build_graph(graph_config)
+    extra_flight = 'AAA\tCCC\t2020-01-16 09:00:00+00:00\t10.0\t20.0\t50.0\t-60.0\n'
+    Path(graph_config.flight_file).write_text(FLIGHTS + extra_flight)
+
+    rebuilt = build_graph(graph_config)
+    assert len(pipeline_runs) == 2
+    assert rebuilt['key'] != built['key']
+    flights = ('airport', 'flight', 'airport')
+    assert rebuilt['hg'][flights].edge_index.size(1) == built['hg'][flights].edge_index.size(1) + 1
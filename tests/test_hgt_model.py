@@ -0,0 +1,42 @@
+import torch
+
+from hgt_model import HGTDetector, link_loss, train_minibatch_epoch
+from sampling import LinkBatchLoader
+
+
+def test_minibatch_epoch_takes_one_step_per_batch(graph):
+    torch.manual_seed(0)
+    model = HGTDetector.from_graph(graph, hidden_channels=8, out_channels=8, num_heads=2, num_layers=2, dropout=0.0)
+    loader = LinkBatchLoader(graph, [3, 2], batch_size=1000, generator=torch.Generator().manual_seed(0))
+    batch = next(iter(loader))
+    assert len(loader) == 1
+
+    out = model(batch.x_dict, batch.edge_index_dict)
+    expected = link_loss(out, batch.pos_edge_label_index, batch.neg_edge_label_index, model.temperature)
+    expected.backward()
+    before = {name: (p.detach().clone(), p.grad.clone()) for name, p in model.named_parameters() if p.grad is not None}
+    assert 'temperature' in before
+
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+    loss = train_minibatch_epoch(model, optimizer, [batch])
+
+    assert abs(loss - expected.item()) < 1e-5
+    params = dict(model.named_parameters())
+    for name, (value, grad) in before.items():
+        assert torch.allclose(params[name].detach(), value - 0.1 * grad, atol=1e-6), name
+
+
+def test_minibatch_epoch_averages_over_supervision_edges(graph):
+    torch.manual_seed(0)
+    model = HGTDetector.from_graph(graph, hidden_channels=8, out_channels=8, num_heads=2, num_layers=1)
+    loader = LinkBatchLoader(graph, [2], batch_size=32, generator=torch.Generator().manual_seed(0))
+    batches = list(loader)
+    assert [b.pos_edge_label_index.size(1) for b in batches] == [32, 32, 16]
+
+    losses = []
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.0)
+    for batch in batches:
+        losses.append(train_minibatch_epoch(model, optimizer, [batch]))
+    # Weighted by batch size, so the short last batch counts for less
+    expected = (32 * losses[0] + 32 * losses[1] + 16 * losses[2]) / 80
+    assert abs(train_minibatch_epoch(model, optimizer, batches) - expected) < 1e-5
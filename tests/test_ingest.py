@@ -0,0 +1,163 @@
+import os
+import warnings
+
+import pandas as pd
+import pytest
+import zstandard
+
+from ingest import (filter_fasta_zst, iter_fasta_zst, iter_metadata_zst, load_cached_table, load_flight_table,
+                    load_metadata_zst, main)
+
+METADATA = (
+    'strain\tdate\tpango_lineage\tfull_loc\tcountry\taaSubstitutions\n'
+    's1\t2020-01-05\tB.1\tParis, France\tFrance\tS:D614G\n'
+    's2\t2019-12-20\tA\tWuhan, China\tChina\t\n'
+    's3\t?\tB.1\tLyon, France\tFrance\t\n'
+    's4\t2020-03-01\tunclassifiable\tRome, Italy\tItaly\t\n'
+    's5\t2020-03-02\t\tRome, Italy\tItaly\t\n'
+    's6\t2020-04-30\tA.2\tMilan, Italy\tItaly\tN:R203K,S:D614G\n'
+    's7\t2020-05-01\tA.2\tMilan, Italy\tItaly\t\n'
+)
+
+FASTA = (
+    '>hCoV-19/s1|EPI_ISL_1|2020-01-05\nACGT\nTTAA\n'
+    '>hCoV-19/s2|EPI_ISL_2|2019-12-20\nGGGG\n'
+    '>hCoV-19/s6|EPI_ISL_6|2020-04-30\nCC\nAA\nTT\n'
+)
+
+
+def _zst(path, text):
+    path.write_bytes(zstandard.ZstdCompressor().compress(text.encode()))
+    return path
+
+
+FLIGHTS = (
+    'origin\tdestination\tfirstseen\tlatitude_2\n'
+    'JFK\tLHR\t2020-01-06 10:00:00+00:00\t51.47\n'
+    'LHR\tCDG\t2020-01-14 08:30:00+00:00\t49.01\n'
+)
+
+
+@pytest.fixture
+def flight_file(tmp_path):
+    path = tmp_path / 'flights.tsv'
+    path.write_text(FLIGHTS)
+    return path
+
+
+def _counting(prepare):
+    calls = []
+
+    def wrapped(path):
+        calls.append(path)
+        return prepare(path)
+    return wrapped, calls
+
+
+def test_flight_table_is_typed_and_cached(flight_file):
+    df = load_flight_table(flight_file)
+    assert isinstance(df['origin'].dtype, pd.CategoricalDtype)
+    assert df['week'].tolist() == [pd.Period('2020-01-06', 'W'), pd.Period('2020-01-13', 'W')]
+
+    cache_dir = flight_file.parent / 'cache'
+    assert (cache_dir / 'flights.tsv.parquet').exists()
+    pd.testing.assert_frame_equal(load_flight_table(flight_file), df)
+
+
+def test_cache_is_reused_until_the_source_changes(flight_file):
+    prepare, calls = _counting(lambda path: pd.read_csv(path, sep='\t'))
+    load_cached_table(flight_file, 'flights', prepare)
+    load_cached_table(flight_file, 'flights', prepare)
+    assert len(calls) == 1
+
+    # Touched but unchanged: the content hash keeps the cache
+    stat = os.stat(flight_file)
+    os.utime(flight_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_cached_table(flight_file, 'flights', prepare)
+    assert len(calls) == 1
+
+    flight_file.write_text(FLIGHTS + 'CDG\tJFK\t2020-01-20 12:00:00+00:00\t40.64\n')
+    assert len(load_cached_table(flight_file, 'flights', prepare)) == 3
+    assert len(calls) == 2
+
+    load_cached_table(flight_file, 'flights', prepare, refresh=True)
+    assert len(calls) == 3
+
+
+def test_files_sharing_a_stem_get_separate_caches(tmp_path):
+    first, second = tmp_path / 'metadata.tsv', tmp_path / 'metadata.2024.tsv'
+    first.write_text('strain\tpango_lineage\ns1\tB.1\n')
+    second.write_text('strain\tpango_lineage\ns2\tA.2\ns3\tA.2\n')
+    prepare = lambda path: pd.read_csv(path, sep='\t')
+
+    assert load_cached_table(first, 'genome', prepare)['strain'].tolist() == ['s1']
+    assert load_cached_table(second, 'genome', prepare)['strain'].tolist() == ['s2', 's3']
+    assert load_cached_table(first, 'genome', prepare)['strain'].tolist() == ['s1']
+
+
+@pytest.mark.parametrize('name', ['metadata.tsv', 'metadata.tsv.zst'])
+def test_metadata_is_filtered_chunk_by_chunk(tmp_path, name):
+    path = tmp_path / name
+    _zst(path, METADATA) if name.endswith('.zst') else path.write_text(METADATA)
+    chunks = list(iter_metadata_zst(path, chunksize=2))
+
+    assert all(len(chunk) <= 2 for chunk in chunks)
+    df = pd.concat(chunks, ignore_index=True)
+    # Dates outside 2020-01-01..2020-04-30, unparseable dates and missing / unclassifiable lineages are dropped
+    assert df['strain'].tolist() == ['s1', 's6']
+    assert 'country' not in df.columns
+    assert df['date'].tolist() == [pd.Timestamp('2020-01-05'), pd.Timestamp('2020-04-30')]
+
+
+def test_load_metadata_without_matches(tmp_path):
+    path = _zst(tmp_path / 'metadata.tsv.zst', METADATA)
+    df = load_metadata_zst(path, start_date='2021-01-01', end_date='2021-12-31')
+    assert df.empty and 'strain' in df.columns
+
+
+def test_fasta_records_are_streamed_and_filtered(tmp_path):
+    path = _zst(tmp_path / 'sequences.fasta.zst', FASTA)
+    assert list(iter_fasta_zst(path)) == [('s1', 'ACGTTTAA'), ('s2', 'GGGG'), ('s6', 'CCAATT')]
+    assert list(iter_fasta_zst(path, strains={'s6', 's9'})) == [('s6', 'CCAATT')]
+
+    output = tmp_path / 'filtered.fasta'
+    assert filter_fasta_zst(path, output, {'s1'}, line_width=3) == 1
+    assert output.read_text() == '>s1\nACG\nTTT\nAA\n'
+
+
+def test_cli_filters_metadata_then_sequences(tmp_path, monkeypatch, capsys):
+    metadata = _zst(tmp_path / 'metadata.tsv.zst', METADATA)
+    sequences = _zst(tmp_path / 'sequences.fasta.zst', FASTA)
+    filtered_metadata, filtered_sequences = tmp_path / 'metadata.tsv', tmp_path / 'sequences.fasta'
+
+    monkeypatch.setattr('sys.argv', ['ingest.py', 'metadata', str(metadata), str(filtered_metadata),
+                                     '--end-date', '2020-02-01'])
+    main()
+    assert pd.read_csv(filtered_metadata, sep='\t')['strain'].tolist() == ['s1']
+
+    monkeypatch.setattr('sys.argv', ['ingest.py', 'sequences', str(sequences), str(filtered_sequences),
+                                     '--metadata', str(filtered_metadata)])
+    main()
+    assert filtered_sequences.read_text() == '>s1\nACGTTTAA\n'
+    assert 'Wrote 1 of 1 strains' in capsys.readouterr().out
+
+
+def test_metadata_dates_are_parsed_as_iso_8601(tmp_path):
+    path = tmp_path / 'metadata.tsv'
+    path.write_text(METADATA + 's8\t2020-02\tB.1\tParis, France\tFrance\t\n'
+                               's9\t02/03/2020\tB.1\tParis, France\tFrance\t\n')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        df = load_metadata_zst(path)
+    # Month-only dates fall on the first of the month; other formats are dropped, not guessed
+    assert df['strain'].tolist() == ['s1', 's6', 's8']
+    assert df['date'].iloc[-1] == pd.Timestamp('2020-02-01')
+
+
+def test_cli_keeps_filtering_when_the_filter_columns_are_dropped(tmp_path, monkeypatch):
+    metadata, output = _zst(tmp_path / 'metadata.tsv.zst', METADATA), tmp_path / 'strains.tsv'
+    monkeypatch.setattr('sys.argv', ['ingest.py', 'metadata', str(metadata), str(output), '--columns', 'strain'])
+    main()
+    df = pd.read_csv(output, sep='\t')
+    assert list(df.columns) == ['strain']
+    assert df['strain'].tolist() == ['s1', 's6']
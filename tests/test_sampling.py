@@ -0,0 +1,169 @@
+from collections import Counter
+
+import pytest
+import torch
+from torch_geometric.data import HeteroData
+
+from conftest import NUM_WEEKS
+from sampling import (HardNegativeSampler, HeteroNeighborSampler, LinkBatchLoader, TemporalLinkBatchLoader,
+                      edge_times)
+
+SAMPLED_AT = ('lineage', 'sampled_at', 'airport')
+FLIGHT = ('airport', 'flight', 'airport')
+
+
+def _all_nodes(graph):
+    return {nt: torch.arange(graph[nt].num_nodes) for nt in graph.node_types}
+
+
+@pytest.mark.parametrize('before', range(NUM_WEEKS + 2))
+def test_sampler_before_keeps_exactly_the_earlier_edges(graph, before):
+    times = edge_times(graph)
+    sampler = HeteroNeighborSampler(graph, [-1, -1], edge_time=times)
+    sub = sampler.sample(_all_nodes(graph), before=before)
+
+    for edge_type in graph.edge_types:
+        sampled = torch.sort(sub[edge_type].e_id).values
+        if edge_type in times:
+            expected = torch.nonzero(times[edge_type] < before).flatten()
+        else:
+            # evolves_from carries no week and is always eligible
+            expected = torch.arange(graph[edge_type].num_edges)
+        assert torch.equal(sampled, expected), edge_type
+
+
+def test_sampler_without_before_ignores_time(graph):
+    sampler = HeteroNeighborSampler(graph, [-1], edge_time=edge_times(graph))
+    sub = sampler.sample(_all_nodes(graph))
+    for edge_type in graph.edge_types:
+        assert sub[edge_type].e_id.numel() == graph[edge_type].num_edges
+
+
+def _star_graph(num_spokes=40):
+    """Airport 0 with one incoming flight from each of airports 1..num_spokes."""
+    hg = HeteroData()
+    hg['lineage'].x = torch.zeros(1, 1)
+    hg['airport'].x = torch.zeros(num_spokes + 1, 2)
+    hg[FLIGHT].edge_index = torch.stack([torch.arange(1, num_spokes + 1), torch.zeros(num_spokes, dtype=torch.long)])
+    hg[SAMPLED_AT].edge_index = torch.zeros(2, 0, dtype=torch.long)
+    return hg
+
+
+def test_high_degree_nodes_get_fanout_distinct_neighbors():
+    star = _star_graph()
+    sampler = HeteroNeighborSampler(star, [10], generator=torch.Generator().manual_seed(0))
+    picks = Counter()
+    for _ in range(2000):
+        e_id = sampler.sample({'airport': torch.tensor([0])})[FLIGHT].e_id
+        assert e_id.numel() == 10 and e_id.unique().numel() == 10
+        picks.update(e_id.tolist())
+
+    # Uniform without replacement: every edge is picked with probability 10 / 40 (500 of 2000 draws)
+    assert set(picks) == set(range(40))
+    assert all(400 < n < 600 for n in picks.values())
+
+
+def test_link_loader_maps_global_edges_to_local_indices(graph):
+    loader = LinkBatchLoader(graph, [3, 2], batch_size=16, neg_sampling_ratio=2.0,
+                             generator=torch.Generator().manual_seed(0))
+    positives = Counter()
+    for batch in loader:
+        lineage_ids, airport_ids = batch['lineage'].n_id, batch['airport'].n_id
+        pos, neg = batch.pos_edge_label_index, batch.neg_edge_label_index
+        positives.update(zip(lineage_ids[pos[0]].tolist(), airport_ids[pos[1]].tolist()))
+        assert neg.size(1) == 2 * pos.size(1)
+        assert bool((neg[0] < lineage_ids.numel()).all() & (neg[1] < airport_ids.numel()).all())
+        # Negatives are drawn for the batch's own lineages
+        assert set(lineage_ids[neg[0]].tolist()) <= set(lineage_ids[pos[0]].tolist())
+
+        # Sampled message-passing edges point at the global edges they came from
+        for edge_type in graph.edge_types:
+            src_type, _, dst_type = edge_type
+            local = batch[edge_type].edge_index
+            sampled = torch.stack([batch[src_type].n_id[local[0]], batch[dst_type].n_id[local[1]]])
+            assert torch.equal(sampled, graph[edge_type].edge_index[:, batch[edge_type].e_id]), edge_type
+
+    src, dst = graph[SAMPLED_AT].edge_index.tolist()
+    assert positives == Counter(zip(src, dst))
+
+
+def test_temporal_loader_batches_only_see_earlier_weeks(graph):
+    loader = TemporalLinkBatchLoader(graph, [3, 2], batch_size=4, generator=torch.Generator().manual_seed(0))
+    times = edge_times(graph)
+    batches = list(loader)
+    assert len(batches) == len(loader)
+
+    positives = Counter()
+    for batch in batches:
+        for edge_type in times:
+            assert bool((times[edge_type][batch[edge_type].e_id] < batch.week).all()), edge_type
+        lineages = batch['lineage'].n_id[batch.pos_edge_label_index[0]]
+        airports = batch['airport'].n_id[batch.pos_edge_label_index[1]]
+        positives.update((l, a, batch.week) for l, a in zip(lineages.tolist(), airports.tolist()))
+
+    # Every supervision edge is a positive exactly once, in the batch of its own week
+    src, dst = graph[SAMPLED_AT].edge_index.tolist()
+    assert positives == Counter(zip(src, dst, times[SAMPLED_AT].tolist()))
+
+
+def _chain_graph():
+    """Lineage 0 sampled at airport 0 (week 0) and 3 (week 4); flights 0 -> 1 -> 2 -> 3 and 0 -> 4 (week 4)."""
+    hg = HeteroData()
+    hg['lineage'].x = torch.zeros(2, 1)
+    hg['airport'].x = torch.zeros(6, 2)
+    hg[SAMPLED_AT].edge_index = torch.tensor([[0, 0], [0, 3]])
+    hg[SAMPLED_AT].edge_attr = torch.tensor([[1.0, 0], [1.0, 4]])
+    hg[FLIGHT].edge_index = torch.tensor([[0, 1, 2, 0], [1, 2, 3, 4]])
+    hg[FLIGHT].edge_attr = torch.tensor([[5.0, 0], [5.0, 1], [5.0, 1], [5.0, 4]])
+    return hg
+
+
+def test_hard_negatives_never_hit_positives(graph):
+    # Enough redraws that the uniform fallback for repeated clashes never kicks in
+    sampler = HardNegativeSampler(graph, mode='degree', max_retries=50, generator=torch.Generator().manual_seed(0))
+    lineages = torch.arange(graph['lineage'].num_nodes).repeat(50)
+    neg = sampler.sample(lineages)
+
+    assert torch.equal(neg[0], lineages)
+    positives = graph[SAMPLED_AT].edge_index
+    assert not torch.isin(neg[0] * 100 + neg[1], positives[0] * 100 + positives[1]).any()
+
+
+def test_reachable_negatives_stay_within_num_hops():
+    sampler = HardNegativeSampler(_chain_graph(), mode='reachable', num_hops=2, max_retries=50,
+                                  generator=torch.Generator().manual_seed(0))
+    airports = sampler.sample(torch.zeros(500, dtype=torch.long))[1]
+    # From airport 0: 1 or 4 after one flight, 2 after two; walks from airport 3 stay on a
+    # positive and are redrawn
+    assert set(airports.tolist()) <= {1, 2, 4}
+
+
+def test_hard_negatives_before_a_week_ignore_later_edges():
+    full = HardNegativeSampler(_chain_graph(), mode='reachable', num_hops=2,
+                               generator=torch.Generator().manual_seed(0))
+    early = full.at(1)
+    assert early.positive_keys.tolist() == [0]
+    # Week-0 flights only: 0 -> 1, and the walk stops there
+    assert set(early.sample(torch.zeros(200, dtype=torch.long))[1].tolist()) == {1}
+    with pytest.raises(ValueError):
+        early.at(3)
+
+
+def test_temporal_loader_draws_hard_negatives_per_week(graph):
+    sampler = HardNegativeSampler(graph, mode='reachable', generator=torch.Generator().manual_seed(0))
+    loader = TemporalLinkBatchLoader(graph, [2], batch_size=8, negative_sampler=sampler)
+    weeks = {batch.week for batch in loader}
+
+    assert set(loader._week_samplers) == weeks
+    for week, week_sampler in loader._week_samplers.items():
+        visible = edge_times(graph)[SAMPLED_AT] < week
+        expected = graph[SAMPLED_AT].edge_index[:, visible]
+        assert torch.equal(week_sampler.positive_keys,
+                           torch.unique(expected[0] * graph['airport'].num_nodes + expected[1]))
+
+
+def test_temporal_loader_without_supervision_edges():
+    loader = TemporalLinkBatchLoader(_chain_graph(), [2], edge_label_index=torch.empty(2, 0, dtype=torch.long),
+                                     edge_label_time=torch.empty(0, dtype=torch.long))
+    assert len(loader) == 0
+    assert list(loader) == []
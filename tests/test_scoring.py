@@ -0,0 +1,55 @@
+import pytest
+import torch
+
+from scoring import lineage_hotspots, stream_risk_scores, total_airport_risk
+
+NUM_LINEAGES, NUM_AIRPORTS = 37, 53
+
+
+@pytest.fixture
+def embeddings():
+    g = torch.Generator().manual_seed(0)
+    lineages = torch.nn.functional.normalize(torch.randn(NUM_LINEAGES, 8, generator=g, dtype=torch.float64), dim=1)
+    airports = torch.nn.functional.normalize(torch.randn(NUM_AIRPORTS, 8, generator=g, dtype=torch.float64), dim=1)
+    return lineages, airports
+
+
+def _dense(lineages, airports, temperature):
+    return (lineages @ airports.T * temperature).sigmoid()
+
+
+# Tile shapes that do not divide 37 x 53, a single tile, and tiles narrower than k
+@pytest.mark.parametrize('lineage_chunk_size,airport_chunk_size', [(5, 7), (37, 53), (1, 100), (64, 3)])
+@pytest.mark.parametrize('k', [1, 10, 53, 80])
+def test_streamed_scores_match_the_dense_matrix(embeddings, lineage_chunk_size, airport_chunk_size, k):
+    lineages, airports = embeddings
+    airport_risk, top_scores, top_indices = stream_risk_scores(
+        lineages, airports, k=k, lineage_chunk_size=lineage_chunk_size, airport_chunk_size=airport_chunk_size,
+        temperature=10.0)
+    dense = _dense(lineages, airports, 10.0)
+    expected_scores, expected_indices = dense.topk(min(k, NUM_AIRPORTS), dim=1)
+
+    assert torch.allclose(airport_risk, dense.sum(dim=0))
+    assert top_scores.shape == top_indices.shape == (NUM_LINEAGES, min(k, NUM_AIRPORTS))
+    assert torch.equal(top_indices, expected_indices)
+    assert torch.allclose(top_scores, expected_scores)
+
+
+def test_single_lineage_helpers(embeddings):
+    lineages, airports = embeddings
+    dense = _dense(lineages, airports, 1.0)
+
+    assert torch.allclose(total_airport_risk(lineages, airports, airport_chunk_size=4), dense.sum(dim=0))
+    scores, indices = lineage_hotspots(lineages[3], airports, k=12, airport_chunk_size=5)
+    expected_scores, expected_indices = dense[3].topk(12)
+    assert torch.equal(indices, expected_indices) and torch.allclose(scores, expected_scores)
+
+
+def test_float32_scores(embeddings):
+    lineages, airports = (e.float() for e in embeddings)
+    airport_risk, top_scores, _ = stream_risk_scores(lineages, airports, k=5, lineage_chunk_size=6,
+                                                     airport_chunk_size=11)
+    dense = _dense(lineages, airports, 1.0)
+    assert airport_risk.dtype == torch.float32
+    assert torch.allclose(airport_risk, dense.sum(dim=0), atol=1e-5)
+    assert torch.allclose(top_scores, dense.topk(5, dim=1).values)
@@ -0,0 +1,123 @@
+import pytest
+import torch
+
+import simulation
+from conftest import NUM_AIRPORTS, random_graph
+from hgt_model import TARGET_EDGE
+from simulation import run_backtest, run_simulation, simulation_stats
+from temporal_graph import TemporalGraph
+
+IDX_TO_AIRPORT = {i: f'AP{i}' for i in range(NUM_AIRPORTS)}
+IDX_TO_WEEK = {i: f'W{i}' for i in range(10)}
+MODEL_KWARGS = {'hidden_channels': 8, 'out_channels': 8, 'num_heads': 2, 'num_layers': 1}
+
+
+def _without_timing(runs):
+    for run in runs:
+        for frame in run['simulation_history']:
+            frame['stats'].pop('train_seconds')
+    return runs
+
+
+def test_run_backtest_matches_serial_jobs(monkeypatch):
+    params = [{'epochs': 2, 'model_kwargs': {'hidden_channels': 8, 'out_channels': 8, 'num_heads': 2,
+                                             'num_layers': 1}}]
+    runs = _without_timing(run_backtest(TemporalGraph(random_graph()), IDX_TO_AIRPORT, IDX_TO_WEEK, 2, 4,
+                                        seeds=(0, 1), param_grid=params, top_k=3, max_workers=2,
+                                        threads_per_worker=1))
+
+    assert [(run['seed'], run['params']) for run in runs] == [(0, params[0]), (1, params[0])]
+    for run in runs:
+        history = run['simulation_history']
+        assert [frame['week'] for frame in history] == ['W3', 'W4']
+        assert all(frame['stats']['cold_start'] and len(frame['predicted']) == 3 for frame in history)
+        assert list(simulation_stats(history)['week']) == ['W3', 'W4']
+
+    # Every job is an independent, seeded cold start: the same job run in this process gives the same frame
+    monkeypatch.setitem(simulation._WORKER, 'temporal_graph', TemporalGraph(random_graph()))
+    monkeypatch.setitem(simulation._WORKER, 'idx_to_airport', IDX_TO_AIRPORT)
+    monkeypatch.setitem(simulation._WORKER, 'idx_to_week', IDX_TO_WEEK)
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    try:
+        frame = simulation._backtest_job(3, 1, params[0], 3)
+    finally:
+        torch.set_num_threads(threads)
+    frame['stats'].pop('train_seconds')
+    assert frame == runs[1]['simulation_history'][1]
+
+
+@pytest.fixture
+def training_calls(monkeypatch):
+    """Record model, optimizer, edge_label_index and the parameters before / after every train_epoch call."""
+    calls = []
+    train_epoch = simulation.train_epoch
+
+    def parameters(model):
+        return [p.detach().clone() for p in model.parameters()]
+
+    def recording(model, optimizer, data, edge_label_index=None, negative_sampler=None):
+        before = parameters(model)
+        loss = train_epoch(model, optimizer, data, edge_label_index, negative_sampler)
+        calls.append({'model': model, 'optimizer': optimizer, 'edge_label_index': edge_label_index,
+                      'before': before, 'after': parameters(model)})
+        return loss
+    monkeypatch.setattr(simulation, 'train_epoch', recording)
+    return calls
+
+
+def _simulate(temporal, **kwargs):
+    return run_simulation(temporal, IDX_TO_AIRPORT, IDX_TO_WEEK, 1, 5, top_k=3, epochs=2,
+                          model_kwargs=MODEL_KWARGS, verbose=False, **kwargs)
+
+
+def _same(first, second):
+    return all(torch.equal(a, b) for a, b in zip(first, second))
+
+
+def test_rolling_simulation_restarts_cold_every_n_weeks(training_calls):
+    torch.manual_seed(0)
+    history = _simulate(TemporalGraph(random_graph()), mode='rolling', finetune_epochs=3, cold_restart_every=2)
+
+    assert [frame['stats']['cold_start'] for frame in history] == [True, False, True, False]
+    assert [frame['week'] for frame in history] == ['W2', 'W3', 'W4', 'W5']
+    # Cold steps train `epochs` on all edges, warm steps `finetune_epochs` on the new week only
+    full_batch = [call['edge_label_index'] is None for call in training_calls]
+    assert full_batch == [True] * 2 + [False] * 3 + [True] * 2 + [False] * 3
+
+    models = [call['model'] for call in training_calls]
+    assert models[4] is models[0] and models[5] is not models[4] and models[9] is models[5]
+
+
+def test_rolling_simulation_fine_tunes_the_previous_model(training_calls):
+    torch.manual_seed(0)
+    temporal = TemporalGraph(random_graph())
+    history = _simulate(temporal, mode='rolling', finetune_epochs=3)
+    assert [frame['stats']['cold_start'] for frame in history] == [True, False, False, False]
+    assert len(training_calls) == 2 + 3 * 3
+
+    first = training_calls[0]
+    assert all(call['model'] is first['model'] and call['optimizer'] is first['optimizer'] for call in training_calls)
+    # Every step starts from the weights the previous one left, and moves them
+    for previous, call in zip(training_calls, training_calls[1:]):
+        assert _same(call['before'], previous['after'])
+        assert not _same(call['after'], call['before'])
+    # Adam's moments carry over: one optimizer step per call, cold epochs included
+    assert all(int(state['step']) == len(training_calls) for state in first['optimizer'].state.values())
+
+    # Week t's fine-tuning only sees the edges revealed in week t
+    for step, current_week in enumerate(range(2, 5)):
+        expected, _ = temporal.edges_between(TARGET_EDGE, current_week, current_week + 1)
+        for call in training_calls[2 + 3 * step:5 + 3 * step]:
+            assert torch.equal(call['edge_label_index'], expected)
+
+
+def test_cold_simulation_reinitializes_every_week(training_calls):
+    torch.manual_seed(0)
+    history = _simulate(TemporalGraph(random_graph()), mode='cold')
+    assert all(frame['stats']['cold_start'] for frame in history)
+    assert len({id(call['model']) for call in training_calls}) == 4
+    assert all(call['edge_label_index'] is None for call in training_calls)
+
+    with pytest.raises(ValueError, match='mode'):
+        _simulate(TemporalGraph(random_graph()), mode='weekly')
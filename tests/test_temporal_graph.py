@@ -0,0 +1,61 @@
+from collections import Counter
+
+import pytest
+import torch
+
+from conftest import NUM_WEEKS, random_graph
+from sampling import EDGE_TIME_COLUMNS
+from temporal_graph import TemporalGraph
+
+FLIGHT = ('airport', 'flight', 'airport')
+STATIC = ('lineage', 'evolves_from', 'lineage')
+
+
+def _edges(edge_index, edge_attr):
+    return Counter(zip(*edge_index.tolist(), map(tuple, edge_attr.tolist())))
+
+
+def _expected(original, edge_type, start, end):
+    week = original[edge_type].edge_attr[:, EDGE_TIME_COLUMNS[edge_type]]
+    keep = (week >= start) & (week < end)
+    return _edges(original[edge_type].edge_index[:, keep], original[edge_type].edge_attr[keep])
+
+
+@pytest.mark.parametrize('start,end', [(0, NUM_WEEKS), (0, 1), (2, 4), (3, 3), (4, 2),
+                                       (-5, 2), (NUM_WEEKS - 1, NUM_WEEKS + 10), (NUM_WEEKS, NUM_WEEKS + 1)])
+def test_edges_between_is_half_open(start, end):
+    original, temporal = random_graph(), TemporalGraph(random_graph())
+    for edge_type in temporal.time_columns:
+        assert _edges(*temporal.edges_between(edge_type, start, end)) == _expected(original, edge_type, start, end)
+
+
+@pytest.mark.parametrize('week', [0, 1, 3, NUM_WEEKS, NUM_WEEKS + 3])
+def test_snapshot_holds_earlier_edges_and_all_static_edges(week):
+    original, temporal = random_graph(), TemporalGraph(random_graph())
+    snap = temporal.snapshot(week)
+
+    for edge_type in temporal.time_columns:
+        assert _edges(snap[edge_type].edge_index, snap[edge_type].edge_attr) == \
+            _expected(original, edge_type, 0, week)
+    assert torch.equal(snap[STATIC].edge_index, original[STATIC].edge_index)
+    assert snap['lineage'].x is temporal.hg['lineage'].x
+
+
+def test_snapshot_is_a_view():
+    temporal = TemporalGraph(random_graph())
+    snap = temporal.snapshot(3)
+    edge_index = snap[FLIGHT].edge_index
+    assert edge_index.untyped_storage().data_ptr() == temporal.hg[FLIGHT].edge_index.untyped_storage().data_ptr()
+
+
+def test_reindex_after_appending_a_later_week():
+    temporal = TemporalGraph(random_graph())
+    store = temporal.hg[FLIGHT]
+    store.edge_index = torch.cat([store.edge_index, torch.tensor([[0], [1]])], dim=1)
+    store.edge_attr = torch.cat([store.edge_attr, torch.tensor([[5.0, NUM_WEEKS]])])
+    temporal.reindex()
+
+    assert temporal.num_weeks == NUM_WEEKS + 1
+    edge_index, _ = temporal.edges_between(FLIGHT, NUM_WEEKS, NUM_WEEKS + 1)
+    assert edge_index.tolist() == [[0], [1]]
+    assert temporal.snapshot(NUM_WEEKS)[FLIGHT].edge_index.size(1) == store.edge_index.size(1) - 1
@@ -7,9 +7,9 @@ echo "🚀 Starting Heterogeneous Graph Visualization Server"
 echo "===================================================="
 echo ""
 
-# Check if graph_data.json exists
-if [ ! -f "graph_data.json" ]; then
-    echo "⚠️  Warning: graph_data.json not found!"
+# Check if graph data exists (binary export preferred, JSON also accepted)
+if [ ! -f "graph_data.bin" ] && [ ! -f "graph_data.json" ]; then
+    echo "⚠️  Warning: graph_data.bin / graph_data.json not found!"
     echo "   Using sample data instead..."
     
     if [ ! -f "graph_data_sample_small.json" ]; then
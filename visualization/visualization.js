@@ -85,11 +85,71 @@ function createArrowMarkers() {
     });
 }
 
-// Load graph data
+// Parse the binary export of export_graph_to_json.py (format='binary'):
+// 'HGTB' | uint32 header length | JSON header | little-endian Int32/Float32 column blobs.
+// Columns are viewed in place as typed arrays (assumes a little-endian host, as all browsers are).
+function parseBinaryGraph(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'HGTB') {
+        throw new Error('Not a binary graph export');
+    }
+    const headerLength = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+    const dataStart = 8 + headerLength;
+
+    const readColumns = (specs) => {
+        const columns = {};
+        Object.entries(specs).forEach(([field, spec]) => {
+            const ArrayType = spec.dtype === 'float32' ? Float32Array : Int32Array;
+            columns[field] = new ArrayType(buffer, dataStart + spec.offset, spec.length);
+        });
+        return columns;
+    };
+
+    const nodes = [];
+    const columns = {nodes: {}, links: {}};
+    Object.entries(header.nodes).forEach(([type, entry]) => {
+        const numeric = readColumns(entry.columns);
+        columns.nodes[type] = {...numeric, ...entry.strings};
+        const fields = Object.keys(columns.nodes[type]).filter(f => f !== 'index');
+        for (let i = 0; i < entry.count; i++) {
+            const index = numeric.index[i];
+            const record = {id: `${type}_${index}`, index, type};
+            fields.forEach(f => { record[f] = columns.nodes[type][f][i]; });
+            nodes.push(record);
+        }
+    });
+
+    const links = [];
+    Object.entries(header.links).forEach(([type, entry]) => {
+        const numeric = readColumns(entry.columns);
+        columns.links[type] = numeric;
+        const fields = Object.keys(numeric).filter(f => f !== 'source' && f !== 'target');
+        for (let i = 0; i < entry.count; i++) {
+            const record = {
+                source: `${entry.source_type}_${numeric.source[i]}`,
+                target: `${entry.target_type}_${numeric.target[i]}`,
+                type
+            };
+            fields.forEach(f => { record[f] = numeric[f][i]; });
+            links.push(record);
+        }
+    });
+
+    return {nodes, links, metadata: header.metadata, columns};
+}
+
+// Load graph data: the binary export if present, otherwise graph_data.json
 async function loadData() {
     try {
-        const response = await fetch('graph_data.json');
-        graphData = await response.json();
+        const binary = await fetch('graph_data.bin');
+        if (binary.ok) {
+            graphData = parseBinaryGraph(await binary.arrayBuffer());
+        } else {
+            const response = await fetch('graph_data.json');
+            graphData = await response.json();
+        }
         
         console.log('Loaded graph data:', graphData.metadata);
         
@@ -105,7 +165,7 @@ async function loadData() {
     } catch (error) {
         console.error('Error loading data:', error);
         document.getElementById('loading-text').textContent = 
-            'Error loading data. Please ensure graph_data.json exists.';
+            'Error loading data. Please ensure graph_data.bin or graph_data.json exists.';
     }
 }
 